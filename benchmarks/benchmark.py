@@ -1,10 +1,15 @@
 import collections
+import csv
+import glob
+import io
 import itertools
 import multiprocessing
 import os
 import random
 import re
+import resource
 import signal
+import socket
 import sys
 import threading
 import time
@@ -15,19 +20,12 @@ import numpy
 import pandas as pd
 from tqdm import tqdm
 
+from costmodel import CostModel
+from profiler import StackSampler, write_profiles
 from estee.common import imode
-from estee.schedulers import WorkStealingScheduler
-from estee.schedulers.basic import AllOnOneScheduler, RandomAssignScheduler
-from estee.schedulers.camp import Camp2Scheduler
-from estee.schedulers.clustering import LcScheduler
-from estee.schedulers.genetic import GeneticScheduler
-from estee.schedulers.others import BlevelScheduler, DLSScheduler, ETFScheduler, MCPGTScheduler, \
-    MCPScheduler, TlevelScheduler
-from estee.schedulers.queue import BlevelGtScheduler, RandomGtScheduler, TlevelGtScheduler
-from estee.serialization.dask_json import json_deserialize, json_serialize
-from estee.simulator import MaxMinFlowNetModel, SimpleNetModel
+from estee.common.registry import Registry
+from estee.serialization.dask_json import json_deserialize
 from estee.simulator import Simulator, Worker
-from estee.simulator.trace import FetchEndTraceEvent
 
 
 def generate_seed():
@@ -42,30 +40,46 @@ def generate_seed():
 generate_seed()
 
 
-SCHEDULERS = {
-    "single": AllOnOneScheduler,
-    "blevel": BlevelScheduler,
-    "blevel-gt": BlevelGtScheduler,
-    "tlevel": TlevelScheduler,
-    "tlevel-gt": TlevelGtScheduler,
-    "random": RandomAssignScheduler,
-    "random-gt": RandomGtScheduler,
-    "dls": DLSScheduler,
-    "etf": ETFScheduler,
-    "mcp": MCPScheduler,
-    "mcp-gt": MCPGTScheduler,
-    "genetic": GeneticScheduler,
-    "camp2": lambda: Camp2Scheduler(5000),
-    "lc": LcScheduler,
-    "ws": WorkStealingScheduler
-}
-
-NETMODELS = {
-    "simple": SimpleNetModel,
-    "maxmin": MaxMinFlowNetModel
-}
-
-CLUSTERS = {
+# Schedulers, network models and clusters are resolved lazily, so a benchmark process
+# imports only what its instances need. Installed packages may add their own entries
+# using the entry point groups "estee.schedulers", "estee.netmodels" and "estee.clusters".
+
+SCHEDULERS = Registry({
+    "single": "estee.schedulers.basic:AllOnOneScheduler",
+    "blevel": "estee.schedulers.others:BlevelScheduler",
+    "blevel-gt": "estee.schedulers.queue:BlevelGtScheduler",
+    "tlevel": "estee.schedulers.others:TlevelScheduler",
+    "tlevel-gt": "estee.schedulers.queue:TlevelGtScheduler",
+    "random": "estee.schedulers.basic:RandomAssignScheduler",
+    "random-gt": "estee.schedulers.queue:RandomGtScheduler",
+    "dls": "estee.schedulers.others:DLSScheduler",
+    "etf": "estee.schedulers.others:ETFScheduler",
+    "etf-dup": "estee.schedulers.others:DuplicationScheduler",
+    "mcp": "estee.schedulers.others:MCPScheduler",
+    "mcp-gt": "estee.schedulers.others:MCPGTScheduler",
+    "genetic": "estee.schedulers.genetic:GeneticScheduler",
+    "lc": "estee.schedulers.clustering:LcScheduler",
+    "ws": "estee.schedulers.ws:WorkStealingScheduler"
+}, "estee.schedulers")
+SCHEDULERS.register("camp2", "estee.schedulers.camp:Camp2Scheduler", 5000)
+
+
+def create_rack_netmodel(bandwidth, rack_size=8, oversubscription=4, **kwargs):
+    """
+    Max-min flow model with racks of `rack_size` workers whose uplinks are oversubscribed
+    """
+    from estee.simulator import TopologyNetModel
+    return TopologyNetModel(bandwidth, [(rack_size, bandwidth * rack_size / oversubscription)],
+                            **kwargs)
+
+
+NETMODELS = Registry({
+    "simple": "estee.simulator.netmodels:SimpleNetModel",
+    "maxmin": "estee.simulator.netmodels:MaxMinFlowNetModel",
+    "maxmin-rack": create_rack_netmodel,
+}, "estee.netmodels")
+
+CLUSTERS = Registry({
     "2x8": [{"cpus": 8}] * 2,
     "4x4": [{"cpus": 4}] * 4,
     "8x4": [{"cpus": 4}] * 8,
@@ -78,7 +92,8 @@ CLUSTERS = {
     "64x16": [{"cpus": 16}] * 64,
     "128x16": [{"cpus": 16}] * 128,
     "256x16": [{"cpus": 16}] * 256,
-}
+    "16x4-hetero": [{"cpus": 4, "speed": 2.0}] * 8 + [{"cpus": 4}] * 8,
+}, "estee.clusters")
 
 BANDWIDTHS = {
     "8G": 8192,
@@ -116,7 +131,19 @@ COLUMNS = ["graph_set",
            "sched_time",
            "time",
            "execution_time",
-           "total_transfer"]
+           "total_transfer",
+           "wall_time"]
+
+FAILURE_COLUMNS = COLUMNS[:10] + ["reason"]
+
+INSTANCE_KEY_COLUMNS = ["graph_id",
+                        "cluster_name",
+                        "bandwidth",
+                        "netmodel",
+                        "scheduler_name",
+                        "imode",
+                        "min_sched_interval",
+                        "sched_time"]
 
 Instance = collections.namedtuple("Instance",
                                   ("graph_set", "graph_name", "graph_id", "graph",
@@ -126,7 +153,6 @@ Instance = collections.namedtuple("Instance",
 
 
 class BenchmarkConfig:
-    graph_cache = {}
 
     def __init__(self, graph_frame, schedulers, clusters, netmodels, bandwidths,
                  imodes, sched_timings, count):
@@ -140,21 +166,14 @@ class BenchmarkConfig:
         self.count = count
 
     def generate_instances(self):
-        def calculate_imodes(graph, graph_id):
-            if graph_id not in BenchmarkConfig.graph_cache:
-                BenchmarkConfig.graph_cache[graph_id] = {}
-                for mode in IMODES:
-                    g = json_deserialize(graph)
-                    IMODES[mode](g)
-                    BenchmarkConfig.graph_cache[graph_id][mode] = json_serialize(g)
-
+        # Instances share the serialized graph, information modes are applied
+        # by the process that computes the instance (see load_instance_graph)
         for graph_def, cluster_name, bandwidth, netmodel, scheduler_name, mode, sched_timing \
                 in itertools.product(self.graph_frame.iterrows(), self.clusters, self.bandwidths,
                                      self.netmodels, self.schedulers, self.imodes,
                                      self.sched_timings):
             g = graph_def[1]
-            calculate_imodes(g["graph"], g["graph_id"])
-            graph = BenchmarkConfig.graph_cache[g["graph_id"]][mode]
+            graph = g["graph"]
 
             (min_sched_interval, sched_time) = SCHED_TIMINGS[sched_timing]
             instance = Instance(
@@ -188,51 +207,411 @@ REPEAT    : {repeat}
         )
 
 
-def run_single_instance(instance):
-    time.sleep(1)
+def read_csv_columns(path, columns=None, dtype=None):
+    """
+    Reads a CSV file, columns missing in the file (written by older versions) are filled by NaN
+    """
+    if columns is None:
+        return pd.read_csv(path, dtype=dtype)
+    frame = pd.read_csv(path, usecols=lambda column: column in columns, dtype=dtype)
+    return frame.reindex(columns=columns)
+
+
+class ResultStore:
+    """
+    Append-only storage of benchmark results.
+
+    Results of each finished instance are immediately appended into a shard
+    (an uncompressed CSV file) in the directory `<resultfile>.shards`; every run
+    writes its own shard. `compact()` merges all shards into the (zipped) result file.
+    Readers always see the result file together with all shards.
+
+    Instances that failed (e.g. by a timeout) are appended into `<resultfile>.failures.csv`,
+    one row per missing repetition. They are computed again in the next runs, unless
+    failures are explicitly skipped.
+    """
+
+    def __init__(self, resultfile):
+        self.resultfile = resultfile
+        self.shard_dir = "{}.shards".format(resultfile)
+        self.failure_file = "{}.failures.csv".format(resultfile)
+        self.shard = None
+        self.shard_path = None
+        self.lock = threading.Lock()
+
+    def shard_paths(self):
+        return sorted(glob.glob(os.path.join(self.shard_dir, "*.csv")))
+
+    def exists(self):
+        return os.path.isfile(self.resultfile) or bool(self.shard_paths())
+
+    def read_columns(self):
+        if os.path.isfile(self.resultfile):
+            return list(pd.read_csv(self.resultfile, nrows=0).columns)
+        return COLUMNS
+
+    def modification_time(self):
+        paths = [self.resultfile] + self.shard_paths()
+        return max((os.path.getmtime(path) for path in paths if os.path.isfile(path)), default=0)
+
+    def read(self, columns=None, dtype=None):
+        frames = []
+        if os.path.isfile(self.resultfile):
+            frames.append(read_csv_columns(self.resultfile, columns, dtype))
+        for path in self.shard_paths():
+            frames.append(self._read_shard(path, columns))
+        if not frames:
+            return pd.DataFrame([], columns=columns or COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def read_failures(self, columns=None):
+        if not os.path.isfile(self.failure_file):
+            return pd.DataFrame([], columns=columns or FAILURE_COLUMNS)
+        return pd.read_csv(self.failure_file, usecols=columns)
+
+    def read_keys(self, include_failures=False):
+        """
+        Returns key columns of all computed instances (and of failed instances
+        when `include_failures` is True)
+        """
+        frames = [self.read(INSTANCE_KEY_COLUMNS)]
+        if include_failures:
+            frames.append(self.read_failures(INSTANCE_KEY_COLUMNS))
+        return pd.concat(frames, ignore_index=True)
+
+    def append_failure(self, instance, reason, count=None):
+        """
+        Records `count` failed repetitions of the instance (all of them by default)
+        """
+        if count is None:
+            count = instance.count
+        row = [getattr(instance, column) for column in FAILURE_COLUMNS[:-1]] + [reason]
+        with self.lock:
+            new = not os.path.isfile(self.failure_file)
+            with open(self.failure_file, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(FAILURE_COLUMNS)
+                writer.writerows([row] * count)
+
+    def read_current_shard(self):
+        with self.lock:
+            if self.shard_path is None:
+                return pd.DataFrame([], columns=COLUMNS)
+            return self._read_shard(self.shard_path)
+
+    def _read_shard(self, path, columns=None):
+        with open(path) as f:
+            text = f.read()
+        # Every row is written with its newline, so only the last line may be cut off
+        # (when the computation was killed during a write)
+        if not text.endswith("\n"):
+            text = text[:text.rfind("\n") + 1]
+            print("Dropped an incomplete row of shard '{}'".format(path), file=sys.stderr)
+        if not text:
+            return pd.DataFrame([], columns=columns or COLUMNS)
+        frame = pd.read_csv(io.StringIO(text))
+        if columns is not None:
+            frame = frame[columns]
+        return frame
+
+    def append(self, rows):
+        if not rows:
+            return
+        data = io.StringIO()
+        csv.writer(data).writerows(rows)
+        with self.lock:
+            if self.shard is None:
+                self._open_shard()
+            self.shard.write(data.getvalue())
+            self.shard.flush()
+            os.fsync(self.shard.fileno())
+
+    def _open_shard(self):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.shard_path = os.path.join(self.shard_dir, "{}-{}-{}.csv".format(
+            socket.gethostname(), os.getpid(), int(time.time() * 1000)))
+        self.shard = open(self.shard_path, "w", newline="")
+        csv.writer(self.shard).writerow(COLUMNS)
+
+    def close(self):
+        with self.lock:
+            if self.shard is not None:
+                self.shard.close()
+                self.shard = None
+
+    def compact(self):
+        """
+        Merge all shards into the result file.
+
+        The new result file is written next to the old one and atomically renamed,
+        so the old results are never lost.
+        """
+        self.close()
+        shards = self.shard_paths()
+        if not shards:
+            return
+        frame = self.read()
+        base, ext = os.path.splitext(self.resultfile)
+        path = "{}.tmp{}".format(base, ext)
+        write_resultfile(frame, path)
+        os.replace(path, self.resultfile)
+        for shard in shards:
+            os.unlink(shard)
+        if not os.listdir(self.shard_dir):
+            os.rmdir(self.shard_dir)
+        print("{} entries in compacted '{}'".format(frame["time"].count(), self.resultfile))
+
+
+def create_simulator(instance, netmodel_args=None, **worker_args):
+    """
+    Creates a simulator of an instance, `netmodel_args` and `worker_args` are passed
+    to the netmodel and to all workers
+    """
     inf = 2**32
 
     def create_worker(wargs):
         if instance.netmodel == "simple":
-            return Worker(**wargs, max_downloads=inf, max_downloads_per_worker=inf)
-        return Worker(**wargs)
+            return Worker(**wargs, max_downloads=inf, max_downloads_per_worker=inf,
+                          **worker_args)
+        return Worker(**wargs, **worker_args)
 
-    begin_time = time.monotonic()
     workers = [create_worker(wargs) for wargs in CLUSTERS[instance.cluster_name]]
-    netmodel = NETMODELS[instance.netmodel](instance.bandwidth)
+    netmodel = NETMODELS[instance.netmodel](instance.bandwidth, **(netmodel_args or {}))
     scheduler = SCHEDULERS[instance.scheduler_name]()
-    simulator = Simulator(instance.graph, workers, scheduler, netmodel, trace=True)
-    try:
-        sim_time = simulator.run()
-        runtime = time.monotonic() - begin_time
-        transfer = 0
-        for e in simulator.trace_events:
-            if isinstance(e, FetchEndTraceEvent):
-                transfer += e.output.size
-        return sim_time, runtime, transfer
-    except Exception:
-        traceback.print_exc()
-        print("ERROR INSTANCE: {}".format(instance), file=sys.stderr)
-        return None, None, None
+    return Simulator(instance.graph, workers, scheduler, netmodel)
 
 
-def benchmark_scheduler(instance):
-    return [run_single_instance(instance)
-            for _ in range(instance.count)]
+class InstanceFailure:
 
+    def __init__(self, reason):
+        self.reason = reason
 
-def process_multiprocessing(instance):
-    instance = instance._replace(graph=json_deserialize(instance.graph))
-    return benchmark_scheduler(instance)
+    def __repr__(self):
+        return "<InstanceFailure {}>".format(self.reason)
 
 
-def run_multiprocessing(pool, instances):
-    return pool.imap(process_multiprocessing, instances)
+def run_single_instance(instance, simulator, sampler=None):
+    """
+    Runs one repetition of an instance, returns (makespan, scheduler time, total transfer,
+    wall time of the simulation) or InstanceFailure if the simulation raised an error.
+
+    MemoryError is propagated, the process that computes the instance is replaced.
+    """
+    if sampler is not None:
+        sampler.start()
+    try:
+        start = time.perf_counter()
+        sim_time = simulator.run()
+        wall_time = time.perf_counter() - start
+        statistics = simulator.statistics
+        return sim_time, statistics.scheduler_time, statistics.total_transfer, wall_time
+    except MemoryError:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        print("ERROR INSTANCE: {}".format(instance._replace(graph=None)), file=sys.stderr)
+        return InstanceFailure("error ({})".format(type(e).__name__))
+    finally:
+        if sampler is not None:
+            sampler.stop()
+
+
+def benchmark_scheduler(instance, sampler=None):
+    # Workers and the network model are reused between repetitions,
+    # each repetition gets a fresh scheduler
+    simulator = create_simulator(instance)
+    results = []
+    for i in range(instance.count):
+        if i > 0:
+            simulator.reset(SCHEDULERS[instance.scheduler_name]())
+        results.append(run_single_instance(instance, simulator, sampler))
+    return results
+
+
+def load_instance_graph(instance, graph):
+    graph = json_deserialize(graph)
+    IMODES[instance.imode](graph)
+    return graph
+
+
+def process_multiprocessing(instance, sampler=None):
+    instance = instance._replace(graph=load_instance_graph(instance, instance.graph))
+    return benchmark_scheduler(instance, sampler)
+
+
+def estimate_instance_cost(instance):
+    # The size of the serialized graph is a cheap proxy of the number of tasks and edges
+    return len(instance.graph) * instance.count
+
+
+def make_chunks(instances, processes, cost_fn=estimate_instance_cost, chunks_per_process=4):
+    """
+    Splits instances into chunks with roughly equal estimated cost, so that cheap instances
+    are dispatched together while expensive ones are dispatched alone.
+    """
+    costs = [cost_fn(instance) for instance in instances]
+    limit = sum(costs) / max(1, processes * chunks_per_process)
+
+    chunks = []
+    chunk = []
+    chunk_cost = 0
+    for index, (instance, cost) in enumerate(zip(instances, costs)):
+        chunk.append((index, instance))
+        chunk_cost += cost
+        if chunk_cost >= limit:
+            chunks.append(chunk)
+            chunk = []
+            chunk_cost = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def runner_process(connection, memory_limit, profile):
+    init_worker()
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    while True:
+        chunk = connection.recv()
+        if chunk is None:
+            return
+        for index, instance in chunk:
+            connection.send(("start", index))
+            sampler = StackSampler(root=run_single_instance) if profile else None
+            try:
+                result = process_multiprocessing(instance, sampler)
+            except MemoryError:
+                # The process may be in an inconsistent state, let the runner replace it
+                connection.send(("failed", index, "memory"))
+                return
+            connection.send(("done", index, result, sampler.stacks if profile else None))
+
+
+class RunnerSlot:
+
+    def __init__(self, memory_limit, profile):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=runner_process,
+                                               args=(child_connection, memory_limit, profile),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.pending = []
+        self.running = None
+        self.start_time = None
+
+    def assign(self, chunk):
+        self.pending = [index for index, _ in chunk]
+        self.connection.send(chunk)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class InstanceRunner:
+    """
+    Pool of processes computing benchmark instances.
+
+    Instances are dispatched in chunks of roughly equal estimated cost. Each instance
+    is limited by a wall-clock time (`instance_timeout` in seconds) and each process
+    by its address space (`memory_limit` in bytes). When a limit is exceeded, the process
+    is killed and replaced by a fresh one, the rest of its chunk is dispatched again,
+    and the instance is reported with an `InstanceFailure` result.
+
+    When `profile` is True, simulations are sampled by `StackSampler` and the stacks
+    are aggregated in `profiles` ({(scheduler_name, netmodel): stacks}).
+    """
+
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, processes=None, instance_timeout=None, memory_limit=None,
+                 cost_fn=estimate_instance_cost, profile=False):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.instance_timeout = instance_timeout
+        self.memory_limit = memory_limit
+        self.cost_fn = cost_fn
+        self.profile = profile
+        self.profiles = collections.defaultdict(collections.Counter)
+
+    def run(self, instances):
+        """
+        Generates pairs (instance, result) in the order of completion.
+        """
+        from multiprocessing.connection import wait
+
+        chunks = collections.deque(make_chunks(instances, self.processes, self.cost_fn))
+        slots = [RunnerSlot(self.memory_limit, self.profile)
+                 for _ in range(min(self.processes, len(chunks)))]
+        remaining = len(instances)
+
+        def dispatch(slot):
+            if chunks:
+                slot.assign(chunks.popleft())
+
+        def replace(slot, reason):
+            slot.kill()
+            index = slot.running if slot.running is not None else slot.pending[0]
+            rest = [(i, instances[i]) for i in slot.pending if i != index]
+            if rest:
+                chunks.appendleft(rest)
+            new_slot = RunnerSlot(self.memory_limit, self.profile)
+            slots[slots.index(slot)] = new_slot
+            dispatch(new_slot)
+            return instances[index], InstanceFailure(reason)
+
+        for slot in slots:
+            dispatch(slot)
+
+        try:
+            while remaining:
+                connections = {slot.connection: slot for slot in slots if slot.pending}
+                ready = wait(list(connections), timeout=self.POLL_INTERVAL)
+                for connection in ready:
+                    slot = connections[connection]
+                    try:
+                        message = connection.recv()
+                    except EOFError:
+                        remaining -= 1
+                        yield replace(slot, "crashed")
+                        continue
+                    if message[0] == "start":
+                        slot.running = message[1]
+                        slot.start_time = time.monotonic()
+                        continue
+                    remaining -= 1
+                    if message[0] == "failed":
+                        yield replace(slot, message[2])
+                        continue
+                    index = message[1]
+                    slot.pending.remove(index)
+                    slot.running = None
+                    if message[3]:
+                        instance = instances[index]
+                        self.profiles[(instance.scheduler_name, instance.netmodel)].update(
+                            message[3])
+                    yield instances[index], message[2]
+                    if not slot.pending:
+                        dispatch(slot)
+
+                if self.instance_timeout:
+                    now = time.monotonic()
+                    for slot in slots[:]:
+                        if (slot.running is not None and
+                                now - slot.start_time > self.instance_timeout):
+                            remaining -= 1
+                            yield replace(slot, "timeout")
+        finally:
+            for slot in slots:
+                slot.kill()
 
 
 def process_dask(conf):
     (graph, instance) = conf
-    instance = instance._replace(graph=json_deserialize(graph))
+    instance = instance._replace(graph=load_instance_graph(instance, graph))
     return benchmark_scheduler(instance)
 
 
@@ -243,6 +622,7 @@ def run_dask(instances, cluster):
 
     graphs = {}
     instance_to_graph = {}
+    original_instances = instances
     instances = list(instances)
     for (i, instance) in enumerate(instances):
         if instance.graph not in graphs:
@@ -251,54 +631,137 @@ def run_dask(instances, cluster):
         instance_to_graph[inst] = graphs[instance.graph]
         instances[i] = inst
 
-    results = client.map(process_dask, ((instance_to_graph[i], i) for i in instances))
-    return client.gather(results)
+    # Instances are expected to be sorted by their cost, the first ones get the highest priority
+    results = [client.submit(process_dask, (instance_to_graph[inst], inst),
+                             priority=len(instances) - i, pure=False)
+               for i, inst in enumerate(instances)]
+    return zip(original_instances, client.gather(results))
+
+
+def make_graph_batches(instances, batch_size, cost_fn=estimate_instance_cost):
+    """
+    Groups instances by their graph and splits each group into batches of at most
+    `batch_size` instances. Returns a list of (instances, cost), batches of a graph
+    are placed at the position of the first instance of the graph.
+    """
+    groups = {}
+    for instance in instances:
+        groups.setdefault(instance.graph_id, []).append(instance)
+
+    batches = []
+    for group in groups.values():
+        for i in range(0, len(group), batch_size):
+            batch = group[i:i + batch_size]
+            batches.append((batch, sum(cost_fn(instance) for instance in batch)))
+    return batches
+
+
+def process_dask_batch(graph, batch):
+    return [benchmark_scheduler(instance._replace(graph=load_instance_graph(instance, graph)))
+            for instance in batch]
+
+
+def run_dask_batched(instances, cluster, batch_size, cost_fn=estimate_instance_cost):
+    """
+    Computes instances on Dask in batches of instances sharing the same graph.
+
+    Each batch is pinned to the worker with the lowest estimated load (per thread) and
+    its graph is scattered only to that worker. Results are generated as batches complete.
+    """
+    from dask.distributed import Client, as_completed
+
+    client = Client(cluster)
+    workers = client.scheduler_info()["workers"]
+    threads = {address: info.get("nthreads", 1) for address, info in workers.items()}
+    loads = {address: 0 for address in workers}
+
+    batches = make_graph_batches(instances, batch_size, cost_fn)
+    graphs = {}
+    futures = {}
+    for i, (batch, cost) in enumerate(batches):
+        worker = min(loads, key=lambda address: loads[address] / threads[address])
+        loads[worker] += cost
+        key = (batch[0].graph_id, worker)
+        if key not in graphs:
+            graphs[key] = client.scatter(batch[0].graph, workers=[worker], hash=False)
+        future = client.submit(process_dask_batch, graphs[key],
+                               [instance._replace(graph=None) for instance in batch],
+                               workers=[worker], allow_other_workers=False,
+                               priority=len(batches) - i, pure=False)
+        futures[future] = batch
+
+    for future in as_completed(futures):
+        batch = futures.pop(future)
+        yield from zip(batch, future.result())
 
 
 def init_worker():
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
-def compute(instances, timeout=0, dask_cluster=None):
-    rows = []
-
+def compute(instances, store, timeout=0, dask_cluster=None,
+            instance_timeout=None, memory_limit=None, cost_fn=estimate_instance_cost,
+            profile=False, dask_batch_size=None):
     if not instances:
-        return rows
+        return 0
 
+    runner = None
     if dask_cluster:
-        iterator = run_dask(instances, dask_cluster)
+        if profile:
+            print("Profiling is not supported with Dask", file=sys.stderr)
+        if dask_batch_size:
+            iterator = run_dask_batched(instances, dask_cluster, dask_batch_size, cost_fn)
+        else:
+            iterator = run_dask(instances, dask_cluster)
     else:
-        pool = multiprocessing.Pool(initializer=init_worker)
-        iterator = run_multiprocessing(pool, instances)
+        runner = InstanceRunner(instance_timeout=instance_timeout, memory_limit=memory_limit,
+                                cost_fn=cost_fn, profile=profile)
+        iterator = runner.run(instances)
 
     if timeout:
         print("Timeout set to {} seconds".format(timeout))
 
+    row_count = 0
+
     def run():
+        nonlocal row_count
         counter = 0
         try:
-            for instance, result in tqdm(zip(instances, iterator), total=len(instances)):
+            for instance, result in tqdm(iterator, total=len(instances)):
                 counter += 1
-                for r_time, r_runtime, r_transfer in result:
-                    if r_time is not None:
-                        rows.append((
-                            instance.graph_set,
-                            instance.graph_name,
-                            instance.graph_id,
-                            instance.cluster_name,
-                            instance.bandwidth,
-                            instance.netmodel,
-                            instance.scheduler_name,
-                            instance.imode,
-                            instance.min_sched_interval,
-                            instance.sched_time,
-                            r_time,
-                            r_runtime,
-                            r_transfer
-                        ))
+                if isinstance(result, InstanceFailure):
+                    print("Instance failed ({}): {}".format(
+                        result.reason, instance._replace(graph=None)), file=sys.stderr)
+                    store.append_failure(instance, result.reason)
+                    continue
+                rows = []
+                for repetition in result:
+                    if isinstance(repetition, InstanceFailure):
+                        print("Repetition failed ({}): {}".format(
+                            repetition.reason, instance._replace(graph=None)), file=sys.stderr)
+                        store.append_failure(instance, repetition.reason, 1)
+                        continue
+                    r_time, r_runtime, r_transfer, r_wall_time = repetition
+                    rows.append((
+                        instance.graph_set,
+                        instance.graph_name,
+                        instance.graph_id,
+                        instance.cluster_name,
+                        instance.bandwidth,
+                        instance.netmodel,
+                        instance.scheduler_name,
+                        instance.imode,
+                        instance.min_sched_interval,
+                        instance.sched_time,
+                        r_time,
+                        r_runtime,
+                        r_transfer,
+                        r_wall_time
+                    ))
+                store.append(rows)
+                row_count += len(rows)
         except:
-            print("Benchmark interrupted, iterated {} instances. Writing intermediate results"
-                  .format(counter))
+            print("Benchmark interrupted, iterated {} instances".format(counter))
 
     if timeout:
         thread = threading.Thread(target=run)
@@ -310,33 +773,58 @@ def compute(instances, timeout=0, dask_cluster=None):
     else:
         run()
 
-    return rows
+    if runner is not None and runner.profiles:
+        profiles = dict(runner.profiles)
+        for path in write_profiles(profiles, "{}.profile".format(store.resultfile)):
+            print("Profile written to '{}'".format(path))
+
+    return row_count
+
+
+def create_cost_model(configs, store, cost_files=()):
+    columns = ["graph_id", "cluster_name", "scheduler_name", "netmodel", "wall_time"]
+    results = pd.concat([store.read(columns)] +
+                        [read_csv_columns(path, columns) for path in cost_files],
+                        ignore_index=True)
+    graph_frame = pd.concat([config.graph_frame for config in configs], ignore_index=True)
 
+    cost_model = CostModel(CLUSTERS)
+    if cost_model.fit(results, graph_frame):
+        print("Cost model fitted from {} results".format(len(results)))
+    return cost_model
 
-def run_benchmark(configs, oldframe, resultfile, skip_completed, timeout=0, dask_cluster=None):
+
+def run_benchmark(configs, store, skip_completed, timeout=0, dask_cluster=None, compact=True,
+                  instance_timeout=None, memory_limit=None, cost_files=(), profile=False,
+                  dask_batch_size=None, skip_failed=False):
     for config in configs:
         print(config)
 
-    instances = create_instances(configs, oldframe, skip_completed, 5)
-    rows = compute(instances, timeout, dask_cluster)
-    if not rows:
+    frame = store.read_keys(skip_failed) if skip_completed else None
+    if skip_completed and not skip_failed:
+        failures = len(store.read_failures(INSTANCE_KEY_COLUMNS))
+        if failures:
+            print("{} failed repetitions found in '{}' are computed again "
+                  "(use --skip-failed to skip them)".format(failures, store.failure_file))
+    instances = create_instances(configs, frame, skip_completed, 5)
+
+    # Longest processing time first
+    cost_model = create_cost_model(configs, store, cost_files)
+    instances.sort(key=cost_model.predict, reverse=True)
+
+    row_count = compute(instances, store, timeout, dask_cluster, instance_timeout, memory_limit,
+                        cost_model.predict, profile, dask_batch_size)
+    if not row_count:
         print("No results were computed")
-        return
-
-    frame = pd.DataFrame(rows, columns=COLUMNS)
-    print(frame.groupby(["graph_name", "graph_id", "cluster_name",
-                         "bandwidth", "netmodel", "imode", "min_sched_interval", "sched_time",
-                         "scheduler_name"]).mean())
-
-    if len(frame) > 0:
-        base, ext = os.path.splitext(resultfile)
-        path = "{}.backup{}".format(base, ext)
-        print("Creating backup of old results to '{}'".format(path))
-        write_resultfile(oldframe, path)
+    else:
+        frame = store.read_current_shard()
+        print(frame.groupby(["graph_name", "graph_id", "cluster_name",
+                             "bandwidth", "netmodel", "imode", "min_sched_interval",
+                             "sched_time", "scheduler_name"]).mean(numeric_only=True))
+        print("{} new entries stored in '{}'".format(row_count, store.shard_path))
 
-    newframe = pd.concat([oldframe, frame], ignore_index=True)
-    write_resultfile(newframe, resultfile)
-    print("{} entries in new '{}'".format(newframe["time"].count(), resultfile))
+    if compact:
+        store.compact()
 
 
 def skip_completed_instances(instances, frame, repeat, columns, batch):
@@ -385,14 +873,7 @@ def limit_max_count(instances, max_count):
 
 def create_instances(configs, frame, skip_completed, max_count):
     total_instances = []
-    columns = ["graph_id",
-               "cluster_name",
-               "bandwidth",
-               "netmodel",
-               "scheduler_name",
-               "imode",
-               "min_sched_interval",
-               "sched_time"]
+    columns = INSTANCE_KEY_COLUMNS
     batch = {}
 
     for config in configs:
@@ -409,7 +890,8 @@ def create_instances(configs, frame, skip_completed, max_count):
 
 
 def load_resultfile(resultfile, append):
-    if os.path.isfile(resultfile):
+    store = ResultStore(resultfile)
+    if store.exists():
         if not append:
             print("Result file '{}' already exists\n"
                   "Remove --no-append to append results to it".format(resultfile),
@@ -417,13 +899,12 @@ def load_resultfile(resultfile, append):
             exit(1)
 
         print("Appending to result file '{}'".format(resultfile))
-
-        oldframe = pd.read_csv(resultfile)
-        assert list(oldframe.columns) == COLUMNS
+        columns = store.read_columns()
+        # Result files of older versions may miss the last columns
+        assert columns == COLUMNS[:len(columns)]
     else:
         print("Creating result file '{}'".format(resultfile))
-        oldframe = pd.DataFrame([], columns=COLUMNS)
-    return oldframe
+    return store
 
 
 def write_resultfile(frame, resultfile):
@@ -469,12 +950,34 @@ def parse_timeout(timeout):
 @click.option("--append/--no-append", default=True, help="Exit if the resultfile already exists.")
 @click.option("--skip-completed/--no-skip_completed", default=True,
               help="Skip already computed instances found in the resultfile.")
+@click.option("--skip-failed/--no-skip-failed", default=False,
+              help="Skip instances that failed in previous runs (with --skip-completed).")
 @click.option("--graphs", help="Comma separated list of graphs to be used from the input graphset")
 @click.option("--timeout", help="Timeout for the computation. Format hh:mm:ss.")
 @click.option("--dask-cluster", help="Address of Dask scheduler.")
+@click.option("--dask-batch-size", type=int,
+              help="Group instances of the same graph into Dask tasks of at most this size. "
+                   "Each graph is sent only to workers computing its instances "
+                   "(by default, every graph is broadcast to all workers).")
+@click.option("--compact/--no-compact", default=True,
+              help="Merge result shards into the resultfile at the end of the computation.")
+@click.option("--instance-timeout",
+              help="Wall-clock limit of a single instance. Format hh:mm:ss. "
+                   "Not supported with --dask-cluster.")
+@click.option("--memory-limit", type=int,
+              help="Memory limit of a single benchmark process in MiB. "
+                   "Not supported with --dask-cluster.")
+@click.option("--cost-model",
+              help="Comma separated list of result files used to predict instance runtimes "
+                   "(the resultfile is always used).")
+@click.option("--profile/--no-profile", default=False,
+              help="Sample call stacks of simulations and write them per scheduler and netmodel "
+                   "in the folded (flame graph) format into <resultfile>.profile. "
+                   "Not supported with --dask-cluster.")
 def compute_cmd(graphset, resultfile, scheduler, cluster, bandwidth,
-                netmodel, imode, sched_timing, repeat, append, skip_completed,
-                graphs, timeout, dask_cluster):
+                netmodel, imode, sched_timing, repeat, append, skip_completed, skip_failed,
+                graphs, timeout, dask_cluster, dask_batch_size, compact, instance_timeout,
+                memory_limit, cost_model, profile):
     def parse_option(value, keys):
         if value == "all":
             return list(keys)
@@ -490,6 +993,9 @@ def compute_cmd(graphset, resultfile, scheduler, cluster, bandwidth,
     imodes = parse_option(imode, IMODES)
     sched_timings = parse_option(sched_timing, SCHED_TIMINGS)
     timeout = parse_timeout(timeout)
+    instance_timeout = parse_timeout(instance_timeout)
+    if memory_limit:
+        memory_limit *= 1024 * 1024
 
     graph_frame = load_graphs(graphsets, None if graphs is None else graphs.split(","))
     if len(graph_frame) == 0:
@@ -498,9 +1004,12 @@ def compute_cmd(graphset, resultfile, scheduler, cluster, bandwidth,
 
     config = BenchmarkConfig(graph_frame, schedulers, clusters, netmodels, bandwidths, imodes,
                              sched_timings, repeat)
-    frame = load_resultfile(resultfile, append)
+    store = load_resultfile(resultfile, append)
 
-    run_benchmark([config], frame, resultfile, skip_completed, timeout, dask_cluster)
+    run_benchmark([config], store, skip_completed, timeout, dask_cluster, compact,
+                  instance_timeout, memory_limit,
+                  cost_model.split(",") if cost_model else (), profile, dask_batch_size,
+                  skip_failed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+
+
+class CostModel:
+    """
+    Predicts the wall time of benchmark instances from previous results.
+
+    The model is a log-linear regression fitted on the `wall_time` column
+    (the wall time of the whole simulation, not only of the scheduler):
+
+        log(time) = intercept + scheduler + netmodel
+                    + c1 * log(tasks) + c2 * log(edges + 1)
+                    + c3 * log(workers) + c4 * log(cpus)
+
+    where `scheduler` and `netmodel` are per-value offsets. Values not seen during
+    fitting get a zero offset. When there is not enough data to fit the model,
+    the size of the serialized graph is used as a (relative) cost.
+    """
+
+    MIN_SAMPLES = 10
+
+    def __init__(self, clusters):
+        self.clusters = clusters
+        self.graphs = {}
+        self.schedulers = []
+        self.netmodels = []
+        self.coefficients = None
+
+    def graph_features(self, graph_id, graph):
+        features = self.graphs.get(graph_id)
+        if features is None:
+            tasks = json.loads(graph)
+            features = (len(tasks), sum(len(t["inputs"]) for t in tasks))
+            self.graphs[graph_id] = features
+        return features
+
+    def features(self, graph_id, graph, cluster_name, scheduler_name, netmodel):
+        tasks, edges = self.graph_features(graph_id, graph)
+        cluster = self.clusters[cluster_name]
+        row = [1.0,
+               np.log(max(tasks, 1)),
+               np.log(edges + 1),
+               np.log(len(cluster)),
+               np.log(sum(w["cpus"] for w in cluster))]
+        row += [float(scheduler_name == s) for s in self.schedulers]
+        row += [float(netmodel == n) for n in self.netmodels]
+        return row
+
+    def fit(self, results, graph_frame):
+        """
+        Fits the model.
+
+        :param results: frame with columns graph_id, cluster_name, scheduler_name,
+                        netmodel and wall_time
+        :param graph_frame: frame with columns graph_id and graph (serialized graph)
+        """
+        graphs = dict(zip(graph_frame["graph_id"], graph_frame["graph"]))
+        results = results[results["graph_id"].isin(graphs) &
+                          results["cluster_name"].isin(list(self.clusters)) &
+                          (results["wall_time"] > 0)]
+        results = results.groupby(
+            ["graph_id", "cluster_name", "scheduler_name", "netmodel"]
+        )["wall_time"].mean().reset_index()
+
+        if len(results) < self.MIN_SAMPLES:
+            self.coefficients = None
+            return False
+
+        self.schedulers = sorted(results["scheduler_name"].unique())[1:]
+        self.netmodels = sorted(results["netmodel"].unique())[1:]
+
+        x = np.array([self.features(row.graph_id, graphs[row.graph_id], row.cluster_name,
+                                    row.scheduler_name, row.netmodel)
+                      for row in results.itertuples()])
+        y = np.log(results["wall_time"].values)
+        self.coefficients = np.linalg.lstsq(x, y, rcond=None)[0]
+        return True
+
+    def predict(self, instance):
+        """
+        Returns the predicted cost of all repetitions of the instance
+        """
+        if self.coefficients is None:
+            return len(instance.graph) * instance.count
+        row = self.features(instance.graph_id, instance.graph, instance.cluster_name,
+                            instance.scheduler_name, instance.netmodel)
+        return float(np.exp(np.dot(row, self.coefficients))) * instance.count
@@ -0,0 +1,103 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns identifying a group of repeated measurements
+KEY_COLUMNS = ["graph_set", "graph_name", "graph_id", "cluster_name", "bandwidth", "netmodel",
+               "scheduler_name", "imode", "min_sched_interval", "sched_time"]
+
+# The best makespan in these groups is used to compute the score
+SCORE_COLUMNS = ["graph_id", "cluster_name", "bandwidth", "netmodel"]
+
+VALUE_COLUMNS = ["time", "execution_time", "total_transfer"]
+
+CATEGORY_COLUMNS = ["graph_set", "graph_name", "graph_id", "cluster_name", "netmodel",
+                    "scheduler_name", "imode"]
+
+DTYPES = dict({c: "category" for c in CATEGORY_COLUMNS},
+              bandwidth=np.float64, min_sched_interval=np.float64, sched_time=np.float64,
+              time=np.float64, execution_time=np.float64, total_transfer=np.float64)
+
+CUBE_VERSION = 1
+
+
+def cube_path(resultfile):
+    return "{}.cube.pkl".format(resultfile)
+
+
+def build_cube(frame):
+    """
+    Aggregates raw results into a cube with one row per KEY_COLUMNS combination.
+
+    Each row contains mean values of VALUE_COLUMNS, `time_min`, `time_max`,
+    the number of aggregated results (`count`) and the mean `score` (makespan divided
+    by the best makespan of the same graph/cluster/bandwidth/netmodel combination).
+    """
+    frame = frame.astype({c: t for c, t in DTYPES.items() if c in frame})
+    mins = frame.groupby(SCORE_COLUMNS, observed=True)["time"].transform("min")
+    frame = frame.assign(score=frame["time"] / mins)
+
+    groups = frame.groupby(KEY_COLUMNS, observed=True, sort=True)
+    cube = groups[VALUE_COLUMNS + ["score"]].mean()
+    cube["time_min"] = groups["time"].min()
+    cube["time_max"] = groups["time"].max()
+    cube["count"] = groups.size().astype(np.int32)
+    cube = cube.reset_index()
+    for column in CATEGORY_COLUMNS:
+        cube[column] = cube[column].cat.remove_unused_categories()
+    return cube
+
+
+def weighted_mean(cube, column, by=None):
+    """
+    Mean of `column` over the results aggregated in cube rows (rows are weighted by `count`).
+
+    If `by` is given, returns a series of means of groups of rows.
+    """
+    weighted = cube[column] * cube["count"]
+    if by is None:
+        return weighted.sum() / cube["count"].sum()
+    groups = cube.assign(weighted=weighted).groupby(by)
+    return groups["weighted"].sum() / groups["count"].sum()
+
+
+def save_cube(cube, path):
+    pd.to_pickle({"version": CUBE_VERSION, "cube": cube}, path)
+
+
+def load_cube(filename, rebuild=False):
+    """
+    Returns the cube of a result file.
+
+    `filename` is either a result file or a cube file. A cube is stored next to its result
+    file (<resultfile>.cube.pkl); it is (re)built when it is missing or older than the results
+    (including result shards).
+    """
+    from benchmark import ResultStore
+
+    if filename.endswith(".cube.pkl"):
+        return pd.read_pickle(filename)["cube"]
+
+    store = ResultStore(filename)
+    path = cube_path(filename)
+    if (not rebuild and os.path.isfile(path) and
+            os.path.getmtime(path) >= store.modification_time()):
+        data = pd.read_pickle(path)
+        if data.get("version") == CUBE_VERSION:
+            return data["cube"]
+
+    print("Building cube '{}'".format(path))
+    cube = build_cube(store.read(list(DTYPES), DTYPES))
+    save_cube(cube, path)
+    return cube
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build aggregated cubes of result files")
+    parser.add_argument("resultfile", nargs="+")
+    args = parser.parse_args()
+    for resultfile in args.resultfile:
+        cube = load_cube(resultfile, rebuild=True)
+        print("{}: {} rows".format(cube_path(resultfile), len(cube)))
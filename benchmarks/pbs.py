@@ -6,10 +6,10 @@ import sys
 import time
 
 import click
-import pandas as pd
 
 from benchmark import BenchmarkConfig, load_graphs, SCHEDULERS, CLUSTERS, NETMODELS, BANDWIDTHS, \
-    IMODES, SCHED_TIMINGS, create_instances, run_benchmark, parse_timeout, load_resultfile
+    IMODES, SCHED_TIMINGS, ResultStore, create_instances, run_benchmark, \
+    parse_timeout, load_resultfile
 
 BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
 DASK_PORT = 8786
@@ -120,18 +120,26 @@ def run_computation(index, input_file, definition):
         dask_cluster = "{}:{}".format(socket.gethostname(), DASK_PORT)
 
     graph_frame = load_graphs([input])
-    frame = load_resultfile(output, True)
+    store = load_resultfile(output, True)
 
     if is_pbs:
         with open(os.path.join(workdir, "output"), "w") as out:
             with open(os.path.join(workdir, "error"), "w") as err:
                 sys.stdout = out
                 sys.stderr = err
-                run_benchmark(parse_configs(definition, graph_frame), frame, output, True,
-                              parse_timeout(definition.get("timeout")), dask_cluster)
+                run_benchmark(parse_configs(definition, graph_frame), store, True,
+                              parse_timeout(definition.get("timeout")), dask_cluster,
+                              instance_timeout=parse_timeout(definition.get("instance-timeout")),
+                              profile=definition.get("profile", False),
+                              dask_batch_size=definition.get("dask-batch-size"),
+                              skip_failed=definition.get("skip-failed", False))
     else:
-        run_benchmark(parse_configs(definition, graph_frame), frame, output, True,
-                      parse_timeout(definition.get("timeout")), dask_cluster)
+        run_benchmark(parse_configs(definition, graph_frame), store, True,
+                      parse_timeout(definition.get("timeout")), dask_cluster,
+                      instance_timeout=parse_timeout(definition.get("instance-timeout")),
+                      profile=definition.get("profile", False),
+                      dask_batch_size=definition.get("dask-batch-size"),
+                      skip_failed=definition.get("skip-failed", False))
 
 
 def run_pbs(input_file, definition):
@@ -147,8 +155,9 @@ def run_pbs(input_file, definition):
         graph_frame = load_graphs([input])
         configs = parse_configs(definition, graph_frame)
 
-        if os.path.isfile(output):
-            oldframe = pd.read_csv(output)
+        store = ResultStore(output)
+        if store.exists():
+            oldframe = store.read_keys(definition.get("skip-failed", False))
             instances = create_instances(configs, oldframe, True, 5)
             if not instances:
                 print("All instances were completed for {}".format(input))
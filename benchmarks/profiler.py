@@ -0,0 +1,79 @@
+import collections
+import os
+import signal
+
+
+class StackSampler:
+    """
+    Sampling profiler that counts Python call stacks.
+
+    Stacks are sampled by SIGPROF every `interval` seconds of CPU time, so the sampler
+    works only in the main thread of a process on Unix. Collected stacks can be written
+    in the collapsed ("folded") format understood by flamegraph.pl, inferno or speedscope.
+    If `root` function is given, stacks start at its frame (callers are omitted).
+    """
+
+    def __init__(self, interval=0.001, root=None):
+        self.interval = interval
+        self.root = root.__code__ if root is not None else None
+        self.stacks = collections.Counter()
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("{} ({}:{})".format(code.co_name,
+                                            os.path.basename(code.co_filename),
+                                            code.co_firstlineno))
+            if code is self.root:
+                break
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def read_folded(filename):
+    stacks = collections.Counter()
+    with open(filename) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def write_folded(stacks, filename):
+    with open(filename, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write("{} {}\n".format(stack, count))
+
+
+def write_profiles(profiles, directory):
+    """
+    Writes profiles {(scheduler_name, netmodel): stacks} into `directory`, one
+    `<scheduler>-<netmodel>.folded` file per key. Stacks are added to the content
+    of existing files, so profiles of resumed computations are accumulated.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for (scheduler_name, netmodel), stacks in profiles.items():
+        path = os.path.join(directory, "{}-{}.folded".format(scheduler_name, netmodel))
+        if os.path.isfile(path):
+            stacks = stacks + read_folded(path)
+        write_folded(stacks, path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,81 @@
+import click
+import numpy
+import pandas as pd
+
+from benchmark import BANDWIDTHS, CLUSTERS, IMODES, Instance, NETMODELS, SCHEDULERS, \
+    create_simulator, load_graphs, load_instance_graph
+from estee.schedulers import RecordingScheduler, SchedulerRecording, replay_recording
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command("record")
+@click.argument("graphset")
+@click.argument("graph_name")
+@click.argument("output")
+@click.option("--scheduler", default="blevel", type=click.Choice(list(SCHEDULERS)))
+@click.option("--cluster", default="8x4", type=click.Choice(list(CLUSTERS)))
+@click.option("--netmodel", default="maxmin", type=click.Choice(list(NETMODELS)))
+@click.option("--bandwidth", default="2G", type=click.Choice(list(BANDWIDTHS)))
+@click.option("--imode", default="exact", type=click.Choice(list(IMODES)))
+def record_cmd(graphset, graph_name, output, scheduler, cluster, netmodel, bandwidth, imode):
+    """
+    Simulate a graph and record messages sent to the scheduler into OUTPUT
+    """
+    frame = load_graphs([graphset], [graph_name])
+    if len(frame) == 0:
+        raise click.BadParameter("Graph '{}' not found".format(graph_name))
+    row = frame.iloc[0]
+    instance = Instance(row["graph_set"], graph_name, row["graph_id"], None, cluster,
+                        BANDWIDTHS[bandwidth], netmodel, scheduler, imode, 0, 0, 1)
+    instance = instance._replace(graph=load_instance_graph(instance, row["graph"]))
+
+    simulator = create_simulator(instance)
+    recorder = RecordingScheduler(simulator.scheduler)
+    simulator.scheduler = recorder
+    makespan = simulator.run()
+    recorder.recording.save(output)
+    print("Makespan: {}, {} messages recorded into '{}'".format(
+        makespan, recorder.recording.message_count, output))
+
+
+@cli.command("run")
+@click.argument("recording")
+@click.argument("scheduler", type=click.Choice(list(SCHEDULERS)))
+@click.option("--repeat", default=1, help="Number of replays, the best time of each call "
+                                          "is reported.")
+@click.option("--check/--no-check", default=False,
+              help="Compare schedules with the recorded ones.")
+@click.option("--output", help="Write times of individual calls into a CSV file.")
+def run_cmd(recording, scheduler, repeat, check, output):
+    """
+    Replay a RECORDING to SCHEDULER and measure its schedule() calls
+    """
+    recording = SchedulerRecording.load(recording)
+    schedule_times = []
+    message_times = []
+    for i in range(repeat):
+        result = replay_recording(SCHEDULERS[scheduler](), recording, check and i == 0)
+        if check and i == 0 and result.mismatches:
+            print("Schedules differ from the recording in {} messages (first: {})".format(
+                len(result.mismatches), result.mismatches[0]))
+        schedule_times.append(result.schedule_times)
+        message_times.append(result.message_times)
+
+    frame = pd.DataFrame({
+        "schedule_time": numpy.min(schedule_times, axis=0),
+        "message_time": numpy.min(message_times, axis=0),
+        "time": [event[0] for event in recording.events],
+    })
+    print(frame[["schedule_time", "message_time"]].describe())
+    print("Total schedule time: {:.6f}s, total message time: {:.6f}s".format(
+        frame["schedule_time"].sum(), frame["message_time"].sum()))
+    if output:
+        frame.to_csv(output, index_label="message")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,9 +1,10 @@
 import argparse
 
 import matplotlib.pyplot as plt
-import pandas as pd
 import seaborn
 
+from cube import load_cube
+
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -43,15 +44,15 @@ def draw_lineplot(*args, **kw):
 
 
 def draw_frame(frame, args, title=None):
-    # normalize by minimum schedule found for each graph/cluster/bandwidth/netmodel combination
-    mins = frame.groupby(["graph_id", "cluster_name",
-                          "bandwidth", "netmodel"])["time"].transform(pd.Series.min)
-    frame["score"] = frame["time"] / mins
+    # score (normalized by minimum schedule found for each graph/cluster/bandwidth/netmodel
+    # combination) is precomputed in the cube as a mean over `count` results
 
     # calculate average for each graph/cluster/bandwidth/netmodel/scheduler/imode combination
+    frame = frame.assign(score_sum=frame["score"] * frame["count"])
     data = frame.groupby(["graph_id", "cluster_name",
                           "bandwidth", "netmodel",
-                          "scheduler_name", "imode"])["score"].mean().reset_index()
+                          "scheduler_name", "imode"])[["score_sum", "count"]].sum().reset_index()
+    data["score"] = data["score_sum"] / data["count"]
 
     # merge bandwidth and netmodel to a single column
     if len(data["netmodel"].unique()) > 1:
@@ -80,7 +81,9 @@ def draw_frame(frame, args, title=None):
 
 def main():
     args = parse_args()
-    data = pd.read_csv(args.dataset)
+    data = load_cube(args.dataset)
+    categories = data.select_dtypes("category").columns
+    data[categories] = data[categories].astype(str)
 
     if args.graph:
         data = data[data["graph_name"].isin(args.graph)].reset_index(drop=True)
@@ -0,0 +1,388 @@
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import click
+import numpy
+import pandas as pd
+
+from benchmark import BANDWIDTHS, CLUSTERS, Instance, NETMODELS, SCHEDULERS, create_simulator
+from estee.common import imode
+from estee.generators.elementary import fern, merge_triplets
+from estee.generators.irw import crossv, fastcrossv, gridcat, mapreduce
+from estee.generators.pegasus import epigenomics, montage
+from estee.generators.randomized import MGen, SGen, generate_randomized_graph
+from estee.schedulers.utils import compute_alap, compute_b_level_duration, \
+    compute_b_level_duration_size, compute_t_level_duration, create_scheduler_graph, \
+    get_size_estimate
+
+SEED = 42
+BANDWIDTH = "2G"
+
+GRAPHS = {
+    "merge_triplets": ("elementary", lambda: merge_triplets(111)),
+    "fern": ("elementary", lambda: fern(200)),
+    "gridcat": ("irw", lambda: gridcat(20)),
+    "mapreduce": ("irw", lambda: mapreduce(160)),
+    "montage": ("pegasus", lambda: montage(50)),
+    "epigenomics": ("pegasus", lambda: epigenomics(50)),
+    "sgen": ("randomized", lambda: generate_randomized_graph(SGen(), 15)),
+    "mgen": ("randomized", lambda: generate_randomized_graph(MGen(), 15)),
+}
+
+# Graphs where many workers download the same objects
+BROADCAST_GRAPHS = {
+    "crossv": ("irw", lambda: crossv(16)),
+    "fastcrossv": ("irw", lambda: fastcrossv(40)),
+}
+
+BROADCAST_POLICIES = ["producer", "least-loaded", "broadcast"]
+
+LEVELS = {
+    "b_level": lambda graph, bandwidth: compute_b_level_duration(graph),
+    "t_level": lambda graph, bandwidth: compute_t_level_duration(graph),
+    "b_level_size": lambda graph, bandwidth: compute_b_level_duration_size(
+        graph, get_size_estimate, bandwidth),
+    "alap": lambda graph, bandwidth: compute_alap(graph, get_size_estimate, bandwidth),
+}
+
+DEFAULT_SCHEDULERS = ["single", "blevel", "blevel-gt", "dls", "etf", "mcp", "ws"]
+DEFAULT_CLUSTERS = ["8x4", "32x4", "64x16"]
+
+KEY_COLUMNS = ["kind", "graph_set", "graph_name", "name", "cluster_name", "netmodel"]
+
+
+def set_seed(seed):
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+
+def create_graph(graph_name, graphs=GRAPHS):
+    set_seed(SEED)
+    graph = graphs[graph_name][1]()
+    graph.normalize()
+    for o in graph.objects.values():
+        if o.expected_size is None:
+            o.expected_size = o.size
+    imode.process_imode_exact(graph)
+    return graph
+
+
+def measure(fn, repeat, memory):
+    """
+    Calls `fn` `repeat` times and returns the best wall time [s].
+    When `memory` is True, `fn` is called once more under tracemalloc and its
+    peak memory [bytes] is returned as well (otherwise None).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(times), peak
+
+
+def count_events(simulator):
+    """
+    Runs the simulation and returns the number of processed simpy events
+    """
+    env = simulator.env
+    step = env.step
+    count = 0
+
+    def counting_step():
+        nonlocal count
+        count += 1
+        step()
+
+    env.step = counting_step
+    simulator.run()
+    return count
+
+
+def benchmark_levels(graph_set, graph_name, graph, repeat, memory):
+    bandwidth = BANDWIDTHS[BANDWIDTH]
+    wall_time, peak = measure(lambda: create_scheduler_graph(graph), repeat, memory)
+    yield {"kind": "levels", "graph_set": graph_set, "graph_name": graph_name,
+           "name": "create_scheduler_graph", "wall_time": wall_time, "peak_memory": peak}
+
+    scheduler_graph = create_scheduler_graph(graph)
+    for name, fn in LEVELS.items():
+        wall_time, peak = measure(lambda: fn(scheduler_graph, bandwidth), repeat, memory)
+        yield {"kind": "levels", "graph_set": graph_set, "graph_name": graph_name,
+               "name": name, "wall_time": wall_time, "peak_memory": peak}
+
+
+def benchmark_simulation(graph_set, graph_name, graph, cluster_name, netmodel, scheduler_name,
+                         repeat, memory):
+    instance = Instance(graph_set, graph_name, None, graph, cluster_name,
+                        BANDWIDTHS[BANDWIDTH], netmodel, scheduler_name, "exact", 0, 0, repeat)
+    simulator = create_simulator(instance)
+
+    scheduler_times = []
+    makespans = []
+
+    def run():
+        simulator.reset(SCHEDULERS[scheduler_name]())
+        set_seed(SEED)
+        makespans.append(simulator.run())
+        scheduler_times.append(simulator.statistics.scheduler_time)
+
+    wall_time, peak = measure(run, repeat, memory)
+    # the memory measurement (if any) is the last run and it is slowed down by tracemalloc
+    scheduler_time = min(scheduler_times[:repeat])
+    makespan = makespans[0]
+
+    simulator.reset(SCHEDULERS[scheduler_name]())
+    set_seed(SEED)
+    events = count_events(simulator)
+
+    return {"kind": "simulation", "graph_set": graph_set, "graph_name": graph_name,
+            "name": scheduler_name, "cluster_name": cluster_name, "netmodel": netmodel,
+            "wall_time": wall_time,
+            "scheduler_time": scheduler_time,
+            "simulation_time": max(wall_time - scheduler_time, 0.0),
+            "events": events,
+            "events_per_second": events / wall_time if wall_time > 0 else None,
+            "peak_memory": peak,
+            "makespan": makespan,
+            "tasks": graph.task_count}
+
+
+def parse_list(value, choices):
+    items = value.split(",")
+    for item in items:
+        if item not in choices:
+            raise click.BadParameter("Unknown value '{}', use one of: {}".format(
+                item, ", ".join(choices)))
+    return items
+
+
+def environment_info():
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.node(),
+        "numpy": numpy.__version__,
+        "timestamp": time.time(),
+    }
+
+
+def load_results(filename):
+    with open(filename) as f:
+        data = json.load(f)
+    frame = pd.DataFrame(data["results"])
+    for column in KEY_COLUMNS:
+        if column not in frame:
+            frame[column] = None
+    frame[KEY_COLUMNS] = frame[KEY_COLUMNS].fillna("")
+    return frame
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Joins two result frames and marks rows that got slower by more than `threshold`
+    (a relative change, e.g. 0.1 for 10 %) and rows whose simulated makespan changed.
+    """
+    columns = KEY_COLUMNS + ["wall_time", "events_per_second", "peak_memory", "makespan"]
+    columns = [c for c in columns if c in baseline and c in current]
+    frame = baseline[columns].merge(current[columns], on=KEY_COLUMNS,
+                                    suffixes=("_base", ""), how="inner")
+    frame["speedup"] = frame["wall_time_base"] / frame["wall_time"]
+    frame["regression"] = frame["wall_time"] > frame["wall_time_base"] * (1 + threshold)
+    if "makespan" in frame:
+        frame["makespan_changed"] = ~numpy.isclose(frame["makespan"].astype(float),
+                                                   frame["makespan_base"].astype(float),
+                                                   equal_nan=True)
+    else:
+        frame["makespan_changed"] = False
+    return frame
+
+
+def print_comparison(frame, threshold):
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_rows", None)
+    columns = ["kind", "graph_name", "name", "cluster_name", "netmodel",
+               "wall_time_base", "wall_time", "speedup"]
+    print(frame[columns].to_string(index=False, float_format="{:.4f}".format))
+
+    regressions = frame[frame["regression"]]
+    changed = frame[frame["makespan_changed"]]
+    speedup = numpy.exp(numpy.log(frame["speedup"]).mean()) if len(frame) else 1.0
+    print("\nCompared {} measurements, geometric mean speedup: {:.3f}".format(
+        len(frame), speedup))
+    print("Regressions (slower by more than {:.0f} %): {}".format(
+        threshold * 100, len(regressions)))
+    if len(changed):
+        # Not treated as a failure, some schedulers iterate over sets of tasks whose order
+        # depends on object addresses, so the makespan may differ between processes
+        print("Note: simulated makespan differs in {} measurements".format(len(changed)))
+    return len(regressions) == 0
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command("run")
+@click.argument("output")
+@click.option("--graph", default=",".join(GRAPHS), help="Comma separated list of graphs.")
+@click.option("--scheduler", default=",".join(DEFAULT_SCHEDULERS),
+              help="Comma separated list of schedulers.")
+@click.option("--cluster", default=",".join(DEFAULT_CLUSTERS),
+              help="Comma separated list of clusters.")
+@click.option("--netmodel", default=",".join(NETMODELS),
+              help="Comma separated list of network models.")
+@click.option("--repeat", default=3, help="Number of timed runs, the best one is reported.")
+@click.option("--memory/--no-memory", default=True,
+              help="Measure peak memory in an extra (untimed) run.")
+@click.option("--baseline", help="Compare the results with this result file.")
+@click.option("--threshold", default=0.1, help="Allowed relative slowdown against the baseline.")
+def run_cmd(output, graph, scheduler, cluster, netmodel, repeat, memory, baseline, threshold):
+    graph_names = parse_list(graph, GRAPHS)
+    schedulers = parse_list(scheduler, SCHEDULERS)
+    clusters = parse_list(cluster, CLUSTERS)
+    netmodels = parse_list(netmodel, NETMODELS)
+
+    results = []
+    for graph_name in graph_names:
+        graph_set = GRAPHS[graph_name][0]
+        graph = create_graph(graph_name)
+        print("{}/{} #t={} #o={}".format(graph_set, graph_name,
+                                         graph.task_count, len(graph.objects)))
+        results.extend(benchmark_levels(graph_set, graph_name, graph, repeat, memory))
+        for cluster_name in clusters:
+            for netmodel_name in netmodels:
+                for scheduler_name in schedulers:
+                    result = benchmark_simulation(graph_set, graph_name, graph,
+                                                  cluster_name, netmodel_name, scheduler_name,
+                                                  repeat, memory)
+                    print("  {:8} {:11} {:10} {:8.4f}s {:10.0f} events/s".format(
+                        cluster_name, netmodel_name, scheduler_name,
+                        result["wall_time"], result["events_per_second"] or 0))
+                    results.append(result)
+
+    with open(output, "w") as f:
+        json.dump({"environment": environment_info(), "results": results}, f, indent=1)
+    print("Results written to", output)
+
+    if baseline:
+        frame = compare_results(load_results(baseline), load_results(output), threshold)
+        if not print_comparison(frame, threshold):
+            sys.exit(1)
+
+
+@cli.command("broadcast")
+@click.option("--graph", default=",".join(BROADCAST_GRAPHS),
+              help="Comma separated list of graphs.")
+@click.option("--scheduler", default="ws,etf", help="Comma separated list of schedulers.")
+@click.option("--cluster", default="32x4,64x16", help="Comma separated list of clusters.")
+@click.option("--policy", default=",".join(BROADCAST_POLICIES),
+              help="Comma separated list of download source policies.")
+def broadcast_cmd(graph, scheduler, cluster, policy):
+    """
+    Compare makespans and transfers of download source policies (maxmin netmodel)
+    """
+    from estee.simulator.sources import SOURCE_POLICIES
+
+    graph_names = parse_list(graph, BROADCAST_GRAPHS)
+    schedulers = parse_list(scheduler, SCHEDULERS)
+    clusters = parse_list(cluster, CLUSTERS)
+    policies = parse_list(policy, SOURCE_POLICIES)
+
+    results = []
+    for graph_name in graph_names:
+        graph_set = BROADCAST_GRAPHS[graph_name][0]
+        graph = create_graph(graph_name, BROADCAST_GRAPHS)
+        for cluster_name in clusters:
+            for scheduler_name in schedulers:
+                instance = Instance(graph_set, graph_name, None, graph, cluster_name,
+                                    BANDWIDTHS[BANDWIDTH], "maxmin", scheduler_name, "exact",
+                                    0, 0, 1)
+                for policy_name in policies:
+                    simulator = create_simulator(instance, source_policy=policy_name)
+                    set_seed(SEED)
+                    makespan = simulator.run()
+                    results.append({"graph_name": graph_name, "cluster_name": cluster_name,
+                                    "scheduler_name": scheduler_name, "policy": policy_name,
+                                    "makespan": makespan,
+                                    "transfer": simulator.statistics.total_transfer})
+
+    frame = pd.DataFrame(results)
+    keys = ["graph_name", "cluster_name", "scheduler_name"]
+    baseline = frame.groupby(keys)["makespan"].transform("first")
+    frame["speedup"] = baseline / frame["makespan"]
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_rows", None)
+    print(frame.to_string(index=False))
+
+
+@cli.command("batching")
+@click.option("--graph", default="gridcat,mapreduce", help="Comma separated list of graphs.")
+@click.option("--scheduler", default="ws,etf", help="Comma separated list of schedulers.")
+@click.option("--cluster", default="32x4", help="Comma separated list of clusters.")
+@click.option("--latency", default="0.1,1", help="Comma separated list of latencies [s].")
+@click.option("--batch-size", default="1,16,64",
+              help="Comma separated list of batch sizes [MiB] (0 disables batching).")
+def batching_cmd(graph, scheduler, cluster, latency, batch_size):
+    """
+    Compare makespans with batched downloads of small objects (maxmin netmodel with latency)
+    """
+    graph_names = parse_list(graph, GRAPHS)
+    schedulers = parse_list(scheduler, SCHEDULERS)
+    clusters = parse_list(cluster, CLUSTERS)
+    latencies = [float(v) for v in latency.split(",")]
+    batch_sizes = [0.0] + [float(v) for v in batch_size.split(",") if float(v) > 0]
+
+    results = []
+    for graph_name in graph_names:
+        graph_set = GRAPHS[graph_name][0]
+        graph = create_graph(graph_name)
+        for cluster_name in clusters:
+            for scheduler_name in schedulers:
+                instance = Instance(graph_set, graph_name, None, graph, cluster_name,
+                                    BANDWIDTHS[BANDWIDTH], "maxmin", scheduler_name, "exact",
+                                    0, 0, 1)
+                for latency_value in latencies:
+                    for size in batch_sizes:
+                        simulator = create_simulator(instance, {"latency": latency_value},
+                                                     download_batch_size=size or None)
+                        set_seed(SEED)
+                        results.append({"graph_name": graph_name, "cluster_name": cluster_name,
+                                        "scheduler_name": scheduler_name,
+                                        "latency": latency_value, "batch_size": size,
+                                        "makespan": simulator.run()})
+
+    frame = pd.DataFrame(results)
+    keys = ["graph_name", "cluster_name", "scheduler_name", "latency"]
+    baseline = frame.groupby(keys)["makespan"].transform("first")
+    frame["speedup"] = baseline / frame["makespan"]
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_rows", None)
+    print(frame.to_string(index=False))
+
+
+@cli.command("compare")
+@click.argument("baseline")
+@click.argument("current")
+@click.option("--threshold", default=0.1, help="Allowed relative slowdown against the baseline.")
+def compare_cmd(baseline, current, threshold):
+    frame = compare_results(load_results(baseline), load_results(current), threshold)
+    if not print_comparison(frame, threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
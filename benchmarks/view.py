@@ -12,6 +12,8 @@ import pandas as pd
 import numpy as np
 from matplotlib.lines import Line2D
 
+from cube import load_cube, weighted_mean
+
 LINE_STYLES = ["-", ":", "-.", "--"]
 cmap = plt.cm.get_cmap('Dark2')
 COLORS = [cmap(i) for i in range(5)]
@@ -33,18 +35,12 @@ def style_gen():
 class Data:
 
     def __init__(self, filename):
-        self.raw_data = pd.read_csv(filename)
+        # Results aggregated over repetitions, with a precomputed score (see cube.py)
+        self.cube = load_cube(filename)
 
-        self.raw_data.drop("graph_set", axis=1, inplace=True)
+        self.cube = self.cube.drop("graph_set", axis=1)
         exclude = ["tlevel-simple", "blevel-simple"]
-        self.raw_data = pd.DataFrame(
-            self.raw_data[~self.raw_data["scheduler_name"].isin(exclude)])
-
-        mins = self.raw_data.groupby(
-            ["graph_id", "cluster_name", "bandwidth", "netmodel"]
-        )["time"].transform(pd.Series.min)
-
-        self.raw_data["score"] = self.raw_data["time"] / mins
+        self.cube = self.cube[~self.cube["scheduler_name"].isin(exclude)]
 
     def prepare(self,
                 f_settings,
@@ -54,7 +50,7 @@ class Data:
                 min_sched_interval=0.1,
                 imode="exact"
                 ):
-        rd = self.raw_data
+        rd = self.cube
 
         if netmodel:
             f = rd["netmodel"] == netmodel
@@ -81,7 +77,10 @@ class Data:
             if f_settings[f_item] and not f_item == "output":
                 f &= rd[f_item].isin(f_settings[f_item])
 
-        return pd.DataFrame(rd[f])
+        data = pd.DataFrame(rd[f])
+        categories = data.select_dtypes("category").columns
+        data[categories] = data[categories].astype(str)
+        return data
 
 
 def splot(data, col, row, x, y,
@@ -100,7 +99,8 @@ def splot(data, col, row, x, y,
             fdata = gdata[gdata[style_col] == v]
             ax.plot(fdata[x], fdata[y], 'ro',
                     markersize=5, color=style["color"], marker=style["marker"])
-            means = fdata.groupby(x)[y].mean()
+            # cube rows aggregate different numbers of repetitions
+            means = weighted_mean(fdata, y, x)
             ax.plot(means.index, means, linestyle=style["line"], color=style["color"])
 
     rows = sorted(data[row].unique())
@@ -205,7 +205,7 @@ def process(filename, args, f_settings):
                     ["graph_name", "graph_id", "cluster_name", "bandwidth", "scheduler_name"])
 
                 def normalize(x):
-                    mean = x[x["netmodel"] == "simple"]["time"].mean()
+                    mean = weighted_mean(x[x["netmodel"] == "simple"], "time")
                     x["time"] /= mean
                     return x
 
@@ -229,7 +229,7 @@ def process(filename, args, f_settings):
 
             if "score" in f_settings["output"] or not f_settings["output"]:
                 def normalize(x):
-                    mean = x[x["min_sched_interval"] == 0.0]["time"].mean()
+                    mean = weighted_mean(x[x["min_sched_interval"] == 0.0], "time")
                     x["time"] /= mean
                     return x
 
@@ -253,7 +253,7 @@ def process(filename, args, f_settings):
                     ["graph_name", "graph_id", "cluster_name", "bandwidth", "scheduler_name"])
 
                 def normalize_imode(x):
-                    mean = x[x["imode"] == "exact"]["time"].mean()
+                    mean = weighted_mean(x[x["imode"] == "exact"], "time")
                     x["time"] /= mean
                     return x
 
@@ -1,3 +1,4 @@
 
 from .task import Task, DataObject  # noqa
 from .taskgraph import TaskGraph  # noqa
+from .registry import Registry  # noqa
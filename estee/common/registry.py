@@ -0,0 +1,105 @@
+import functools
+import importlib
+from collections.abc import Mapping
+
+
+def import_object(path):
+    """
+    Imports an object described by "package.module:attribute"
+    """
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise Exception("Invalid import string '{}', expected 'module:attribute'".format(path))
+    obj = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def iter_entry_points(group):
+    """
+    Generates pairs (name, import string) of entry points in the given group
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        import pkg_resources
+        for entry_point in pkg_resources.iter_entry_points(group):
+            yield entry_point.name, "{}:{}".format(entry_point.module_name,
+                                                   ".".join(entry_point.attrs))
+        return
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=group)
+    else:
+        entry_points = entry_points.get(group, ())
+    for entry_point in entry_points:
+        yield entry_point.name, entry_point.value
+
+
+class Registry(Mapping):
+    """
+    Read-only mapping of names to lazily imported objects (e.g. scheduler classes).
+
+    A target of an entry is either an object or an import string "module:attribute",
+    which is imported when the entry is accessed for the first time. When arguments are
+    registered together with the target, the entry is a factory calling the target with them.
+
+    If `entry_point_group` is given, entry points from this group (provided by installed
+    packages) are added when an unknown name is requested or when the registry is iterated.
+    Entries registered explicitly take precedence over entry points.
+    """
+
+    def __init__(self, entries=None, entry_point_group=None):
+        self.entry_point_group = entry_point_group
+        self._targets = {}
+        self._objects = {}
+        self._entry_points_loaded = entry_point_group is None
+        if entries:
+            for name, target in entries.items():
+                self.register(name, target)
+
+    def register(self, name, target, *args, **kwargs):
+        self._targets[name] = (target, args, kwargs)
+        self._objects.pop(name, None)
+
+    def _load_entry_points(self):
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        for name, target in iter_entry_points(self.entry_point_group):
+            if name not in self._targets:
+                self._targets[name] = (target, (), {})
+
+    def __getitem__(self, name):
+        obj = self._objects.get(name)
+        if obj is not None:
+            return obj
+        if name not in self._targets:
+            self._load_entry_points()
+        if name not in self._targets:
+            raise KeyError(name)
+
+        target, args, kwargs = self._targets[name]
+        obj = import_object(target) if isinstance(target, str) else target
+        if args or kwargs:
+            obj = functools.partial(obj, *args, **kwargs)
+        self._objects[name] = obj
+        return obj
+
+    def __contains__(self, name):
+        if name not in self._targets:
+            self._load_entry_points()
+        return name in self._targets
+
+    def __iter__(self):
+        self._load_entry_points()
+        return iter(list(self._targets))
+
+    def __len__(self):
+        self._load_entry_points()
+        return len(self._targets)
+
+    def __repr__(self):
+        return "<Registry {}>".format(list(self._targets))
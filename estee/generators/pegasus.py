@@ -2,7 +2,7 @@
 Generators for synthetic workflows from the Pegasus workflow gallery
 (https://pegasus.isi.edu/workflow_gallery/index.php).
 """
-import collections
+import collections.abc
 import random
 
 from .utils import normal, gen_level, join_level
@@ -143,7 +143,7 @@ def epigenomics(width=50):
 
 
 def ligo(widths=(20, 10)):
-    if not isinstance(widths, collections.Iterable):
+    if not isinstance(widths, collections.abc.Iterable):
         widths = (widths, )
 
     tg = TaskGraph()
@@ -1,4 +1,4 @@
-import collections
+import collections.abc
 
 import numpy as np
 
@@ -12,7 +12,7 @@ def exponential(scale):
 
 
 def listify(value):
-    if not isinstance(value, collections.Iterable):
+    if not isinstance(value, collections.abc.Iterable):
         return (value, )
     return value
 
@@ -2,8 +2,9 @@
 from .scheduler import SchedulerBase, StaticScheduler  # noqa
 from .basic import AllOnOneScheduler, DoNothingScheduler, RandomAssignScheduler  # noqa
 from .queue import RandomScheduler, RandomGtScheduler, BlevelGtScheduler  # noqa
-from .others import DLSScheduler, ETFScheduler, MCPScheduler  # noqa
+from .others import DLSScheduler, DuplicationScheduler, ETFScheduler, MCPScheduler  # noqa
 from .camp import Camp2Scheduler  # noqa
 from .ws import WorkStealingScheduler  # noqa
 from .genetic import GeneticScheduler  # noqa
-from .clustering import LcScheduler  # noqa
\ No newline at end of file
+from .clustering import LcScheduler  # noqa
+from .replay import RecordingScheduler, SchedulerRecording, replay_recording  # noqa
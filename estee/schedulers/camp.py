@@ -49,7 +49,7 @@ class CampCore:
                         * t.cpus / cpu_factor
                 lst.append((t.id, score))
 
-        if not tasks:
+        if not tasks or len(workers) == 1:
             return
 
         for _ in range(iterations):
@@ -105,6 +105,8 @@ class Camp2Scheduler(StaticScheduler):
         self.iterations = iterations
 
     def static_schedule(self):
+        if not self.workers:
+            return
         core = CampCore(self.task_graph,
                         [w for w in self.workers.values()],
                         self.network_bandwidth,
@@ -1,4 +1,4 @@
-from .scheduler import StaticScheduler
+from .scheduler import StaticScheduler, TaskState
 from .utils import compute_b_level_duration, estimate_schedule, create_scheduler_graph
 from ..simulator import SimpleNetModel, TaskAssignment
 
@@ -72,5 +72,6 @@ class LcScheduler(StaticScheduler):
                     result[t.id].worker = best_w
 
         for a in result:
-            self.assign(self.workers[a.worker.worker_id], self.task_graph.tasks[a.task.id],
-                        a.priority, a.block)
+            task = self.task_graph.tasks[a.task.id]
+            if task.state == TaskState.Waiting:
+                self.assign(self.workers[a.worker.worker_id], task, a.priority, a.block)
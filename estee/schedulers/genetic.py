@@ -1,16 +1,20 @@
 import random
 from typing import Tuple
 
-from deap import algorithms, base, creator
-from deap.gp import tools
-
 from estee.simulator import SimpleNetModel
-from .scheduler import StaticScheduler
+from .scheduler import StaticScheduler, TaskState
 from .utils import compute_b_level_duration_size, get_size_estimate, estimate_schedule
 from ..simulator import TaskAssignment
 
-creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMin)
+
+def create_deap_types():
+    # DEAP is imported lazily, so importing schedulers does not pay for it
+    # and the global DEAP types are created only when the scheduler is used
+    from deap import base, creator
+
+    if not hasattr(creator, "Individual"):
+        creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        creator.create("Individual", list, fitness=creator.FitnessMin)
 
 
 class GeneticScheduler(StaticScheduler):
@@ -23,12 +27,17 @@ class GeneticScheduler(StaticScheduler):
         self.best_individual = ()
 
     def init(self):
+        from deap import algorithms, base, creator
+        from deap.gp import tools
+
+        create_deap_types()
         toolbox = base.Toolbox()
 
         graph = self.task_graph
-        workers = self.workers
+        workers = list(self.workers.values())
 
         if not graph.tasks or not workers:
+            self.best_individual = ()
             return
 
         generator = self.generator_individual_alap(graph, workers, self.create_netmodel())
@@ -83,7 +92,7 @@ class GeneticScheduler(StaticScheduler):
         best = [item for item in hof.items if self.is_schedule_valid(item, graph, workers)]
         if not best:
             def get_worker(task):
-                return random.choice([w for w in workers.values() if w.cpus >= task.cpus])
+                return random.choice([w for w in workers if w.cpus >= task.cpus])
             self.best_individual = [TaskAssignment(get_worker(t), t) for t in graph.tasks]
         else:
             self.best_individual = self.create_schedule(best[0], graph.tasks, workers)
@@ -99,7 +108,7 @@ class GeneticScheduler(StaticScheduler):
 
     def evaluate(self, individual) -> Tuple[float]:
         graph = self.task_graph
-        workers = self.workers
+        workers = list(self.workers.values())
         netmodel = self.create_netmodel()
 
         if not self.is_schedule_valid(individual, graph, workers):
@@ -136,4 +145,5 @@ class GeneticScheduler(StaticScheduler):
     def static_schedule(self):
         self.init()
         for assignment in self.best_individual:
-            self.assign(assignment.worker, assignment.task)
+            if assignment.task.state == TaskState.Waiting:
+                self.assign(assignment.worker, assignment.task)
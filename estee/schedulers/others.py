@@ -4,7 +4,7 @@ import random
 from estee.schedulers.queue import GreedyTransferQueueScheduler
 from .scheduler import SchedulerBase, Update
 from .utils import compute_alap, compute_b_level_duration, compute_t_level_duration, \
-    get_size_estimate, schedule_all, transfer_cost_parallel, \
+    get_size_estimate, schedule_all, transfer_time_parallel, worker_duration_estimate, \
     worker_estimate_earliest_time, update_worker_occupancy
 
 
@@ -45,8 +45,8 @@ class DLSScheduler(SchedulerBase):
         if task.cpus > worker.cpus:
             return -10e10
 
-        earliest_transfer = (transfer_cost_parallel(self.task_graph, worker, task) /
-                             self.network_bandwidth)
+        earliest_transfer = transfer_time_parallel(self.task_graph, worker, task,
+                                                   self.network_bandwidth)
 
         earliest_computation = worker_estimate_earliest_time(worker, task,
                                                              self.now(),
@@ -83,7 +83,7 @@ class MCPScheduler(SchedulerBase):
         def cost(w, t):
             if t.cpus > w.cpus:
                 return 10e10
-            transfer = transfer_cost_parallel(self.task_graph, w, t) / bandwidth
+            transfer = transfer_time_parallel(self.task_graph, w, t, bandwidth)
             computation = worker_estimate_earliest_time(w, task, self.now(),
                                                         worker_assignments.get(w, []))
             return max(transfer, computation)
@@ -141,11 +141,67 @@ class ETFScheduler(SchedulerBase):
             return 10e10
 
         bandwidth = self.network_bandwidth
-        transfer = transfer_cost_parallel(self.task_graph, worker, task) / bandwidth
+        transfer = transfer_time_parallel(self.task_graph, worker, task, bandwidth)
         computation = worker_estimate_earliest_time(worker, task, self.now(), worker_assignments)
         return max(computation, transfer)
 
 
+class DuplicationScheduler(ETFScheduler):
+    """
+    ETF scheduler that runs copies of running tasks on idle workers.
+
+    A copy of a task is started on an idle worker when it is expected to finish
+    earlier than the running copies (e.g. on a faster worker), at most `max_copies`
+    copies of a task run at once. The first finished copy wins, the other ones are cancelled.
+    """
+    def __init__(self, max_copies=2):
+        SchedulerBase.__init__(self, "ETF duplication", "0", task_start_notification=True,
+                               duplication=True)
+        self.b_level = {}
+        self.max_copies = max_copies
+        self.copies = {}
+
+    def schedule(self, update):
+        super().schedule(update)
+        for task in update.new_finished_tasks:
+            self.copies.pop(task, None)
+        self.duplicate_running_tasks()
+
+    def duplicate_running_tasks(self):
+        idle_workers = [w for w in self.workers.values()
+                        if not w.running_tasks and not w.scheduled_tasks]
+        if not idle_workers:
+            return
+        now = self.now()
+        finish_times = {}
+        for worker in self.workers.values():
+            for task in worker.running_tasks:
+                finish = task.start_time + worker_duration_estimate(worker, task)
+                finish_times[task] = min(finish, finish_times.get(task, finish))
+        if not finish_times:
+            return
+
+        bandwidth = self.network_bandwidth
+        idle_workers.sort(key=lambda w: w.speed, reverse=True)
+        for worker in idle_workers:
+            best = None
+            for task, finish in finish_times.items():
+                if task.cpus > worker.cpus or self.copies.get(task, 1) >= self.max_copies:
+                    continue
+                copy_finish = (now + transfer_time_parallel(self.task_graph, worker, task,
+                                                            bandwidth) +
+                               worker_duration_estimate(worker, task))
+                gain = finish - copy_finish
+                if gain > 0 and (best is None or gain > best[0]):
+                    best = (gain, task, copy_finish)
+            if best is None:
+                continue
+            _, task, copy_finish = best
+            self.duplicate(worker, task)
+            self.copies[task] = self.copies.get(task, 1) + 1
+            finish_times[task] = copy_finish
+
+
 class StaticSortScheduler(SchedulerBase):
     def sort_tasks(self, tasks):
         raise NotImplementedError()
@@ -169,8 +225,8 @@ class StaticSortScheduler(SchedulerBase):
         if task.cpus > worker.cpus:
             return 10e10
 
-        earliest_transfer = (transfer_cost_parallel(self.task_graph, worker, task) /
-                             self.network_bandwidth)
+        earliest_transfer = transfer_time_parallel(self.task_graph, worker, task,
+                                                   self.network_bandwidth)
 
         earliest_computation = worker_estimate_earliest_time(
             worker, task, self.now(), worker_assignments)
@@ -32,22 +32,30 @@ class QueueScheduler(SchedulerBase):
         raise NotImplementedError()
 
     def schedule(self, update):
+        if update.lost_tasks:
+            # Inputs of waiting tasks may be lost too
+            self.ready = [t for t in self.ready if t.unfinished_inputs == 0]
         self.ready += update.new_ready_tasks
 
-        if update.cluster_changed:
-            free_cpus = {w: w.cpus for w in self.workers.values()}
-            for task in self.task_graph.tasks.values():
-                if task.state != TaskState.Finished and task.worker:
-                    free_cpus[task.worker] -= task.cpus
+        if update.cluster_changed or update.lost_tasks:
+            free_cpus = {}
+            for w in self.workers.values():
+                free_cpus[w] = w.cpus - sum(t.cpus for t in w.scheduled_tasks
+                                            if t.state == TaskState.Assigned)
             self.free_cpus = free_cpus
         else:
             free_cpus = self.free_cpus
+            for task in update.new_finished_tasks:
+                worker = task.scheduled_worker
+                # Leaving workers may still finish their tasks
+                if worker in free_cpus:
+                    free_cpus[worker] += task.cpus
 
         if update.graph_changed:
             self.queue = self.make_queue()
-
-        for task in update.new_finished_tasks:
-            free_cpus[task.scheduled_worker] += task.cpus
+        elif update.lost_tasks:
+            # Lost tasks are scheduled again in their original order
+            self.queue = [t for t in self.make_queue() if t.state == TaskState.Waiting]
 
         aws = set(self.workers.values())
         for t in list(self.queue):
@@ -0,0 +1,167 @@
+import gzip
+import json
+import time
+from types import SimpleNamespace
+
+from .scheduler import SchedulerInterface
+from .tasks import TaskState
+
+
+class SchedulerRecording:
+    """
+    Messages exchanged between a simulator and a scheduler.
+
+        register - the registration message returned by scheduler's start()
+        events - list of (time, message, schedule), where time is the simulation time
+                 when `message` was sent and `schedule` is the returned list of assignments
+
+    Recordings are stored as gzipped JSON lines.
+    """
+
+    VERSION = 1
+
+    def __init__(self, register=None, events=None):
+        self.register = register
+        self.events = events if events is not None else []
+
+    def add(self, now, message, schedule):
+        self.events.append((now, message, schedule))
+
+    @property
+    def message_count(self):
+        return len(self.events)
+
+    def save(self, filename):
+        with gzip.open(filename, "wt") as f:
+            json.dump({"version": self.VERSION, "register": self.register}, f)
+            f.write("\n")
+            for now, message, schedule in self.events:
+                json.dump({"time": now, "message": message, "schedule": schedule}, f,
+                          separators=(",", ":"))
+                f.write("\n")
+
+    @staticmethod
+    def load(filename):
+        with gzip.open(filename, "rt") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != SchedulerRecording.VERSION:
+                raise Exception("Unsupported version of scheduler recording: {}".format(
+                    header.get("version")))
+            recording = SchedulerRecording(header["register"])
+            for line in f:
+                event = json.loads(line)
+                message = event["message"]
+                for update in message.get("tasks_update", ()):
+                    update["state"] = TaskState(update["state"])
+                recording.add(event["time"], message, event["schedule"])
+        return recording
+
+    def __repr__(self):
+        return "<SchedulerRecording messages={}>".format(self.message_count)
+
+
+class RecordingScheduler(SchedulerInterface):
+    """
+    Scheduler wrapper that records all messages sent to the wrapped scheduler
+    and the returned schedules into `recording` (SchedulerRecording).
+
+        simulator = Simulator(graph, workers, RecordingScheduler(scheduler), netmodel)
+        simulator.run()
+        simulator.scheduler.recording.save("messages.jsonl.gz")
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.recording = SchedulerRecording()
+
+    def start(self):
+        self.scheduler._simulator = self._simulator
+        self.recording = SchedulerRecording()
+        self.recording.register = self.scheduler.start()
+        return self.recording.register
+
+    def send_message(self, message):
+        now = self._simulator.env.now if self._simulator else None
+        schedule = self.scheduler.send_message(message)
+        self.recording.add(now, message, schedule)
+        return schedule
+
+    def stop(self):
+        self.scheduler.stop()
+        self.scheduler._simulator = None
+
+
+class ReplayResult:
+    """
+    Result of `replay_recording`.
+
+        message_times - wall time [s] of each send_message() call (including message parsing)
+        schedule_times - wall time [s] of each schedule() call
+        schedules - schedules returned by the scheduler
+        mismatches - indices of messages where the schedule differs from the recording
+                     (only when checking was enabled)
+    """
+
+    def __init__(self):
+        self.message_times = []
+        self.schedule_times = []
+        self.schedules = []
+        self.mismatches = []
+
+    @property
+    def schedule_time(self):
+        return sum(self.schedule_times)
+
+    @property
+    def message_time(self):
+        return sum(self.message_times)
+
+    def __repr__(self):
+        return "<ReplayResult messages={} schedule_time={:.6f}>".format(
+            len(self.message_times), self.schedule_time)
+
+
+def _normalize_schedule(schedule):
+    return sorted((a.get("task", -1), a.get("object", -1), a.get("worker"), a.get("priority"),
+                   a.get("blocking"), a.get("duplicate", False))
+                  for a in schedule or ())
+
+
+def replay_recording(scheduler, recording, check=False):
+    """
+    Feeds recorded messages to a scheduler (an instance of a SchedulerBase subclass)
+    without a simulator and measures each schedule() call.
+
+    The messages describe the run of the recorded scheduler, so the replay is faithful
+    only for a scheduler that makes the same decisions (e.g. an optimized version of it).
+    When `check` is True, returned schedules are compared with the recorded ones.
+    """
+    clock = SimpleNamespace(env=SimpleNamespace(now=0))
+    scheduler._simulator = clock
+    result = ReplayResult()
+
+    schedule_fn = scheduler.schedule
+
+    def timed_schedule(update):
+        start = time.perf_counter()
+        try:
+            return schedule_fn(update)
+        finally:
+            result.schedule_times.append(time.perf_counter() - start)
+
+    scheduler.schedule = timed_schedule
+    try:
+        scheduler.start()
+        for i, (now, message, recorded_schedule) in enumerate(recording.events):
+            clock.env.now = now if now is not None else 0
+            start = time.perf_counter()
+            schedule = scheduler.send_message(message)
+            result.message_times.append(time.perf_counter() - start)
+            result.schedules.append(schedule)
+            if check and _normalize_schedule(schedule) != _normalize_schedule(recorded_schedule):
+                result.mismatches.append(i)
+        scheduler.stop()
+    finally:
+        del scheduler.schedule
+        scheduler._simulator = None
+    return result
@@ -1,6 +1,7 @@
 
 import logging
 import time
+from collections import ChainMap
 
 from estee.simulator import Simulator
 from .tasks import SchedulerTaskGraph, SchedulerTask, SchedulerDataObject, TaskState
@@ -33,12 +34,23 @@ class SchedulerInterface:
             "tasks_update": [TASK_UPDATE, ...]  # Optional
             "objects_update": [OBJECT_UPDATE, ...]  # Optional
             "reassign_failed": [REASSIGN_FAILED, ...]  # Optinal
+            "evictions": [EVICTION, ...]  # Optional
+            "cancelled_copies": [CANCELLED_COPY, ...]  # Optional
+            "removed_workers": [WORKER_ID, ...]  # Optional
+            "lost_tasks": [TASK_ID, ...]  # Optional
         }
 
+        Removed workers left the cluster or failed, they do not accept new tasks
+        (tasks already running on a leaving worker may be still reported as finished by it).
+        Lost tasks are back in the waiting state and have to be scheduled again,
+        either because they were assigned to a removed worker or because they were finished
+        but their outputs were lost.
+
         TASK_UPDATE = {
             "id": TASK_ID,
             "state": TaskState
-            "worker": WORKER_ID
+            "worker": WORKER_ID  # The worker that finished the task if it is finished
+            "workers": [WORKER_ID, ...]  # Optional, all workers with a copy of the task
         }
 
         OBJECT_UPDATE = {
@@ -51,6 +63,41 @@ class SchedulerInterface:
             "id": TASK_ID
             "assigned_workers": [WORKER_ID, ...]  # Ground truth from simulator
         }
+
+        EVICTION = {
+            "worker": WORKER_ID,
+            "object": OBJECT_ID,
+            "spilled": BOOL  # True if the object was moved to worker's disk
+        }
+
+        CANCELLED_COPY = {
+            "task": TASK_ID,
+            "worker": WORKER_ID  # The copy was cancelled because another one finished first
+        }
+
+        WORKER_DEF = {
+            "id": WORKER_ID,
+            "cpus": INT,
+            "memory": FLOAT  # Optional, capacity of worker's memory
+            "bandwidth": FLOAT  # Optional, bandwidth of worker's network interface
+            "speed": FLOAT  # Optional, speed factor of worker's cpus (1.0 by default)
+        }
+
+        It returns a schedule - a list of ASSIGNMENTs and PREFETCHes:
+
+        ASSIGNMENT = {
+            "task": TASK_ID,
+            "worker": WORKER_ID,
+            "priority": INT  # Optional
+            "blocking": INT  # Optional
+            "duplicate": BOOL  # Optional, see DUPLICATION_FLAG in start()
+        }
+
+        PREFETCH = {
+            "object": OBJECT_ID,
+            "worker": WORKER_ID,  # The worker downloads the object when it is available
+            "priority": INT  # Optional, priority of the download
+        }
         """
         raise NotImplementedError()
 
@@ -65,11 +112,16 @@ class SchedulerInterface:
             "protocol_version": PROTOCOL_VERSION,
             "scheduler_name": SCHEDULER_NAME,
             "scheduler_version": SCHEDULER_VERSION,
-            "reassigning": REASSIGNING_FLAG
+            "reassigning": REASSIGNING_FLAG,
+            "duplication": DUPLICATION_FLAG  # Optional
         }
 
         REASSIGNING_FLAG has to be True if scheduler may reassign
         already scheduled tasks
+
+        DUPLICATION_FLAG has to be True if scheduler may run copies of a task
+        on more workers (assignments with "duplicate": True), the first finished
+        copy wins and the other ones are cancelled
         """
         raise NotImplementedError()
 
@@ -80,16 +132,21 @@ class SchedulerInterface:
 
 class SchedulerWorker:
 
-    def __init__(self, worker_id, cpus):
+    def __init__(self, worker_id, cpus, memory=None, bandwidth=None, speed=1.0):
         self.worker_id = worker_id
         self.cpus = cpus
+        self.memory = memory
+        # None means the network bandwidth announced by the simulator
+        self.bandwidth = bandwidth
+        self.speed = speed
 
         # metadata, may not be used
         self.running_tasks = set()
         self.scheduled_tasks = []
 
     def simple_copy(self):
-        return SchedulerWorker(self.worker_id, self.cpus)
+        return SchedulerWorker(self.worker_id, self.cpus, self.memory,
+                               self.bandwidth, self.speed)
 
     def __repr__(self):
         return "<SW id={} cpus={}>".format(self.worker_id, self.cpus)
@@ -105,7 +162,11 @@ class Update:
                  new_ready_tasks,
                  new_finished_tasks,
                  reassign_failed,
-                 new_started_tasks):
+                 new_started_tasks,
+                 evictions=(),
+                 cancelled_copies=(),
+                 removed_workers=(),
+                 lost_tasks=()):
 
         self.new_workers = new_workers
         self.network_update = network_update
@@ -115,6 +176,12 @@ class Update:
         self.new_finished_tasks = new_finished_tasks
         self.reassign_failed = reassign_failed
         self.new_started_tasks = new_started_tasks
+        # list of (SchedulerWorker, SchedulerDataObject, spilled)
+        self.evictions = evictions
+        # list of (SchedulerTask, SchedulerWorker)
+        self.cancelled_copies = cancelled_copies
+        self.removed_workers = removed_workers
+        self.lost_tasks = lost_tasks
 
     @property
     def graph_changed(self):
@@ -122,7 +189,7 @@ class Update:
 
     @property
     def cluster_changed(self):
-        return bool(self.new_workers or self.network_update)
+        return bool(self.new_workers or self.network_update or self.removed_workers)
 
 
 class SchedulerBase(SchedulerInterface):
@@ -137,15 +204,22 @@ class SchedulerBase(SchedulerInterface):
     def __init__(self, name, version,
                  reassigning=False,
                  task_start_notification=False,
-                 only_in_simulator=False):
+                 only_in_simulator=False,
+                 duplication=False):
 
         self.workers = {}
+        self.removed_workers = {}
+        # assigned tasks whose inputs were lost, they are not reported as ready again
+        self._unready_tasks = set()
         self.task_graph = SchedulerTaskGraph()
         self._name = name
         self._version = version
         self.network_bandwidth = None
         self.assignments = None
+        self.duplicates = None
+        self.prefetches = None
         self.reassigning = reassigning
+        self.duplication = duplication
         self.task_start_notification = task_start_notification
         self.only_in_simulator = only_in_simulator
 
@@ -170,6 +244,7 @@ class SchedulerBase(SchedulerInterface):
             "scheduler_version": self._version,
             "reassigning": self.reassigning,
             "task_start_notification": self.task_start_notification,
+            "duplication": self.duplication,
         }
 
     def schedule(self, update: Update):
@@ -191,12 +266,25 @@ class SchedulerBase(SchedulerInterface):
                 if worker_id in workers:
                     raise Exception(
                         "Registering already registered worker '{}'".format(worker_id))
-                worker = SchedulerWorker(worker_id, w["cpus"])
+                worker = SchedulerWorker(worker_id, w["cpus"], w.get("memory"),
+                                         w.get("bandwidth"), w.get("speed", 1.0))
                 new_workers.append(worker)
                 workers[worker_id] = worker
         else:
             new_workers = ()
 
+        if "removed_workers" in message:
+            removed_workers = []
+            for worker_id in message["removed_workers"]:
+                worker = workers.pop(worker_id)
+                self.removed_workers[worker_id] = worker
+                removed_workers.append(worker)
+        else:
+            removed_workers = ()
+        if self.removed_workers:
+            # Tasks running on leaving workers may be still reported
+            workers = ChainMap(workers, self.removed_workers)
+
         network_update = False
         if "network_bandwidth" in message:
             bandwidth = message["network_bandwidth"]
@@ -245,7 +333,7 @@ class SchedulerBase(SchedulerInterface):
             reassign_failed = []
             for tu in message["reassign_failed"]:
                 task = self.task_graph.tasks[tu["id"]]
-                ws = [self.workers[w] for w in tu["assigned_workers"]]
+                ws = [workers[w] for w in tu["assigned_workers"]]
                 task.scheduled_worker = ws[0]
                 reassign_failed.append(task)
                 self._fix_implied_schedule(task)
@@ -267,12 +355,43 @@ class SchedulerBase(SchedulerInterface):
                         t.unfinished_inputs -= 1
                         if t.unfinished_inputs <= 0:
                             assert t.unfinished_inputs == 0
-                            ready_tasks.append(t)
+                            if t in self._unready_tasks:
+                                self._unready_tasks.remove(t)
+                            else:
+                                ready_tasks.append(t)
 
             if not was_running and (running or state == TaskState.Finished):
                 task.start_time = self.now()
                 started_tasks.append(task)
 
+        if "lost_tasks" in message:
+            lost_tasks = []
+            for task_id in message["lost_tasks"]:
+                task = task_graph.tasks[task_id]
+                if task.state == TaskState.Finished:
+                    for o in task.outputs:
+                        for t in o.consumers:
+                            if t.unfinished_inputs == 0 and t.state != TaskState.Waiting:
+                                self._unready_tasks.add(t)
+                            t.unfinished_inputs += 1
+                self._unready_tasks.discard(task)
+                worker = task.scheduled_worker
+                if worker is not None:
+                    if task in worker.scheduled_tasks:
+                        worker.scheduled_tasks.remove(task)
+                    worker.running_tasks.discard(task)
+                task.state = TaskState.Waiting
+                task.scheduled_worker = None
+                task.computed_by = None
+                task.running = False
+                lost_tasks.append(task)
+            ready_tasks = [t for t in ready_tasks if t.unfinished_inputs == 0]
+            ready_set = set(ready_tasks)
+            ready_tasks += [t for t in lost_tasks
+                            if t.unfinished_inputs == 0 and t not in ready_set]
+        else:
+            lost_tasks = ()
+
         for ou in message.get("objects_update", ()):
             o = task_graph.objects[ou["id"]]
             o.placing = [workers[w] for w in ou["placing"]]
@@ -281,7 +400,21 @@ class SchedulerBase(SchedulerInterface):
             if size is not None:
                 o.size = size
 
+        evictions = [(workers[e["worker"]], task_graph.objects[e["object"]], e["spilled"])
+                     for e in message.get("evictions", ())]
+
+        cancelled_copies = []
+        for c in message.get("cancelled_copies", ()):
+            task = task_graph.tasks[c["task"]]
+            worker = workers[c["worker"]]
+            if task in worker.scheduled_tasks:
+                worker.scheduled_tasks.remove(task)
+            worker.running_tasks.discard(task)
+            cancelled_copies.append((task, worker))
+
         self.assignments = {}
+        self.duplicates = []
+        self.prefetches = []
         self.schedule(Update(
             new_workers,
             network_update,
@@ -290,9 +423,13 @@ class SchedulerBase(SchedulerInterface):
             ready_tasks,
             finished_tasks,
             reassign_failed,
-            started_tasks))
+            started_tasks,
+            evictions,
+            cancelled_copies,
+            removed_workers,
+            lost_tasks))
 
-        return list(self.assignments.values())
+        return list(self.assignments.values()) + self.duplicates + self.prefetches
 
     def _fix_implied_schedule_of_object(self, obj):
         s = set()
@@ -347,10 +484,48 @@ class SchedulerBase(SchedulerInterface):
 
         self.assignments[task] = result
 
+    def duplicate(self, worker: SchedulerWorker, task: SchedulerTask, priority=None):
+        """
+            Run a copy of an already assigned task on another worker
+
+            The scheduler has to be created with duplication=True.
+            The first finished copy wins, the other copies are cancelled
+            (reported in Update.cancelled_copies).
+        """
+        assert self.duplication
+        assert worker is not None
+        result = {
+            "worker": worker.worker_id,
+            "task": task.id,
+            "duplicate": True,
+        }
+        if priority is not None:
+            result["priority"] = priority
+        for o in task.outputs:
+            o.scheduled.add(worker)
+        worker.scheduled_tasks.append(task)
+        self.duplicates.append(result)
+
+    def prefetch(self, worker: SchedulerWorker, obj: SchedulerDataObject, priority=None):
+        """
+            Ask a worker to download an object before a task that needs it is assigned there
+
+            If the object is not computed yet, it is downloaded when it is finished.
+        """
+        result = {
+            "worker": worker.worker_id,
+            "object": obj.id,
+        }
+        if priority is not None:
+            result["priority"] = priority
+        self.prefetches.append(result)
+
     def stop(self):
         if self._disable_cleanup:
             return
         self.workers.clear()
+        self.removed_workers.clear()
+        self._unready_tasks.clear()
         self.task_graph.tasks.clear()
         self.task_graph.objects.clear()
         self.network_bandwidth = None
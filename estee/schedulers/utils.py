@@ -13,12 +13,21 @@ from ..simulator.runtimeinfo import TaskState
 
 def update_worker_occupancy(workers: Dict[int, SchedulerWorker], update: Update):
     for task in update.new_started_tasks:
-        worker = workers[task.computed_by.worker_id]
-        worker.scheduled_tasks.remove(task)
+        worker = workers.get(task.computed_by.worker_id)
+        if worker is None:  # The worker was removed
+            continue
+        if task in worker.scheduled_tasks:
+            worker.scheduled_tasks.remove(task)
         worker.running_tasks.add(task)
 
     for task in update.new_finished_tasks:
-        workers[task.computed_by.worker_id].running_tasks.remove(task)
+        worker = workers.get(task.computed_by.worker_id)
+        if worker is None:
+            continue
+        # A copy of a duplicated task may finish without being reported as started
+        if task in worker.scheduled_tasks:
+            worker.scheduled_tasks.remove(task)
+        worker.running_tasks.discard(task)
 
 
 def compute_alap(task_graph: TaskGraphBase, size_resolver: Callable[[DataObjectBase], float],
@@ -179,6 +188,24 @@ def transfer_cost_parallel(runtime_graph: SchedulerTaskGraph, worker: Worker, ta
                default=0)
 
 
+def worker_bandwidth(worker: SchedulerWorker, bandwidth: float):
+    """
+    Returns the bandwidth of `worker`'s network interface, `bandwidth` (the network
+    bandwidth) if the worker does not have its own.
+    """
+    return worker.bandwidth if worker.bandwidth is not None else bandwidth
+
+
+def transfer_time_parallel(runtime_graph: SchedulerTaskGraph, worker: SchedulerWorker,
+                           task: Task, bandwidth: float):
+    """
+    Estimates the time of transferring inputs of `task` to `worker`.
+    Assumes parallel download limited by the bandwidth of the worker.
+    """
+    return (transfer_cost_parallel(runtime_graph, worker, task) /
+            worker_bandwidth(worker, bandwidth))
+
+
 def schedule_all(workers: List[Worker], tasks: List[Task], get_assignment):
     """
     Schedules all tasks by repeatedly calling `get_assignment`.
@@ -210,6 +237,13 @@ def get_duration_estimate(task: Task, default=1):
     return task.expected_duration if task.expected_duration is not None else default
 
 
+def worker_duration_estimate(worker: SchedulerWorker, task: Task, default=1):
+    """
+    Estimates the duration of `task` on `worker` (takes worker's speed into account).
+    """
+    return get_duration_estimate(task, default) / worker.speed
+
+
 def get_size_estimate_runtime(runtime_graph: SchedulerTaskGraph, output, default=1):
     if runtime_graph.tasks[output.parent.id].state == TaskState.Finished:
         return output.size
@@ -232,12 +266,13 @@ def worker_estimate_earliest_time(worker: SchedulerWorker, task: SchedulerTask,
         worker_assignments = []
 
     running_tasks = worker.running_tasks
+    speed = worker.speed
 
     free_cpus = worker.cpus
     index = 0
     runqueue = []
     for t in running_tasks:
-        heappush(runqueue, (t.start_time + (t.expected_duration or 1), index, t))
+        heappush(runqueue, (t.start_time + (t.expected_duration or 1) / speed, index, t))
         index += 1
         free_cpus -= t.cpus
     assignments = deque(worker.scheduled_tasks + worker_assignments)
@@ -249,7 +284,8 @@ def worker_estimate_earliest_time(worker: SchedulerWorker, task: SchedulerTask,
         free_cpus += t.cpus
         while assignments and free_cpus >= assignments[0].cpus:
             heappush(runqueue,
-                     (clock + (assignments[0].expected_duration or 1), index, assignments[0]))
+                     (clock + (assignments[0].expected_duration or 1) / speed, index,
+                      assignments[0]))
             index += 1
             free_cpus -= assignments[0].cpus
             assignments.popleft()
@@ -312,11 +348,11 @@ def estimate_schedule(schedule: List[TaskAssignment], netmodel):
     def task_start(time, task, worker):
         nonlocal index
         dta = (transfer_cost_parallel_finished(task_to_worker, worker, task) /
-               netmodel.bandwidth)
+               worker_bandwidth(worker, netmodel.bandwidth))
         rt = worker_estimate_earliest_time(worker, task, time,
                                            scheduled_tasks.setdefault(worker, []))
         start = time + max(rt, dta)
-        finish = start + task.expected_duration
+        finish = start + task.expected_duration / worker.speed
 
         scheduled_tasks[worker].remove(task)
         task.start_time = start
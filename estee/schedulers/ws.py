@@ -18,6 +18,12 @@ class WorkStealingScheduler(SchedulerBase):
         if update.graph_changed:
             self.b_level = compute_b_level_duration(self.task_graph)
 
+        for task in update.lost_tasks:
+            for worker in self.workers.values():
+                if task in worker.tasks:
+                    worker.tasks.remove(task)
+                    worker.free_cpus += task.cpus
+
         for task in update.reassign_failed:
             for worker in self.workers.values():
                 if task in worker.tasks:
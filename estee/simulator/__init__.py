@@ -1,4 +1,12 @@
 
-from .netmodels import InstantNetModel, SimpleNetModel, MaxMinFlowNetModel  # noqa
+from .cluster import (ClusterChange, random_failures, worker_fail, worker_join,  # noqa
+                      worker_leave)
+from .memory import (EvictionPolicy, LruEvictionPolicy, NoFutureConsumerEvictionPolicy,  # noqa
+                     SizeEvictionPolicy)
+from .netmodels import InstantNetModel, SimpleNetModel, MaxMinFlowNetModel, TopologyNetModel  # noqa
 from .simulator import Simulator, TaskAssignment, TaskState  # noqa
+from .sources import (SourcePolicy, ProducerSourcePolicy, LeastLoadedSourcePolicy,  # noqa
+                      RandomSourcePolicy, NearestSourcePolicy, BroadcastSourcePolicy)
+from .statistics import SimulatorStatistics  # noqa
 from .worker import Worker  # noqa
+from .workload import Job, Workload, poisson_arrivals, read_arrival_trace  # noqa
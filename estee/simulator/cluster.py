@@ -0,0 +1,55 @@
+import random
+
+
+class ClusterChange:
+    """
+    A change of the cluster at the given simulation time.
+
+        "join" - the worker joins the cluster (it is announced to the scheduler)
+        "leave" - the worker stops accepting tasks, unstarted tasks are returned to the scheduler;
+                  the worker leaves when its running tasks are finished and objects
+                  that are needed and not available elsewhere are downloaded by other workers
+        "fail" - the worker fails immediately, its running tasks and objects are lost
+
+    A worker whose first change is "join" is not part of the cluster at the beginning
+    of the simulation. Each worker can join and leave (or fail) at most once.
+
+    Lost tasks are reported to the scheduler in `new_ready_tasks` (when their inputs
+    are available), so schedulers that assign only ready tasks work with changing clusters.
+    """
+
+    KINDS = ("join", "leave", "fail")
+
+    __slots__ = ("time", "worker", "kind")
+
+    def __init__(self, time, worker, kind):
+        if kind not in self.KINDS:
+            raise Exception("Invalid cluster change '{}'".format(kind))
+        assert time >= 0
+        self.time = time
+        self.worker = worker
+        self.kind = kind
+
+    def __repr__(self):
+        return "<ClusterChange {} {} {}>".format(self.time, self.kind, self.worker)
+
+
+def worker_join(time, worker):
+    return ClusterChange(time, worker, "join")
+
+
+def worker_leave(time, worker):
+    return ClusterChange(time, worker, "leave")
+
+
+def worker_fail(time, worker):
+    return ClusterChange(time, worker, "fail")
+
+
+def random_failures(workers, count, max_time, seed=None):
+    """
+    Creates failures of `count` randomly chosen workers at random times in [0, max_time)
+    """
+    rng = random.Random(seed)
+    return [worker_fail(rng.uniform(0, max_time), worker)
+            for worker in rng.sample(list(workers), count)]
@@ -0,0 +1,68 @@
+from .runtimeinfo import TaskState
+
+
+class EvictionPolicy:
+    """
+    Decides which objects are evicted when memory of a worker is full.
+
+    `order()` gets evictable objects (objects in worker's memory that are not needed by tasks
+    assigned to the worker and are not being uploaded) and returns them in the order
+    of eviction. The worker evicts objects in this order until its memory usage fits.
+    """
+
+    def order(self, worker, candidates):
+        raise NotImplementedError()
+
+
+class LruEvictionPolicy(EvictionPolicy):
+    """
+    Evicts the least recently used objects first
+    """
+
+    def order(self, worker, candidates):
+        last_use = worker.last_use
+        return sorted(candidates, key=lambda o: last_use[o])
+
+
+class NoFutureConsumerEvictionPolicy(EvictionPolicy):
+    """
+    Evicts objects that will not be used by any task first, then the least recently used
+    """
+
+    def order(self, worker, candidates):
+        runtime_state = worker.simulator.runtime_state
+        last_use = worker.last_use
+
+        def has_future_consumer(obj):
+            return any(runtime_state.task_info(t).state != TaskState.Finished
+                       for t in obj.consumers)
+
+        return sorted(candidates, key=lambda o: (has_future_consumer(o), last_use[o]))
+
+
+class SizeEvictionPolicy(EvictionPolicy):
+    """
+    Evicts the largest objects first (the least recently used if sizes are equal),
+    so that the fewest objects are evicted
+    """
+
+    def order(self, worker, candidates):
+        last_use = worker.last_use
+        return sorted(candidates, key=lambda o: (-o.size, last_use[o]))
+
+
+EVICTION_POLICIES = {
+    "lru": LruEvictionPolicy,
+    "no-future-consumer": NoFutureConsumerEvictionPolicy,
+    "size": SizeEvictionPolicy,
+}
+
+
+def create_eviction_policy(policy):
+    if policy is None:
+        return LruEvictionPolicy()
+    if isinstance(policy, str):
+        if policy not in EVICTION_POLICIES:
+            raise Exception("Unknown eviction policy '{}'".format(policy))
+        return EVICTION_POLICIES[policy]()
+    return policy
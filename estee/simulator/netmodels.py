@@ -15,22 +15,52 @@ class NetModel:
         bandwidth - maximal bandwidth between two nodes
                     (this is what the network announces publicly,
                     not necessary how it really behaves)
+        latency - delay between the start of a transfer and the moment when data
+                  start to flow
+        overhead - amount of data added to each transfer (headers, serialization, ...),
+                   in the same units as object sizes
+
+    Each transfer thus takes at least `latency + (size + overhead) / bandwidth`.
+
+    `worker_bandwidth` (indexed by worker ids) contains bandwidths of workers'
+    network interfaces; it is `bandwidth` for workers without their own bandwidth.
     """
 
-    def __init__(self, bandwidth=1.0):
+    def __init__(self, bandwidth=1.0, latency=0.0, overhead=0.0):
+        assert latency >= 0 and overhead >= 0
         self.bandwidth = float(bandwidth)
-        self.worker_bandwidth = {}
+        self.latency = latency
+        self.overhead = overhead
+        self.worker_bandwidth = np.zeros(0)
         self.event_listener = None
+        self.statistics = None
 
     def init(self, env, workers):
         self.env = env
         self.workers = workers
+        self.worker_bandwidth = np.full(len(workers), self.bandwidth)
         for worker in workers:
             assert worker.id is not None
+            if worker.bandwidth is not None:
+                self.worker_bandwidth[worker.id] = worker.bandwidth
 
     def set_event_listener(self, listener):
         self.event_listener = listener
 
+    def distance(self, source, target):
+        """
+        Returns the number of network hops between two workers
+        (used for selecting the nearest source of a download)
+        """
+        return 0 if source == target else 1
+
+    def remove_worker(self, worker):
+        """
+        Called when a worker is removed from the cluster, transfers from/to the worker
+        may be dropped (their events are ignored by workers)
+        """
+        pass
+
 
 class InstantNetModel(NetModel):
 
@@ -52,11 +82,12 @@ class SimpleNetModel(NetModel):
     def download(self, source, target, size, value=None):
         assert source != target
 
-        e = self.env.timeout(size / self.bandwidth, value)
+        bandwidth = min(self.worker_bandwidth[source.id], self.worker_bandwidth[target.id])
+        e = self.env.timeout(self.latency + (size + self.overhead) / bandwidth, value)
 
         if self.event_listener:
-            self.trace_bandwidth(source, target, self.bandwidth)
-            e.callbacks.append(lambda _: self.trace_bandwidth(source, target, -self.bandwidth))
+            self.trace_bandwidth(source, target, bandwidth)
+            e.callbacks.append(lambda _: self.trace_bandwidth(source, target, -bandwidth))
         return e
 
     def trace_bandwidth(self, source, target, value):
@@ -84,14 +115,25 @@ class MaxMinFlowNetModel(NetModel):
 
     CACHE_SIZE = 256
 
+    def __init__(self, bandwidth=1.0, latency=0.0, overhead=0.0):
+        super().__init__(bandwidth, latency, overhead)
+        self.flow_cache = None
+
     def init(self, env, workers):
         super().init(env, workers)
         self.downloads = {}
+        self.removed_workers = set()
         self.recompute_event = Event(env)
+
+        # Flows depend only on connections between workers, so the cache is kept
+        # when the model is initialized again for workers with the same bandwidths
+        if (self.flow_cache is None or
+                not np.array_equal(self.cache_bandwidth, self.worker_bandwidth)):
+            self.flow_cache = LruCache(self.CACHE_SIZE)
+            self.cache_bandwidth = self.worker_bandwidth
         self.flows = np.zeros((len(workers), len(workers)))
 
         self.recompute_flows = False
-        self.flow_cache = LruCache(self.CACHE_SIZE)
 
         def network_process():
             while True:
@@ -117,8 +159,28 @@ class MaxMinFlowNetModel(NetModel):
     def download(self, source, target, size, value=None):
         assert source != target
         event = Event(self.env)
-        rd = RunningDownload(size, event, value)
+        rd = RunningDownload(size + self.overhead, event, value)
         logger.info("New download %s; %s-%s size=%s", rd, source, target, size)
+        if self.latency:
+            self.env.timeout(self.latency).callbacks.append(
+                lambda _: self._start_download(source, target, rd))
+        else:
+            self._start_download(source, target, rd)
+        return event
+
+    def remove_worker(self, worker):
+        self.removed_workers.add(worker)
+        for (source, target), lst in self.downloads.items():
+            if lst and (source == worker or target == worker):
+                logger.info("Link %s-%s closed by removing %s", source, target, worker)
+                lst.clear()
+                self.recompute_flows = True
+        if self.recompute_flows and not self.recompute_event.triggered:
+            self.recompute_event.succeed()
+
+    def _start_download(self, source, target, rd):
+        if source in self.removed_workers or target in self.removed_workers:
+            return
         key = (source, target)
         lst = self.downloads.get(key)
         if lst is None:
@@ -130,7 +192,6 @@ class MaxMinFlowNetModel(NetModel):
         lst.append(rd)
         if not self.recompute_event.triggered:
             self.recompute_event.succeed()
-        return event
 
     def _update_speeds(self):
         timeout = None
@@ -169,14 +230,21 @@ class MaxMinFlowNetModel(NetModel):
                 connections[source.id, target.id] = 1
         key = connections.tobytes()
         f = self.flow_cache.get(key)
+        if self.statistics is not None:
+            self.statistics.flow_recomputations += 1
+            if f is not None:
+                self.statistics.flow_cache_hits += 1
         if f is None:
-            send_capacities = np.full(len(self.workers), self.bandwidth)
-            recv_capacities = send_capacities.copy()
-            f = compute_maxmin_flow(send_capacities, recv_capacities, connections)
+            f = self._compute_flows(connections)
             self.flow_cache.set(key, f)
         self._trace_flows(self.flows, f)
         self.flows = f
 
+    def _compute_flows(self, connections):
+        send_capacities = self.worker_bandwidth.copy()
+        recv_capacities = self.worker_bandwidth.copy()
+        return compute_maxmin_flow(send_capacities, recv_capacities, connections)
+
     def _trace_flows(self, old_flows, new_flows):
         if not self.event_listener:
             return
@@ -188,6 +256,113 @@ class MaxMinFlowNetModel(NetModel):
                     self.event_listener(NetModelFlowEvent(now, s, t, f))
 
 
+class TopologyNetModel(MaxMinFlowNetModel):
+    """
+    Max-min flow model over a tree topology (worker -> rack -> ... -> spine)
+
+        bandwidth - capacity of links between workers and their rack switches
+                    (in each direction) for workers without their own bandwidth
+        levels - list of (group_size, capacity) from the bottom of the tree; the first level
+                 splits workers into groups (racks) of `group_size` workers by their ids,
+                 each next level groups `group_size` groups of the previous level (e.g. pods),
+                 `capacity` is the bandwidth of group's uplink (and downlink) to the level
+                 above (None means unlimited); the top groups are connected by
+                 a non-blocking spine
+
+    Transfers inside a group use only links below the group, so oversubscribed uplinks
+    slow down only transfers that cross them.
+    """
+
+    def __init__(self, bandwidth=1.0, levels=(), latency=0.0, overhead=0.0):
+        super().__init__(bandwidth, latency, overhead)
+        for group_size, capacity in levels:
+            assert group_size >= 1
+        self.levels = tuple(levels)
+
+    def init(self, env, workers):
+        super().init(env, workers)
+        worker_count = len(workers)
+        groups = np.arange(worker_count)
+        # groups[level, worker] is the index of worker's group at the level
+        self.groups = np.empty((len(self.levels), worker_count), dtype=np.int64)
+
+        # Links: worker uplinks, worker downlinks, then uplinks and downlinks of groups
+        # of each level and a padding link with unlimited capacity at the end
+        capacities = list(self.worker_bandwidth) * 2
+        offsets = []
+        for level, (group_size, capacity) in enumerate(self.levels):
+            groups = groups // group_size
+            self.groups[level] = groups
+            group_count = int(groups.max()) + 1 if worker_count else 0
+            offsets.append((len(capacities), group_count))
+            capacity = float("inf") if capacity is None else float(capacity)
+            capacities.extend([capacity] * (2 * group_count))
+        padding = len(capacities)
+        capacities.append(float("inf"))
+        self.link_capacities = np.array(capacities)
+
+        # paths[source, target] are indices of links used by a transfer, padded by
+        # the padding link
+        ids = np.arange(worker_count)
+        paths = np.full((worker_count, worker_count, 2 + 2 * len(self.levels)), padding,
+                        dtype=np.int64)
+        paths[:, :, 0] = ids[:, None]
+        paths[:, :, 1] = worker_count + ids[None, :]
+        for level, (offset, group_count) in enumerate(offsets):
+            groups = self.groups[level]
+            crossing = groups[:, None] != groups[None, :]
+            up = np.broadcast_to(offset + groups[:, None], crossing.shape)
+            down = np.broadcast_to(offset + group_count + groups[None, :], crossing.shape)
+            paths[:, :, 2 + 2 * level][crossing] = up[crossing]
+            paths[:, :, 3 + 2 * level][crossing] = down[crossing]
+        self.paths = paths
+
+    def distance(self, source, target):
+        if source == target:
+            return 0
+        crossed = int((self.groups[:, source.id] != self.groups[:, target.id]).sum())
+        return 1 + 2 * crossed
+
+    def _compute_flows(self, connections):
+        sources, targets = np.nonzero(connections)
+        rates = compute_maxmin_link_flow(self.link_capacities, self.paths[sources, targets])
+        result = np.zeros(connections.shape)
+        result[sources, targets] = rates
+        return result
+
+
+def compute_maxmin_link_flow(capacities, paths):
+    """
+    Computes max-min fair rates of flows over shared links (progressive filling).
+
+        capacities - capacities of links, the last link is a padding link
+                     (its capacity is ignored)
+        paths - array (flows x k) of indices of links used by each flow,
+                padded by the index of the padding link
+
+    In each step, flows crossing the most loaded links get the fair share of these links.
+    """
+    capacities = np.array(capacities, dtype=np.float64)
+    capacities[-1] = np.inf
+    link_count = len(capacities)
+    rates = np.zeros(len(paths))
+    active = np.arange(len(paths))
+    while len(active):
+        active_paths = paths[active]
+        counts = np.bincount(active_paths.ravel(), minlength=link_count)
+        counts[-1] = 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.where(counts > 0, capacities / counts, np.inf)
+        share = shares.min()
+        bottlenecks = shares <= share * (1 + 1e-9)
+        fixed = bottlenecks[active_paths].any(axis=1)
+        rates[active[fixed]] = share
+        np.subtract.at(capacities, active_paths[fixed].ravel(), share)
+        np.maximum(capacities, 0, out=capacities)
+        active = active[~fixed]
+    return rates
+
+
 def compute_maxmin_flow(send_capacities, recv_capacities, connections):
     result = np.zeros_like(connections, dtype=np.float)
     with np.errstate(divide='ignore', invalid='ignore'):
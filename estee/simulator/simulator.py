@@ -1,29 +1,43 @@
 import logging
+import time
+from collections import deque
 
 from simpy import Environment, Event
 
+from .cluster import ClusterChange
 from .runtimeinfo import RuntimeState, TaskState
+from .statistics import SimulatorStatistics
 from .trace import TaskAssignTraceEvent, TaskRetractTraceEvent, FetchEndTraceEvent
-from .trace import export_to_chrome_events
+from .trace import write_chrome_events
+from .workload import Workload
 
 logger = logging.getLogger(__name__)
 
 
 class TaskAssignment:
 
-    __slots__ = ("worker", "task", "priority", "block", "cancelled", "remaining_inputs_count")
+    __slots__ = ("worker", "task", "priority", "block", "cancelled", "remaining_inputs_count",
+                 "duplicate")
 
-    def __init__(self, worker, task, priority=0, block=0):
+    def __init__(self, worker, task, priority=0, block=0, duplicate=False):
         assert block <= priority
         self.worker = worker
         self.task = task
         self.priority = priority
         self.block = block
+        self.duplicate = duplicate
         self.cancelled = False
         self.remaining_inputs_count = None
 
 
 class Simulator:
+    """
+        task_graph - TaskGraph submitted at the beginning of the simulation or Workload,
+                     whose jobs are submitted when they arrive
+        cluster_changes - list of ClusterChange (workers joining, leaving and failing
+                          during the simulation); workers are given by Worker instances
+                          or by their indices in `workers`
+    """
 
     def __init__(self,
                  task_graph,
@@ -32,38 +46,99 @@ class Simulator:
                  netmodel,
                  min_scheduling_interval=None,
                  scheduling_time=None,
-                 trace=False):
+                 trace=False,
+                 cluster_changes=None):
+        if isinstance(task_graph, Workload):
+            self.workload = task_graph
+            task_graph = task_graph.task_graph
+        else:
+            self.workload = None
         self.workers = workers
         self.task_graph = task_graph
         self.netmodel = netmodel
         self.scheduler = scheduler
-        self.new_finished = []
-        self.wakeup_event = None
-        self.env = None
         self.min_scheduling_interval = min_scheduling_interval
         self.scheduling_time = scheduling_time
-        self.reassign_allowed = False
-        self.task_start_notification = False
+        self.trace = trace
 
         if trace:
-            self.trace_events = []
             netmodel.set_event_listener(lambda e: self.trace_events.append(e))
-        else:
-            self.trace_events = None
 
         for i, worker in enumerate(workers):
             assert worker.id is None
             worker.id = i
 
+        self.all_tasks = list(task_graph.tasks.values())
+        self.all_objects = list(task_graph.objects.values())
+        self._init_cluster_changes(cluster_changes or ())
+        self._init_run_state()
+
+    def _init_cluster_changes(self, cluster_changes):
+        changes = []
+        kinds = {}
+        for change in sorted(cluster_changes, key=lambda c: c.time):
+            worker = change.worker
+            if isinstance(worker, int):
+                worker = self.workers[worker]
+            elif worker not in self.workers:
+                raise Exception("Cluster change of unknown worker {}".format(worker))
+            worker_kinds = kinds.setdefault(worker, [])
+            if (change.kind in worker_kinds or
+                    (change.kind != "join" and
+                     ("leave" in worker_kinds or "fail" in worker_kinds)) or
+                    (change.kind == "join" and worker_kinds)):
+                raise Exception("Invalid cluster change {} of worker {}, previous changes: {}"
+                                .format(change.kind, worker, worker_kinds))
+            worker_kinds.append(change.kind)
+            changes.append(ClusterChange(change.time, worker, change.kind))
+        self.cluster_changes = changes
+        self.initial_workers = [w for w in self.workers
+                                if kinds.get(w, ("leave",))[0] != "join"]
+
+    def _init_run_state(self):
+        self.new_finished = []
+        self.wakeup_event = None
+        self.reassign_allowed = False
+        self.duplication_allowed = False
+        self.task_start_notification = False
+        self.statistics = None
+        self.runtime_state = None
+        self.trace_events = [] if self.trace else None
+
         self.tasks_updated = set()
         self.objects_updated = set()
         self.reassign_failed = set()
+        self.evictions = []
+        self.cancelled_copies = []
+        self.source_waiters = {}
+        # prefetches of objects that are not computed yet, object -> [(worker, priority)]
+        self.pending_prefetches = {}
+        self.removed_workers = []
+        self.leaving_workers = []
+        self.lost_tasks = set()
         self.new_workers = []
         self.new_tasks = []
         self.new_objects = []
+        # job id -> number of unfinished tasks / start time of the first task
+        self.job_unfinished = {}
+        self.job_start = {}
         self.update_bandwidth = True
         self.env = Environment()
 
+    def reset(self, scheduler=None):
+        """
+        Prepare the simulator for another run of the same task graph on the same workers.
+
+        Workers and the network model are reused. If `scheduler` is given, it replaces
+        the current scheduler; otherwise the current scheduler is started again
+        (it has to support being restarted after stop()).
+        """
+        if scheduler is not None:
+            self.scheduler = scheduler
+        for worker in self.workers:
+            worker.reset()
+        self._init_run_state()
+
     def add_trace_event(self, trace_event):
         if self.trace_events is not None:
             self.trace_events.append(trace_event)
@@ -75,16 +150,33 @@ class Simulator:
             worker = self.workers[worker]
         priority = obj.get("priority", 0)
         blocking = obj.get("blocking", 0)
-        return TaskAssignment(worker, task, priority, blocking)
+        return TaskAssignment(worker, task, priority, blocking, obj.get("duplicate", False))
 
     def fetch_finished(self, worker, source_worker, data_object):
+        self.statistics.add_transfer(source_worker, worker, data_object.size)
         self.runtime_state.object_info(data_object).availability.append(worker)
+        if source_worker.leaving:
+            self.check_leaving_worker(source_worker)
         self.objects_updated.add(data_object)
         if not self.wakeup_event.triggered:
             self.wakeup_event.succeed()
+        waiters = self.source_waiters.pop(data_object, None)
+        if waiters:
+            for w in waiters:
+                w.wakeup_downloads()
         self.add_trace_event(
             FetchEndTraceEvent(self.env.now, worker, source_worker, data_object))
 
+    def wait_for_source(self, worker, data_object):
+        """
+        Wakes up downloads of the worker when a transfer of the object finishes
+        """
+        waiters = self.source_waiters.get(data_object)
+        if waiters is None:
+            self.source_waiters[data_object] = {worker}
+        else:
+            waiters.add(worker)
+
     def try_retract_assigned_task(self, task, info):
         for w in info.assigned_workers[:]:
             if not w.try_retract_task(task):
@@ -98,16 +190,49 @@ class Simulator:
     def apply_schedule(self, schedule):
         worker_loads = {}
         assignments = []
+        prefetches = []
         for obj in schedule:
             # TODO: Filter invalid assignemnts
-            assignments.append(self.read_assignment(obj))
+            if "object" in obj:
+                prefetches.append(obj)
+            else:
+                assignments.append(self.read_assignment(obj))
         assignments.sort(key=lambda a: a.priority, reverse=True)
         for assignment in assignments:
             info = self.runtime_state.task_info(assignment.task)
-            if info.state == TaskState.Finished:
+            if (assignment.worker is not None and not assignment.worker.accepts_tasks and
+                    info.state != TaskState.Finished):
+                # The worker was removed before the schedule was applied
+                logging.info("Assigning to removed worker (%s, %s)",
+                             assignment.task, assignment.worker)
+                if info.state == TaskState.Waiting:
+                    self.lost_tasks.add(assignment.task)
+                elif not assignment.duplicate:
+                    self.reassign_failed.add(assignment.task)
+                if not self.wakeup_event.triggered:
+                    self.wakeup_event.succeed()
+                continue
+            if assignment.duplicate:
+                if not self.duplication_allowed:
+                    raise Exception("Scheduler duplicates a task ({}) without announcing "
+                                    "duplication".format(assignment.task))
+                if assignment.worker is None:
+                    raise Exception("Task ({}) duplicated without a worker"
+                                    .format(assignment.task))
+                if info.state == TaskState.Finished:
+                    # The task may be finished before the schedule is applied
+                    logging.info("Duplicating finished task without effect (%s, %s)",
+                                 assignment.task, assignment.worker)
+                    continue
+            elif info.state == TaskState.Finished:
                 raise Exception("Scheduler tries to assign a finished task ({})"
                                 .format(assignment.task))
-            if info.state == TaskState.Assigned:
+            if info.state == TaskState.Assigned and assignment.duplicate:
+                if assignment.worker in info.assigned_workers:
+                    logging.info("Duplicating without effect (%s, %s)",
+                                 assignment.task, assignment.worker)
+                    continue
+            elif info.state == TaskState.Assigned:
                 if assignment.worker in info.assigned_workers:
                     logging.info("Reassigning without effect (%s, %s)",
                                  assignment.task, assignment.worker)
@@ -136,21 +261,37 @@ class Simulator:
             lst.append(assignment)
         for worker in worker_loads:
             worker.assign_tasks(worker_loads[worker])
+        for obj in prefetches:
+            self.apply_prefetch(obj)
+
+    def apply_prefetch(self, obj):
+        data_object = self.task_graph.objects[obj["object"]]
+        worker = self.workers[obj["worker"]]
+        priority = obj.get("priority", 0)
+        if not worker.alive:
+            logger.info("Prefetching to removed worker (%s, %s)", data_object, worker)
+        elif self.runtime_state.object_info(data_object).placing:
+            worker.prefetch(data_object, priority)
+        elif self.runtime_state.task_info(data_object.parent).state != TaskState.Finished:
+            self.pending_prefetches.setdefault(data_object, []).append((worker, priority))
+        else:
+            logger.info("Prefetching lost object without effect (%s, %s)", data_object, worker)
 
     def send_update(self):
         runtime_state = self.runtime_state
 
         def make_task_update(task):
             info = runtime_state.task_info(task)
-            assert len(info.assigned_workers) == 1
-            # The following code has to be updated
-            # when we allow duplication of tasks
-            return {
+            assigned_workers = info.assigned_workers
+            result = {
                 "id": task.id,
                 "state": info.state,
-                "worker": info.assigned_workers[0].id,
+                "worker": assigned_workers[0].id,
                 "running": bool(info.running_at_workers)
             }
+            if len(assigned_workers) > 1:
+                result["workers"] = [w.id for w in assigned_workers]
+            return result
 
         def make_object_update(obj):
             info = runtime_state.object_info(obj)
@@ -197,8 +338,31 @@ class Simulator:
             ]
             self.reassign_failed = set()
 
+        if self.removed_workers:
+            message["removed_workers"] = [w.id for w in self.removed_workers]
+            self.removed_workers = []
+
+        if self.lost_tasks:
+            message["lost_tasks"] = [t.id for t in self.lost_tasks]
+            self.lost_tasks = set()
+
+        if self.cancelled_copies:
+            message["cancelled_copies"] = [
+                {"task": t.id, "worker": w.id} for t, w in self.cancelled_copies
+            ]
+            self.cancelled_copies = []
+
+        if self.evictions:
+            message["evictions"] = [
+                {"worker": w.id, "object": o.id, "spilled": spilled}
+                for w, o, spilled in self.evictions
+            ]
+            self.evictions = []
+
         logger.debug("Sending update %s", message)
+        start = time.perf_counter()
         schedule = self.scheduler.send_message(message)
+        self.statistics.add_scheduler_time(time.perf_counter() - start)
         logger.debug("Scheduler result %s", schedule)
         return schedule
 
@@ -211,12 +375,17 @@ class Simulator:
         # and task submit, as it is usually separated in real-word
         # reactors.
 
-        self.new_workers += self.workers
+        self.new_workers += self.initial_workers
         schedule = self.send_update()
         assert not schedule
 
-        self.new_tasks += list(self.task_graph.tasks.values())
-        self.new_objects += list(self.task_graph.objects.values())
+        if self.workload is None:
+            self.new_tasks += self.all_tasks
+            self.new_objects += self.all_objects
+        else:
+            for job in self.workload.jobs:
+                if job.arrival_time <= 0:
+                    self._submit_job(job)
 
         schedule = self.send_update()
         if scheduling_time:
@@ -226,6 +395,9 @@ class Simulator:
 
         while self.unprocessed_tasks > 0:
             self.wakeup_event = Event(env)
+            if self.new_tasks:
+                # A job arrived while the scheduler was running
+                self.wakeup_event.succeed()
             if min_scheduling_interval:
                 yield self.wakeup_event & timeout(min_scheduling_interval)
             else:
@@ -237,9 +409,29 @@ class Simulator:
             if schedule:
                 self.apply_schedule(schedule)
 
+    def _submit_job(self, job):
+        logger.info("Job %s arrived", job)
+        graph = job.task_graph
+        self.new_tasks += graph.tasks.values()
+        self.new_objects += graph.objects.values()
+        self.job_unfinished[job.id] = graph.task_count
+
+    def _workload_process(self, env):
+        for job in self.workload.jobs:
+            if job.arrival_time <= 0:
+                continue
+            yield env.timeout(job.arrival_time - env.now)
+            self._submit_job(job)
+            if self.wakeup_event is not None and not self.wakeup_event.triggered:
+                self.wakeup_event.succeed()
+
     def on_task_start(self, worker, task):
         logger.debug("Task %s started on %s", task, worker)
         self.runtime_state.task_info(task).running_at_workers.append(worker)
+        if self.workload is not None:
+            job = self.workload.task_jobs[task]
+            if job.id not in self.job_start:
+                self.job_start[job.id] = self.env.now
         if self.task_start_notification:
             self.tasks_updated.add(task)
             if not self.wakeup_event.triggered:
@@ -254,8 +446,16 @@ class Simulator:
         info.running_at_workers.remove(worker)
         info.state = TaskState.Finished
         info.end_time = self.env.now
+        if len(info.assigned_workers) > 1:
+            self._cancel_copies(task, info, worker)
         self.new_finished.append(task)
         self.unprocessed_tasks -= 1
+        if self.workload is not None:
+            job = self.workload.task_jobs[task]
+            self.job_unfinished[job.id] -= 1
+            if self.job_unfinished[job.id] == 0:
+                logger.info("Job %s finished", job)
+                self.statistics.add_job(job, self.job_start[job.id], self.env.now)
 
         worker_updates = {}
 
@@ -264,8 +464,10 @@ class Simulator:
 
         for o in task.outputs:
             o_info = runtime_state.object_info(o)
-            o_info.placing.append(worker)
-            o_info.availability.append(worker)
+            if worker not in o_info.placing:
+                o_info.placing.append(worker)
+            if worker not in o_info.availability:
+                o_info.availability.append(worker)
             objects_updated.add(o)
             tasks = o.consumers
             for t in tasks:
@@ -279,7 +481,11 @@ class Simulator:
                     assert t_info.unfinished_inputs == 0
 
             for t in tasks:
-                for w in runtime_state.task_info(t).assigned_workers:
+                t_info = runtime_state.task_info(t)
+                if t_info.state == TaskState.Finished:
+                    # The output was recomputed for other consumers
+                    continue
+                for w in t_info.assigned_workers:
                     updates = worker_updates.get(w)
                     if updates is None:
                         updates = []
@@ -288,9 +494,186 @@ class Simulator:
 
         for w in worker_updates:
             w.update_tasks(worker_updates[w])
+
+        if self.pending_prefetches:
+            for o in task.outputs:
+                for w, priority in self.pending_prefetches.pop(o, ()):
+                    if w.alive:
+                        w.prefetch(o, priority)
+
+        for w in self.leaving_workers[:]:
+            # Outputs of leaving workers may be no longer needed
+            if w != worker:
+                self.check_leaving_worker(w)
+
+        if self.source_waiters:
+            # Objects may be recomputed after their replicas were lost
+            for o in task.outputs:
+                for w in self.source_waiters.pop(o, ()):
+                    w.wakeup_downloads()
+
         if not self.wakeup_event.triggered:
             self.wakeup_event.succeed()
 
+    def _cancel_copies(self, task, info, worker):
+        """
+        Cancels copies of a duplicated task that was finished by `worker`
+        """
+        for w in info.assigned_workers:
+            if w == worker:
+                continue
+            logger.debug("Copy of task %s on %s cancelled", task, w)
+            if w in info.running_at_workers:
+                info.running_at_workers.remove(w)
+            w.cancel_task(task)
+            self.cancelled_copies.append((task, w))
+            self.add_trace_event(TaskRetractTraceEvent(self.env.now, w, task))
+        info.assigned_workers = [worker]
+
+    def _cluster_process(self, env):
+        for change in self.cluster_changes:
+            if change.time > env.now:
+                yield env.timeout(change.time - env.now)
+            worker = change.worker
+            logger.info("Cluster change: %s", change)
+            if change.kind == "join":
+                env.process(worker.run(env, self, self.netmodel))
+                self.new_workers.append(worker)
+            elif change.kind == "leave":
+                self._worker_leave(worker)
+            else:
+                self.removed_workers.append(worker)
+                self._remove_worker(worker)
+            if self.wakeup_event is not None and not self.wakeup_event.triggered:
+                self.wakeup_event.succeed()
+
+    def _worker_leave(self, worker):
+        self.removed_workers.append(worker)
+        runtime_state = self.runtime_state
+        lost_inputs = []
+        for task in worker.retract_unstarted_tasks():
+            self.add_trace_event(TaskRetractTraceEvent(self.env.now, worker, task))
+            if self._remove_assigned_worker(task, runtime_state.task_info(task), worker):
+                lost_inputs.extend(task.inputs)
+        self._recompute_lost_objects(lost_inputs)
+        worker.leaving = True
+        self.leaving_workers.append(worker)
+        self.check_leaving_worker(worker)
+
+    def check_leaving_worker(self, worker):
+        """
+        Removes a leaving worker if it has no running tasks and no needed objects
+        that are not available on other workers
+        """
+        if not worker.alive or worker.running_tasks:
+            return
+        runtime_state = self.runtime_state
+        for obj in worker.data | worker.spilled:
+            if (runtime_state.object_info(obj).availability == [worker] and
+                    not all(runtime_state.task_info(t).is_finished for t in obj.consumers)):
+                return
+        self._remove_worker(worker)
+
+    def _remove_worker(self, worker):
+        """
+        Removes the worker from the cluster, its tasks and objects are lost
+        """
+        logger.info("Worker %s removed", worker)
+        runtime_state = self.runtime_state
+        if worker.leaving:
+            self.leaving_workers.remove(worker)
+            worker.leaving = False
+        worker.remove()
+        self.netmodel.remove_worker(worker)
+        self.statistics.add_worker_time(worker, self.env.now - worker.join_time)
+        alive_workers = [w for w in self.workers if w.alive]
+        for w in alive_workers:
+            w.source_removed(worker)
+
+        lost_objects = []
+        for task in list(worker.assignments):
+            if self._remove_assigned_worker(task, runtime_state.task_info(task), worker):
+                lost_objects.extend(task.inputs)
+
+        for obj in worker.data | worker.spilled:
+            info = runtime_state.object_info(obj)
+            if worker in info.placing:
+                info.placing.remove(worker)
+            if worker in info.availability:
+                info.availability.remove(worker)
+            if not info.availability:
+                lost_objects.append(obj)
+            elif not info.placing:
+                # A replica becomes the primary copy of the object
+                info.placing.append(info.availability[0])
+            self.objects_updated.add(obj)
+
+        for obj in lost_objects:
+            if not runtime_state.object_info(obj).availability:
+                for w in alive_workers:
+                    w.object_lost(obj)
+        self._recompute_lost_objects(lost_objects)
+
+    def _remove_assigned_worker(self, task, info, worker):
+        """
+        Removes a copy of the task assigned to a removed worker,
+        returns True if the task was lost (it has no other copy)
+        """
+        info.assigned_workers.remove(worker)
+        if worker in info.running_at_workers:
+            info.running_at_workers.remove(worker)
+        if info.assigned_workers:
+            self.tasks_updated.add(task)
+            return False
+        self._reset_task(task, info)
+        return True
+
+    def _reset_task(self, task, info):
+        """
+        Returns the task back into the waiting state, it is reported to the scheduler as lost
+        """
+        if info.state == TaskState.Finished:
+            self.unprocessed_tasks += 1
+            if self.workload is not None:
+                self.job_unfinished[self.workload.task_jobs[task].id] += 1
+            for o in task.outputs:
+                for t in o.consumers:
+                    self.runtime_state.task_info(t).unfinished_inputs += 1
+        self.statistics.add_lost_task(task, info.state == TaskState.Finished)
+        info.state = TaskState.Waiting
+        info.assigned_workers = []
+        info.running_at_workers = []
+        info.end_time = None
+        self.tasks_updated.discard(task)
+        self.reassign_failed.discard(task)
+        self.lost_tasks.add(task)
+
+    def _recompute_lost_objects(self, objects):
+        """
+        Resets finished tasks whose outputs were lost and are still needed
+        (recursively, as their inputs may be lost too)
+        """
+        runtime_state = self.runtime_state
+        objects = deque(objects)
+        while objects:
+            obj = objects.popleft()
+            if runtime_state.object_info(obj).availability:
+                continue
+            task = obj.parent
+            info = runtime_state.task_info(task)
+            if (info.state != TaskState.Finished or
+                    all(runtime_state.task_info(t).is_finished for t in obj.consumers)):
+                continue
+            logger.info("Object %s lost, task %s is computed again", obj, task)
+            self._reset_task(task, info)
+            objects.extend(task.inputs)
+
+    def on_object_evicted(self, worker, obj, spilled):
+        logger.debug("Object %s evicted from %s (spilled=%s)", obj, worker, spilled)
+        self.statistics.add_eviction(worker, obj)
+        self.evictions.append((worker, obj, spilled))
+        self.objects_updated.add(obj)
+
     def start_scheduler(self):
         self.scheduler._simulator = self
         message = self.scheduler.start()
@@ -303,6 +686,7 @@ class Simulator:
                     message.get("reassigning"),
                     message.get("task_start_notification"))
         self.reassign_allowed = bool(message.get("reassigning", False))
+        self.duplication_allowed = bool(message.get("duplication", False))
         self.task_start_notification = bool(message.get("task_start_notification", False))
 
     def stop_scheduler(self):
@@ -310,28 +694,38 @@ class Simulator:
         self.scheduler._simulator = None
         logger.info("Scheduler stopped")
 
-    def write_chrome_trace(self, filename):
+    def write_chrome_trace(self, filename, counter_interval=None, flow_arrows=True):
         if self.trace_events is None:
             raise Exception("Tracing is not enabled in simulator, use Simulator(..., trace=True)")
-        data = export_to_chrome_events(self.trace_events)
         with open(filename, "w") as f:
-            f.write(data)
+            write_chrome_events(self.trace_events, f, counter_interval, flow_arrows)
 
     def run(self):
+        if self.runtime_state is not None:
+            raise Exception("Simulator was already run, call reset() before running it again")
         assert not self.trace_events
 
         self.runtime_state = RuntimeState(self.task_graph)
         self.unprocessed_tasks = self.task_graph.task_count
+        self.statistics = SimulatorStatistics(len(self.workers))
 
         env = self.env
+        self.netmodel.statistics = self.statistics
         self.netmodel.init(self.env, self.workers)
 
-        for worker in self.workers:
+        for worker in self.initial_workers:
             env.process(worker.run(env, self, self.netmodel))
 
         master_process = env.process(self._master_process(env))
+        if self.cluster_changes:
+            env.process(self._cluster_process(env))
+        if self.workload is not None:
+            env.process(self._workload_process(env))
 
         self.start_scheduler()
         env.run(master_process)
         self.stop_scheduler()
+        for worker in self.workers:
+            if worker.alive:
+                self.statistics.add_worker_time(worker, env.now - worker.join_time)
         return env.now
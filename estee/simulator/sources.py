@@ -0,0 +1,102 @@
+import random
+
+
+class SourcePolicy:
+    """
+    Selects a worker from which an object is downloaded.
+
+    `select()` gets the downloading worker, the object and a non-empty list of workers
+    that hold the object and have a free download slot for the downloading worker
+    (see `max_downloads_per_worker`). The number of transfers currently sent by a worker
+    is in `worker.upload_count`.
+
+    When `select()` returns None, the download is postponed; the worker tries it again
+    when one of its downloads finishes or when another transfer of the object finishes.
+    """
+
+    def select(self, worker, obj, candidates):
+        raise NotImplementedError()
+
+
+class ProducerSourcePolicy(SourcePolicy):
+    """
+    Downloads from the worker that produced the object
+    """
+
+    def select(self, worker, obj, candidates):
+        placing = worker.simulator.runtime_state.object_info(obj).placing
+        for source in placing:
+            if source in candidates:
+                return source
+        return None
+
+
+class LeastLoadedSourcePolicy(SourcePolicy):
+    """
+    Downloads from the replica with the fewest running uploads
+    """
+
+    def select(self, worker, obj, candidates):
+        return min(candidates, key=lambda w: w.upload_count)
+
+
+class RandomSourcePolicy(SourcePolicy):
+    """
+    Downloads from a random replica
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def select(self, worker, obj, candidates):
+        return self.random.choice(candidates)
+
+
+class NearestSourcePolicy(SourcePolicy):
+    """
+    Downloads from the nearest replica (by `NetModel.distance`), the least loaded one
+    is used when more replicas have the same distance
+    """
+
+    def select(self, worker, obj, candidates):
+        distance = worker.netmodel.distance
+        return min(candidates, key=lambda w: (distance(w, worker), w.upload_count))
+
+
+class BroadcastSourcePolicy(SourcePolicy):
+    """
+    Tree broadcast: each replica sends the object to at most `fanout` workers at once,
+    so workers that already received the object serve later fetches. When all replicas
+    are busy, the download waits until a new replica appears or an upload finishes.
+    The least loaded replica is used when more of them are free.
+    """
+
+    def __init__(self, fanout=2):
+        assert fanout >= 1
+        self.fanout = fanout
+
+    def select(self, worker, obj, candidates):
+        fanout = self.fanout
+        free = [w for w in candidates if w.uploads.get(obj, 0) < fanout]
+        if not free:
+            return None
+        return min(free, key=lambda w: w.upload_count)
+
+
+SOURCE_POLICIES = {
+    "producer": ProducerSourcePolicy,
+    "least-loaded": LeastLoadedSourcePolicy,
+    "random": RandomSourcePolicy,
+    "nearest": NearestSourcePolicy,
+    "broadcast": BroadcastSourcePolicy,
+}
+
+
+def create_source_policy(policy):
+    if policy is None:
+        return ProducerSourcePolicy()
+    if isinstance(policy, str):
+        if policy not in SOURCE_POLICIES:
+            raise Exception("Unknown source policy '{}'".format(policy))
+        return SOURCE_POLICIES[policy]()
+    return policy
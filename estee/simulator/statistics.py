@@ -0,0 +1,156 @@
+def mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+class SimulatorStatistics:
+    """
+    Counters collected by the simulator during a run.
+
+    The counters are updated directly by the simulator, workers and network model,
+    so they are available even when tracing is disabled.
+
+        transfers - bytes transferred between workers, {(source_id, target_id): size}
+        scheduler_times - wall time (in seconds) spent in each scheduler invocation
+        flow_recomputations - how many times a network model recomputed its flows
+        flow_cache_hits - how many flow recomputations were served from a cache
+        peak_ready_queue - the longest queue of ready tasks for each worker
+        peak_download_queue - the longest queue of scheduled downloads for each worker
+        peak_memory - the highest memory usage of each worker (only for workers with memory)
+        evictions - number of objects evicted from workers' memory
+        spilled - amount of data spilled to workers' disks
+        unspilled - amount of data read back from workers' disks
+        cancelled_copies - number of cancelled copies of duplicated tasks
+        wasted_time - cpu time (duration * cpus) spent by cancelled copies
+        prefetches - number of downloads started because of prefetches from the scheduler
+        lost_tasks - number of tasks returned to the scheduler because their worker was removed
+                     from the cluster (including recomputed tasks)
+        recomputed_tasks - number of finished tasks computed again because their outputs
+                           were lost
+        worker_time - cpu time (cpus * time) of workers while they were part of the cluster
+        jobs - finished jobs of a workload, {job_id: (arrival_time, start_time, end_time)};
+               start_time is the start of the first task of the job
+    """
+
+    def __init__(self, worker_count=0):
+        self.transfers = {}
+        self.scheduler_times = []
+        self.flow_recomputations = 0
+        self.flow_cache_hits = 0
+        self.peak_ready_queue = [0] * worker_count
+        self.peak_download_queue = [0] * worker_count
+        self.peak_memory = [0] * worker_count
+        self.evictions = 0
+        self.spilled = 0
+        self.unspilled = 0
+        self.cancelled_copies = 0
+        self.wasted_time = 0
+        self.prefetches = 0
+        self.lost_tasks = 0
+        self.recomputed_tasks = 0
+        self.worker_time = 0
+        self.jobs = {}
+
+    def add_transfer(self, source, target, size):
+        key = (source.id, target.id)
+        self.transfers[key] = self.transfers.get(key, 0) + size
+
+    def add_scheduler_time(self, duration):
+        self.scheduler_times.append(duration)
+
+    def update_ready_queue(self, worker, length):
+        if length > self.peak_ready_queue[worker.id]:
+            self.peak_ready_queue[worker.id] = length
+
+    def update_download_queue(self, worker, length):
+        if length > self.peak_download_queue[worker.id]:
+            self.peak_download_queue[worker.id] = length
+
+    def update_memory_usage(self, worker, usage):
+        if usage > self.peak_memory[worker.id]:
+            self.peak_memory[worker.id] = usage
+
+    def add_eviction(self, worker, obj):
+        self.evictions += 1
+
+    def add_spill(self, worker, size):
+        self.spilled += size
+
+    def add_unspill(self, worker, size):
+        self.unspilled += size
+
+    def add_cancelled_copy(self, worker, task, cpu_time):
+        self.cancelled_copies += 1
+        self.wasted_time += cpu_time
+
+    def add_prefetch(self, worker, obj):
+        self.prefetches += 1
+
+    def add_lost_task(self, task, recomputed):
+        self.lost_tasks += 1
+        if recomputed:
+            self.recomputed_tasks += 1
+
+    def add_worker_time(self, worker, time):
+        self.worker_time += time * worker.cpus
+
+    def add_job(self, job, start_time, end_time):
+        self.jobs[job.id] = (job.arrival_time, start_time, end_time)
+
+    @property
+    def job_latencies(self):
+        return [end - arrival for arrival, _, end in self.jobs.values()]
+
+    @property
+    def job_queueing_delays(self):
+        return [start - arrival for arrival, start, _ in self.jobs.values()]
+
+    @property
+    def job_throughput(self):
+        """
+        Finished jobs per time unit (from the first arrival to the last finished job)
+        """
+        if not self.jobs:
+            return 0
+        span = (max(end for _, _, end in self.jobs.values()) -
+                min(arrival for arrival, _, _ in self.jobs.values()))
+        return len(self.jobs) / span if span > 0 else 0
+
+    @property
+    def total_transfer(self):
+        return sum(self.transfers.values())
+
+    @property
+    def scheduler_invocations(self):
+        return len(self.scheduler_times)
+
+    @property
+    def scheduler_time(self):
+        return sum(self.scheduler_times)
+
+    def to_dict(self):
+        return {
+            "total_transfer": self.total_transfer,
+            "scheduler_invocations": self.scheduler_invocations,
+            "scheduler_time": self.scheduler_time,
+            "flow_recomputations": self.flow_recomputations,
+            "flow_cache_hits": self.flow_cache_hits,
+            "peak_ready_queue": max(self.peak_ready_queue, default=0),
+            "peak_download_queue": max(self.peak_download_queue, default=0),
+            "peak_memory": max(self.peak_memory, default=0),
+            "evictions": self.evictions,
+            "spilled": self.spilled,
+            "unspilled": self.unspilled,
+            "cancelled_copies": self.cancelled_copies,
+            "wasted_time": self.wasted_time,
+            "prefetches": self.prefetches,
+            "lost_tasks": self.lost_tasks,
+            "recomputed_tasks": self.recomputed_tasks,
+            "worker_time": self.worker_time,
+            "mean_job_latency": mean(self.job_latencies),
+            "max_job_latency": max(self.job_latencies, default=0),
+            "mean_queueing_delay": mean(self.job_queueing_delays),
+            "job_throughput": self.job_throughput,
+        }
+
+    def __repr__(self):
+        return "<SimulatorStatistics {}>".format(self.to_dict())
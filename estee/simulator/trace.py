@@ -2,6 +2,8 @@ import collections
 import math
 import json
 
+import numpy as np
+
 TaskAssignTraceEvent = collections.namedtuple("TaskAssign", ["time", "worker", "task"])
 TaskRetractTraceEvent = collections.namedtuple("TaskRetract", ["time", "worker", "task"])
 TaskStartTraceEvent = collections.namedtuple("TaskStart", ["time", "worker", "task"])
@@ -34,13 +36,124 @@ def merge_trace_events(trace_events, start_pred, end_pred, key_fn, start_map=Non
                 open_events[key] = event
         elif end_pred(event):
             key = key_fn(event)
-            start_event = open_events[key]
+            start_event = open_events.pop(key)
             if end_map:
                 yield end_map(start_event, event)
             else:
                 yield start_event, event
 
 
+class TraceIndex:
+    """
+    Trace events partitioned by their type and worker.
+
+    The index is built in a single pass over the trace. Per-worker partitions keep
+    the original order of events, so they can be passed to the ``build_*`` functions
+    instead of the whole trace. Iterating over the index yields the original events,
+    hence it can be used wherever a list of trace events is expected.
+    """
+
+    def __init__(self, trace_events):
+        self.events = trace_events
+        self.task_events = collections.defaultdict(list)  # start, end
+        self.assign_events = collections.defaultdict(list)  # assign, retract, end
+        self.fetch_events = collections.defaultdict(list)  # worker is a source or a target
+        self.flow_events = collections.defaultdict(list)  # worker is a source or a target
+        self.fetches = []
+        self.flows = []
+        self.task_starts = {}
+        self.end_time = 0
+
+        task_events = self.task_events
+        assign_events = self.assign_events
+        fetch_events = self.fetch_events
+        flow_events = self.flow_events
+        end_time = 0
+
+        for event in trace_events:
+            event_type = type(event)
+            if event.time > end_time:
+                end_time = event.time
+            if event_type is TaskStartTraceEvent:
+                task_events[event.worker].append(event)
+                self.task_starts[event.task] = event
+            elif event_type is TaskEndTraceEvent:
+                task_events[event.worker].append(event)
+                assign_events[event.worker].append(event)
+            elif event_type is TaskAssignTraceEvent or event_type is TaskRetractTraceEvent:
+                if event.worker is not None:
+                    assign_events[event.worker].append(event)
+            elif event_type is FetchStartTraceEvent or event_type is FetchEndTraceEvent:
+                fetch_events[event.target_worker].append(event)
+                fetch_events[event.source_worker].append(event)
+                self.fetches.append(event)
+            elif event_type is NetModelFlowEvent:
+                flow_events[event.target_worker].append(event)
+                flow_events[event.source_worker].append(event)
+                self.flows.append(event)
+        self.end_time = end_time
+
+    def task_intervals(self, worker=None):
+        """
+        Returns a list of pairs (start_event, end_event) of finished tasks
+        """
+        if worker is not None:
+            workers = (worker,)
+        else:
+            workers = self.task_events.keys()
+        result = []
+        for w in workers:
+            result.extend(merge_trace_events(
+                self.task_events.get(w, ()),
+                lambda t: type(t) is TaskStartTraceEvent,
+                lambda t: type(t) is TaskEndTraceEvent,
+                lambda e: e.task))
+        return result
+
+    def transfers(self):
+        """
+        Returns a list of pairs (fetch_start_event, fetch_end_event)
+        """
+        return list(merge_trace_events(
+            self.fetches,
+            lambda t: type(t) is FetchStartTraceEvent,
+            lambda t: type(t) is FetchEndTraceEvent,
+            lambda e: (e.output, e.target_worker, e.source_worker)))
+
+    def task_frame(self):
+        """
+        Returns finished tasks as a pandas DataFrame
+        (columns: worker, task, cpus, start, end)
+        """
+        from pandas import DataFrame
+        return DataFrame([(e1.worker.id, e1.task.id, e1.task.cpus, e1.time, e2.time)
+                          for e1, e2 in self.task_intervals()],
+                         columns=["worker", "task", "cpus", "start", "end"])
+
+    def transfer_frame(self):
+        """
+        Returns finished transfers as a pandas DataFrame
+        (columns: source, target, output, size, start, end)
+        """
+        from pandas import DataFrame
+        return DataFrame([(e1.source_worker.id, e1.target_worker.id, e1.output.id,
+                           e1.output.size, e1.time, e2.time)
+                          for e1, e2 in self.transfers()],
+                         columns=["source", "target", "output", "size", "start", "end"])
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+
+def as_trace_index(trace_events):
+    if isinstance(trace_events, TraceIndex):
+        return trace_events
+    return TraceIndex(trace_events)
+
+
 def build_task_locations(trace_events, worker):
     slots = []
 
@@ -160,22 +273,97 @@ def build_worker_bandwidth(trace_events, worker):
     return events
 
 
-def plot_task_communication(trace_events, workers, show_communication=False):
+def build_worker_utilization(trace_events, workers, bucket_count, end_time=None):
+    """
+    Computes the average CPU utilization of workers in time buckets.
+
+    Returns a pair (edges, matrix) where ``matrix[i, j]`` is the utilization (0..1)
+    of ``workers[i]`` between ``edges[j]`` and ``edges[j + 1]``.
+    """
+    index = as_trace_index(trace_events)
+    if end_time is None:
+        end_time = index.end_time
+    if end_time <= 0:
+        end_time = 1
+
+    edges = np.linspace(0, end_time, bucket_count + 1)
+    matrix = np.zeros((len(workers), bucket_count))
+
+    for i, worker in enumerate(workers):
+        intervals = index.task_intervals(worker)
+        if not intervals:
+            continue
+        times = np.array([e.time for pair in intervals for e in pair], dtype=float)
+        cpus = np.array([e1.task.cpus for e1, _ in intervals], dtype=float)
+        deltas = np.empty(len(times))
+        deltas[0::2] = cpus
+        deltas[1::2] = -cpus
+
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        usage = np.cumsum(deltas[order])
+        # integral of used cpus over time, evaluated at event times
+        area = np.concatenate(([0.0], np.cumsum(usage[:-1] * np.diff(times))))
+        matrix[i] = np.diff(np.interp(edges, times, area)) / (np.diff(edges) * worker.cpus)
+
+    return edges, matrix
+
+
+def build_transfer_bins(trace_events, workers, bucket_count, end_time=None):
+    """
+    Aggregates finished transfers by source, target and time bucket of their end.
+
+    Returns a pandas DataFrame with columns:
+    source, target, bucket, count, size, start, end (of the bucket)
+    """
+    from pandas import DataFrame
+
+    index = as_trace_index(trace_events)
+    if end_time is None:
+        end_time = index.end_time
+    if end_time <= 0:
+        end_time = 1
+    width = end_time / bucket_count
+
+    worker_indices = {worker: i for i, worker in enumerate(workers)}
+    frame = DataFrame([(worker_indices[e1.source_worker],
+                        worker_indices[e2.target_worker],
+                        e2.time,
+                        e1.output.size) for e1, e2 in index.transfers()],
+                      columns=["source", "target", "time", "size"])
+    frame["bucket"] = np.minimum((frame["time"] // width).astype(int), bucket_count - 1)
+
+    result = frame.groupby(["source", "target", "bucket"])["size"].agg(["count", "sum"])
+    result = result.rename(columns={"sum": "size"}).reset_index()
+    result["start"] = result["bucket"] * width
+    result["end"] = result["start"] + width
+    return result
+
+
+def plot_task_communication(trace_events, workers, show_communication=False, time_window=None):
     """
     Plots individual tasks on workers into a grid chart (one chart per worker).
 
     :param show_communication: Merge all worker charts into one and plot communication edges.
+    :param time_window: Pair (start, end); only tasks and transfers that overlap
+                        with the window are rendered.
     """
     from bokeh import models, plotting
     from bokeh.layouts import gridplot
     from pandas import DataFrame
 
-    end_time = math.ceil(max([e.time for e in trace_events]))
+    trace_index = as_trace_index(trace_events)
+    if time_window is None:
+        time_window = (0, math.ceil(trace_index.end_time))
+    window_start, window_end = time_window
+
+    def in_window(start, end):
+        return end >= window_start and start <= window_end
 
     plots = []
     if show_communication:
         plot = plotting.figure(plot_width=1200, plot_height=850,
-                               x_range=(0, end_time),
+                               x_range=(window_start, window_end),
                                title='CPU schedules')
         plot.yaxis.axis_label = 'Worker'
         plot.xaxis.axis_label = 'Time'
@@ -186,7 +374,7 @@ def plot_task_communication(trace_events, workers, show_communication=False):
             return plot
         else:
             p = plotting.figure(plot_width=600, plot_height=300,
-                                x_range=(0, end_time),
+                                x_range=(window_start, window_end),
                                 title='Worker task execution')
             p.yaxis.axis_label = 'Task'
             p.xaxis.axis_label = 'Time'
@@ -197,7 +385,8 @@ def plot_task_communication(trace_events, workers, show_communication=False):
 
     # render task rectangles
     for index, worker in enumerate(workers):
-        locations = list(build_task_locations(trace_events, worker))
+        locations = list(build_task_locations(trace_index.task_events.get(worker, ()),
+                                              worker))
 
         def normalize_height(height):
             if show_communication:
@@ -213,11 +402,15 @@ def plot_task_communication(trace_events, workers, show_communication=False):
             for (task, rect) in locations
         ]
 
-        render_rectangles(worker_plot, rectangles)
-
         for i, (task, _) in enumerate(locations):
             task_to_loc[task] = rectangles[i]
 
+        visible = [i for i, rect in enumerate(rectangles) if in_window(rect[0], rect[1])]
+        locations = [locations[i] for i in visible]
+        rectangles = [rectangles[i] for i in visible]
+
+        render_rectangles(worker_plot, rectangles)
+
         frame = DataFrame()
         frame["label"] = [t[0].name for t in locations]
         frame["bottom"] = [normalize_height(t[1][2]) for t in locations]
@@ -231,17 +424,15 @@ def plot_task_communication(trace_events, workers, show_communication=False):
         worker_plot.add_layout(labels)
 
     if show_communication:
-        frame = DataFrame(merge_trace_events(
-            trace_events, lambda e: isinstance(e, FetchStartTraceEvent),
-            lambda e: isinstance(e, FetchEndTraceEvent),
-            lambda e: (e.output, e.target_worker, e.source_worker),
-            end_map=lambda e1, e2: (workers.index(e1.source_worker),
-                                    e1.time,
-                                    workers.index(e2.target_worker),
-                                    e2.time,
-                                    "{}/{:.2f}".format(e1.output.parent.name, e1.output.size),
-                                    e1.output)),
-            columns=["worker", "start", "worker2", "end", "label", "output"])
+        worker_indices = {worker: i for i, worker in enumerate(workers)}
+        frame = DataFrame([(worker_indices[e1.source_worker],
+                            e1.time,
+                            worker_indices[e2.target_worker],
+                            e2.time,
+                            "{}/{:.2f}".format(e1.output.parent.name, e1.output.size),
+                            e1.output) for e1, e2 in trace_index.transfers()
+                           if in_window(e1.time, e2.time)],
+                          columns=["worker", "start", "worker2", "end", "label", "output"])
         frame["src_task_y"] = frame["output"].map(
             lambda o: (task_to_loc[o.parent][2] + task_to_loc[o.parent][3]) / 2)
 
@@ -268,10 +459,11 @@ def plot_worker_usage(trace_events, workers):
 
     plots = []
 
-    end_time = math.ceil(max([e.time for e in trace_events]))
+    trace_index = as_trace_index(trace_events)
+    end_time = math.ceil(trace_index.end_time)
 
     for index, worker in enumerate(workers):
-        rectangles = list(build_worker_usage(trace_events, worker))
+        rectangles = list(build_worker_usage(trace_index.task_events.get(worker, ()), worker))
         plot = figure(plot_width=600,
                       plot_height=300,
                       x_range=(0, end_time),
@@ -296,10 +488,12 @@ def plot_worker_transfer_size(trace_events, workers):
 
     plots = []
 
-    end_time = math.ceil(max([e.time for e in trace_events]))
+    trace_index = as_trace_index(trace_events)
+    end_time = math.ceil(trace_index.end_time)
 
     for index, worker in enumerate(workers):
-        (bandwidth_in, bandwidth_out) = list(build_worker_transfer_size(trace_events, worker))
+        (bandwidth_in, bandwidth_out) = list(build_worker_transfer_size(
+            trace_index.fetch_events.get(worker, ()), worker))
 
         bandwidth_in.append((end_time, bandwidth_in[-1][1]))
         bandwidth_out.append((end_time, bandwidth_out[-1][1]))
@@ -333,10 +527,11 @@ def plot_worker_bandwidth(trace_events, workers):
 
     plots = []
 
-    end_time = math.ceil(max([e.time for e in trace_events]))
+    trace_index = as_trace_index(trace_events)
+    end_time = math.ceil(trace_index.end_time)
 
     for index, worker in enumerate(workers):
-        (bw_in, bw_out) = build_worker_bandwidth(trace_events, worker)
+        (bw_in, bw_out) = build_worker_bandwidth(trace_index.flow_events.get(worker, ()), worker)
 
         plot = figure(plot_width=600,
                       plot_height=300,
@@ -358,8 +553,56 @@ def plot_worker_bandwidth(trace_events, workers):
     return gridplot(plots, ncols=2)
 
 
+def plot_worker_utilization(trace_events, workers, bucket_count=200):
+    """
+    Plots CPU utilization of all workers as a heatmap (workers x time buckets).
+    """
+    from bokeh.plotting import figure
+
+    trace_index = as_trace_index(trace_events)
+    end_time = math.ceil(trace_index.end_time)
+    _, matrix = build_worker_utilization(trace_index, workers, bucket_count, end_time)
+
+    plot = figure(plot_width=1200,
+                  plot_height=max(300, 10 * len(workers)),
+                  x_range=(0, end_time),
+                  y_range=(0, len(workers)),
+                  title='Worker utilization')
+    plot.yaxis.axis_label = 'Worker'
+    plot.xaxis.axis_label = 'Time'
+    plot.image(image=[matrix], x=0, y=0, dw=end_time, dh=len(workers),
+               palette="Viridis256")
+    return plot
+
+
+def plot_transfer_bins(trace_events, workers, bucket_count=200):
+    """
+    Plots transfers aggregated by source, target and time bucket.
+    The width of a segment corresponds to the amount of transferred data.
+    """
+    from bokeh import models
+    from bokeh.plotting import figure
+
+    trace_index = as_trace_index(trace_events)
+    end_time = math.ceil(trace_index.end_time)
+    frame = build_transfer_bins(trace_index, workers, bucket_count, end_time)
+    frame["width"] = 1 + 9 * frame["size"] / max(frame["size"].max(), 1e-9)
+
+    plot = figure(plot_width=1200,
+                  plot_height=max(300, 10 * len(workers)),
+                  x_range=(0, end_time),
+                  title='Transfers')
+    plot.yaxis.axis_label = 'Worker'
+    plot.xaxis.axis_label = 'Time'
+    source = models.ColumnDataSource(frame)
+    plot.segment(x0="start", y0="source", x1="end", y1="target", line_width="width",
+                 line_alpha=0.5, line_color="black", source=source)
+    return plot
+
+
 def plot_tabs(trace_events, workers, plot_fns, labels):
     from bokeh.models import Panel, Tabs
+    trace_events = as_trace_index(trace_events)
     return Tabs(tabs=[Panel(child=fn(trace_events, workers), title=label)
                       for (fn, label) in zip(plot_fns, labels)])
 
@@ -375,6 +618,23 @@ def plot_all(trace_events, workers):
                       "Transfer size"])
 
 
+def plot_aggregated(trace_events, workers, bucket_count=200, time_window=None):
+    """
+    Level-of-detail variant of `plot_all` for large traces.
+
+    Tasks are aggregated into a utilization heatmap and transfers are binned by
+    source, target and time. Individual tasks are rendered only for `time_window`.
+    """
+    plot_fns = [lambda *args: plot_worker_utilization(*args, bucket_count=bucket_count),
+                lambda *args: plot_transfer_bins(*args, bucket_count=bucket_count)]
+    labels = ["Utilization", "Transfers"]
+    if time_window is not None:
+        plot_fns.append(lambda *args: plot_task_communication(*args, show_communication=True,
+                                                              time_window=time_window))
+        labels.append("Tasks + communication ({}-{})".format(*time_window))
+    return plot_tabs(trace_events, workers, plot_fns, labels)
+
+
 def build_trace_html(trace_events, workers, filename, plot_fn):
     """
     Render trace events into a HTML file according to the given plot function.
@@ -382,7 +642,7 @@ def build_trace_html(trace_events, workers, filename, plot_fn):
     """
     import bokeh.io
 
-    trace_events = normalize_events(trace_events)
+    trace_events = TraceIndex(normalize_events(trace_events))
 
     plot = plot_fn(trace_events, workers)
 
@@ -390,8 +650,19 @@ def build_trace_html(trace_events, workers, filename, plot_fn):
     bokeh.io.save(plot)
 
 
-def simulator_trace_to_html(simulator, filename):
-    build_trace_html(simulator.trace_events, simulator.workers, filename, plot_all)
+def simulator_trace_to_html(simulator, filename, time_window=None, detail_limit=20000):
+    """
+    Render the simulator trace into a HTML file.
+
+    When the task graph has more than `detail_limit` tasks, `plot_aggregated` is used
+    and individual tasks are rendered only for `time_window`.
+    """
+    if simulator.task_graph.task_count > detail_limit:
+        def plot_fn(trace_events, workers):
+            return plot_aggregated(trace_events, workers, time_window=time_window)
+    else:
+        plot_fn = plot_all
+    build_trace_html(simulator.trace_events, simulator.workers, filename, plot_fn)
 
 
 def render_rectangles(plot, locations, fill_color="blue", line_color="black"):
@@ -413,29 +684,28 @@ def to_chrome_time(time):
     return time * 1000_000
 
 
-def export_to_chrome_events(trace_events):
-    task_start = {}
-    for e in trace_events:
-        if isinstance(e, TaskStartTraceEvent):
-            task_start[e.task] = e
+def iter_chrome_events(trace_events, flow_arrows=True):
+    """
+    Generates events in the Chrome trace format (as dicts) one by one.
+
+    :param flow_arrows: Generate flow arrows from each task to its consumers.
+    """
+    index = as_trace_index(trace_events)
+    task_start = index.task_starts
 
-    ep = merge_trace_events(
-        trace_events,
-        lambda t: isinstance(t, TaskStartTraceEvent),
-        lambda t: isinstance(t, TaskEndTraceEvent),
-        lambda e: e.task,
-    )
-    result = []
     id_counter = 1
-    for e1, e2 in ep:
-        result.append({
+    for e1, e2 in index.task_intervals():
+        yield {
             "name": "t{} ({})".format(e1.task.id, e1.task.cpus),
             "cat": "task",
             "ph": "X",
             "ts": to_chrome_time(e1.time),
             "dur": to_chrome_time(e2.time - e1.time),
             "pid": e1.worker.id,
-        })
+        }
+
+        if not flow_arrows:
+            continue
 
         consumers = set()
         for o in e1.task.outputs:
@@ -444,63 +714,59 @@ def export_to_chrome_events(trace_events):
         for c in consumers:
             flow_id = id_counter
             id_counter += 1
-            result.append({
+            yield {
                 "name": "t {}".format(e1.task.id),
                 "cat": "task",
                 "ph": "s",
                 "ts": to_chrome_time(e2.time),
                 "pid": e1.worker.id,
                 "id": flow_id,
-            })
+            }
             event = task_start[c]
-            result.append({
+            yield {
                 "name": "flow",
                 "cat": "task",
                 "ph": "f",
                 "ts": to_chrome_time(event.time),
                 "pid": event.worker.id,
                 "id": flow_id,
-            })
+            }
 
-    cpus = {}
-    assigns = {}
-
-    for event in trace_events:
-        if isinstance(event, TaskStartTraceEvent) or isinstance(event, TaskEndTraceEvent):
-            if isinstance(event, TaskStartTraceEvent):
-                cpus.setdefault(event.worker, 0)
-                cpus[event.worker] += event.task.cpus
+    for worker, events in index.task_events.items():
+        cpus = 0
+        for event in events:
+            if type(event) is TaskStartTraceEvent:
+                cpus += event.task.cpus
             else:
-                cpus[event.worker] -= event.task.cpus
-            result.append({
+                cpus -= event.task.cpus
+            yield {
                 "name": "load_running",
                 "cat": "load",
                 "ph": "C",
                 "ts": to_chrome_time(event.time),
-                "pid": event.worker.id,
+                "pid": worker.id,
                 "args": {
-                    "cpus": cpus[event.worker]
+                    "cpus": cpus
                 }
-            })
-
-        if (isinstance(event, TaskAssignTraceEvent)
-                or isinstance(event, TaskEndTraceEvent)
-                or isinstance(event, TaskRetractTraceEvent)):
-            if isinstance(event, TaskAssignTraceEvent):
-                assigns.setdefault(event.worker, 0)
-                assigns[event.worker] += event.task.cpus
+            }
+
+    for worker, events in index.assign_events.items():
+        assigned = 0
+        for event in events:
+            if type(event) is TaskAssignTraceEvent:
+                assigned += event.task.cpus
             else:
-                assigns[event.worker] -= event.task.cpus
-            result.append({
+                assigned -= event.task.cpus
+            yield {
                 "name": "load_assign",
                 "cat": "load",
                 "ph": "C",
                 "ts": to_chrome_time(event.time),
-                "pid": event.worker.id,
+                "pid": worker.id,
                 "args": {
-                    "cpus": assigns[event.worker]
+                    "cpus": assigned
                 }
-            })
+            }
 
     send_bw = {}
     recv_bw = {}
@@ -513,27 +779,77 @@ def export_to_chrome_events(trace_events):
         d[w2] = value
         return sum(d.values())
 
-    for event in trace_events:
-        if isinstance(event, NetModelFlowEvent):
-            result.append({
-                "name": "net_send",
-                "cat": "net",
-                "ph": "C",
-                "ts": to_chrome_time(event.time),
-                "pid": event.source_worker.id,
-                "args": {
-                    "send": update(event.source_worker, event.target_worker, send_bw, event.value)
-                },
-            })
-            result.append({
-                "name": "net_recv",
-                "cat": "net",
-                "ph": "C",
-                "ts": to_chrome_time(event.time),
-                "pid": event.target_worker.id,
-                "args": {
-                    "recv": update(event.target_worker, event.source_worker, recv_bw, event.value)
-                }
-            })
+    for event in index.flows:
+        yield {
+            "name": "net_send",
+            "cat": "net",
+            "ph": "C",
+            "ts": to_chrome_time(event.time),
+            "pid": event.source_worker.id,
+            "args": {
+                "send": update(event.source_worker, event.target_worker, send_bw, event.value)
+            },
+        }
+        yield {
+            "name": "net_recv",
+            "cat": "net",
+            "ph": "C",
+            "ts": to_chrome_time(event.time),
+            "pid": event.target_worker.id,
+            "args": {
+                "recv": update(event.target_worker, event.source_worker, recv_bw, event.value)
+            }
+        }
+
+
+def decimate_counter_events(chrome_events, interval):
+    """
+    Keeps at most one counter event per `interval` (in seconds of simulated time)
+    for each counter; the last value in each interval is kept. Other events are
+    passed through unchanged.
+    """
+    interval = to_chrome_time(interval)
+    pending = {}
+
+    for event in chrome_events:
+        if event["ph"] != "C":
+            yield event
+            continue
+        key = (event["name"], event["pid"])
+        bucket = event["ts"] // interval
+        held = pending.get(key)
+        if held is not None and held[0] != bucket:
+            yield held[1]
+        pending[key] = (bucket, event)
+
+    for _, event in pending.values():
+        yield event
+
 
-    return json.dumps(result)
+def write_chrome_events(trace_events, stream, counter_interval=None, flow_arrows=True):
+    """
+    Writes trace events into `stream` (a file-like object) in the Chrome trace format.
+
+    Events are serialized one by one, the whole JSON document is never created in memory.
+
+    :param counter_interval: Decimate counter events, see `decimate_counter_events`.
+    :param flow_arrows: Generate flow arrows from each task to its consumers.
+    """
+    events = iter_chrome_events(trace_events, flow_arrows)
+    if counter_interval:
+        events = decimate_counter_events(events, counter_interval)
+
+    stream.write("[")
+    separator = "\n"
+    for event in events:
+        stream.write(separator)
+        stream.write(json.dumps(event))
+        separator = ",\n"
+    stream.write("\n]\n")
+
+
+def export_to_chrome_events(trace_events, counter_interval=None, flow_arrows=True):
+    events = iter_chrome_events(trace_events, flow_arrows)
+    if counter_interval:
+        events = decimate_counter_events(events, counter_interval)
+    return json.dumps(list(events))
@@ -1,7 +1,9 @@
 import logging
 
-from simpy import Event, Store
+from simpy import Event, Resource, Store
 
+from .memory import create_eviction_policy
+from .sources import create_source_policy
 from ..simulator.trace import FetchStartTraceEvent, \
     TaskEndTraceEvent, TaskStartTraceEvent
 
@@ -10,17 +12,18 @@ logger = logging.getLogger(__name__)
 
 class RunningTask:
 
-    __slots__ = ("task", "start_time")
+    __slots__ = ("task", "start_time", "duration")
 
-    def __init__(self, task, start_time):
+    def __init__(self, task, start_time, duration):
         self.task = task
         self.start_time = start_time
+        self.duration = duration
 
     def running_time(self, now):
         return now - self.start_time
 
     def remaining_time(self, now):
-        return self.task.duration - self.running_time(now)
+        return self.duration - self.running_time(now)
 
 
 class Download:
@@ -50,34 +53,162 @@ class Download:
 
 
 class Worker:
+    """
+    bandwidth - bandwidth of worker's network interface (in each direction),
+                None means the bandwidth of the network model
+    speed - speed factor of worker's cpus, a task runs `task.duration / speed` on the worker
+    memory - capacity of worker's memory (in units of object sizes), None means unlimited
+    eviction_policy - EvictionPolicy or its name ("lru", "no-future-consumer", "size")
+                      that selects objects evicted when the memory is full
+    spill_bandwidth - bandwidth of worker's disk; if it is set, evicted objects produced
+                      by the worker that are still needed are spilled to the disk (and read
+                      back when a task assigned to the worker needs them), otherwise only
+                      downloaded replicas and objects that are not needed anymore are evicted
+    download_batch_size - if set, objects smaller than this size that are downloaded from
+                          the same source are merged into transfers of at most this
+                          total size (so they pay the latency of the netmodel once);
+                          `max_downloads` and `max_downloads_per_worker` limit transfers
+    source_policy - SourcePolicy or its name ("producer", "least-loaded", "random", "nearest",
+                    "broadcast") that selects a worker from which an object is downloaded
+
+    When no object can be evicted, the memory usage may exceed the capacity.
+    Spilled objects can still be downloaded by other workers.
+    """
 
     DOWNLOAD_PRIORITY_BOOST_FOR_READY_TASK = 100000
 
-    def __init__(self, cpus=1, max_downloads=4, max_downloads_per_worker=2):
+    def __init__(self, cpus=1, max_downloads=4, max_downloads_per_worker=2,
+                 memory=None, eviction_policy=None, spill_bandwidth=None,
+                 source_policy=None, bandwidth=None, speed=1.0, download_batch_size=None):
+        assert speed > 0
         self.cpus = cpus
+        self.bandwidth = bandwidth
+        self.speed = speed
+        self.max_downloads = max_downloads
+        self.max_downloads_per_worker = max_downloads_per_worker
+        self.memory = memory
+        self.eviction_policy = create_eviction_policy(eviction_policy)
+        self.spill_bandwidth = spill_bandwidth
+        self.source_policy = create_source_policy(source_policy)
+        self.download_batch_size = download_batch_size
+        self.id = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the state of the previous simulation run, the worker id is kept
+        """
         self.assignments = {}
         self.ready_store = None
 
+        # the worker is part of the cluster (it is running)
+        self.alive = False
+        # the worker accepts no new tasks and leaves when its running tasks are finished
+        # and its objects that are still needed are replicated to other workers
+        self.leaving = False
+        self.join_time = None
+
         self.data = set()
         self.running_tasks = {}
         self.scheduled_downloads = {}
         self.running_downloads = []
+        # number of running transfers (a transfer may contain more downloads)
+        self.running_transfers = 0
+        # running transfers, event -> list of downloads
+        self.transfers = {}
+        self.download_events = None
 
-        self.free_cpus = cpus
-        self.max_downloads = max_downloads
-        self.max_downloads_per_worker = max_downloads_per_worker
-        self.id = None
+        self.free_cpus = self.cpus
+
+        self.memory_usage = 0
+        self.last_use = {}
+        self.uploads = {}
+        self.spilled = set()
+        self.unspilling = set()
+        self.disk = None
+
+        # number of running uploads of this worker
+        self.upload_count = 0
+        # number of running downloads of this worker for each source
+        self.source_downloads = {}
 
     def to_dict(self):
-        return {
+        result = {
             "id": self.id,
             "cpus": self.cpus
         }
+        if self.memory is not None:
+            result["memory"] = self.memory
+        if self.bandwidth is not None:
+            result["bandwidth"] = self.bandwidth
+        if self.speed != 1.0:
+            result["speed"] = self.speed
+        return result
 
     def copy(self):
         return Worker(cpus=self.cpus,
                       max_downloads=self.max_downloads,
-                      max_downloads_per_worker=self.max_downloads_per_worker)
+                      max_downloads_per_worker=self.max_downloads_per_worker,
+                      memory=self.memory,
+                      eviction_policy=self.eviction_policy,
+                      spill_bandwidth=self.spill_bandwidth,
+                      source_policy=self.source_policy,
+                      bandwidth=self.bandwidth,
+                      speed=self.speed,
+                      download_batch_size=self.download_batch_size)
+
+    @property
+    def accepts_tasks(self):
+        return self.alive and not self.leaving
+
+    def retract_unstarted_tasks(self):
+        """
+        Retracts all assigned tasks that are not running, returns the retracted tasks
+        """
+        tasks = [task for task in self.assignments if task not in self.running_tasks]
+        for task in tasks:
+            self.try_retract_task(task)
+        return tasks
+
+    def remove(self):
+        """
+        Stops the worker when it is removed from the cluster
+        """
+        self.alive = False
+        for task in self.running_tasks:
+            self.simulator.add_trace_event(TaskEndTraceEvent(self.env.now, self, task))
+        for batch in self.transfers.values():
+            source = batch[0].source
+            source.upload_count -= 1
+            for download in batch:
+                source.uploads[download.output] -= 1
+        self.transfers.clear()
+
+    def source_removed(self, source):
+        """
+        Returns downloads from a removed worker back into the download queue
+        """
+        for event, batch in list(self.transfers.items()):
+            if batch[0].source != source:
+                continue
+            del self.transfers[event]
+            self.download_events.remove(event)
+            self.source_downloads[source] -= 1
+            self.running_transfers -= 1
+            for download in batch:
+                self.running_downloads.remove(download)
+                download.source = None
+                download.start_time = None
+        self.wakeup_downloads()
+
+    def object_lost(self, obj):
+        """
+        Drops a scheduled download of an object whose all replicas were lost,
+        the object is downloaded again when it is recomputed
+        """
+        d = self.scheduled_downloads.get(obj)
+        if d is not None and d.source is None:
+            del self.scheduled_downloads[obj]
 
     def try_retract_task(self, task):
         if task in self.running_tasks:
@@ -108,6 +239,26 @@ class Worker:
         del self.assignments[a.task]
         return True
 
+    def cancel_task(self, task):
+        """
+        Cancels an assigned or running copy of a task that was finished by another worker
+        """
+        running = self.running_tasks.pop(task, None)
+        if running is None:
+            self.try_retract_task(task)
+            self.simulator.statistics.add_cancelled_copy(self, task, 0)
+            return
+
+        logging.debug("Cancelling running task %s on worker %s", task, self)
+        assignment = self.assignments.pop(task)
+        assignment.cancelled = True
+        self.free_cpus += task.cpus
+        self.simulator.add_trace_event(TaskEndTraceEvent(self.env.now, self, task))
+        self.simulator.statistics.add_cancelled_copy(
+            self, task, running.running_time(self.env.now) * task.cpus)
+        # Wake up the worker, so it can use the freed cpus
+        self.ready_store.put(assignment)
+
     def assign_tasks(self, assignments):
         runtime_state = self.simulator.runtime_state
         for assignment in assignments:
@@ -123,7 +274,9 @@ class Worker:
             for inp in assignment.task.inputs:
                 if inp in self.data:
                     continue
-                if runtime_state.object_info(inp).placing:
+                if inp in self.spilled:
+                    self._schedule_unspill(inp)
+                elif runtime_state.object_info(inp).placing:
                     self._schedule_download(assignment, inp,
                                             runtime_state.task_info(assignment.task).is_ready)
                 need_inputs += 1
@@ -134,14 +287,36 @@ class Worker:
 
     def update_tasks(self, updates):
         runtime_state = self.simulator.runtime_state
+        # Empty objects still pay the latency and overhead of a transfer
+        instant = not (self.netmodel.latency or self.netmodel.overhead)
         for task, obj in updates:
             a = self.assignments[task]
             if obj not in self.data:
-                if obj.size == 0:
+                if obj.size == 0 and instant:
                     self._add_data(obj)
+                    self._check_memory()
                 else:
                     self._schedule_download(a, obj, runtime_state.task_info(task).is_ready)
 
+    def prefetch(self, obj, priority):
+        """
+        Downloads an object that is not needed by tasks assigned to the worker (yet)
+        """
+        if obj in self.data or obj in self.spilled:
+            return
+        d = self.scheduled_downloads.get(obj)
+        if d is None:
+            logger.info("Worker %s: prefetching %s, priority=%s", self, obj, priority)
+            d = Download(obj, priority)
+            self.scheduled_downloads[obj] = d
+            self.simulator.statistics.add_prefetch(self, obj)
+            self.simulator.statistics.update_download_queue(self, len(self.scheduled_downloads))
+        else:
+            d.update_priority(priority)
+        # The prefetch holds the download as a consumer, so it is not cancelled by retracting
+        d.consumer_count += 1
+        self.wakeup_downloads()
+
     @property
     def assigned_tasks(self):
         return iter(self.assignments)
@@ -150,6 +325,9 @@ class Worker:
         if obj in self.data:
             raise Exception("Object {} is already on worker {}".format(obj, self))
         self.data.add(obj)
+        self.last_use[obj] = self.env.now
+        if self.memory is not None:
+            self.memory_usage += obj.size
         for t in obj.consumers:
             a = self.assignments.get(t)
             if a is None:
@@ -159,6 +337,76 @@ class Worker:
                 assert a.remaining_inputs_count == 0
                 self.ready_store.put(a)
 
+    def _check_memory(self):
+        """
+        Evicts objects if the memory is full, it has to be called after new objects
+        are registered in the runtime state (so their replicas are known)
+        """
+        if self.memory is not None:
+            self._free_memory()
+            self.simulator.statistics.update_memory_usage(self, self.memory_usage)
+
+    def _is_needed(self, obj):
+        # The object is produced by this worker and it has a consumer that is not finished
+        runtime_state = self.simulator.runtime_state
+        return (self in runtime_state.object_info(obj).placing and
+                not all(runtime_state.task_info(t).is_finished for t in obj.consumers))
+
+    def _can_evict(self, obj, pinned):
+        if obj in pinned or self.uploads.get(obj):
+            return False
+        return self.spill_bandwidth is not None or not self._is_needed(obj)
+
+    def _free_memory(self):
+        if self.memory_usage <= self.memory:
+            return
+        pinned = set()
+        for task in self.assignments:
+            pinned.update(task.inputs)
+        candidates = [o for o in self.data if self._can_evict(o, pinned)]
+        for obj in self.eviction_policy.order(self, candidates):
+            if self.memory_usage <= self.memory:
+                break
+            self._evict(obj)
+
+    def _evict(self, obj):
+        runtime_state = self.simulator.runtime_state
+        self.data.remove(obj)
+        self.memory_usage -= obj.size
+        info = runtime_state.object_info(obj)
+        spill = self._is_needed(obj)
+        if spill:
+            self.spilled.add(obj)
+            self.simulator.statistics.add_spill(self, obj.size)
+            self.env.process(self._disk_transfer(obj))
+        else:
+            if self in info.placing:
+                info.placing.remove(self)
+            if self in info.availability:
+                info.availability.remove(self)
+        logger.info("Worker %s: evicted %s (spilled=%s)", self, obj, spill)
+        self.simulator.on_object_evicted(self, obj, spill)
+
+    def _schedule_unspill(self, obj):
+        if obj not in self.unspilling:
+            self.unspilling.add(obj)
+            self.env.process(self._unspill_process(obj))
+
+    def _unspill_process(self, obj):
+        yield from self._disk_transfer(obj)
+        if not self.alive:
+            return
+        self.spilled.remove(obj)
+        self.unspilling.remove(obj)
+        self.simulator.statistics.add_unspill(self, obj.size)
+        self._add_data(obj)
+        self._check_memory()
+
+    def _disk_transfer(self, obj):
+        with self.disk.request() as request:
+            yield request
+            yield self.env.timeout(obj.size / self.spill_bandwidth)
+
     def _schedule_download(self, assignment, obj, ready):
         priority = assignment.priority
         if ready:
@@ -169,34 +417,51 @@ class Worker:
             assert obj not in self.data
             d = Download(obj, priority)
             self.scheduled_downloads[obj] = d
+            self.simulator.statistics.update_download_queue(self, len(self.scheduled_downloads))
         else:
             d.update_priority(priority)
         d.consumer_count += 1
+        self.wakeup_downloads()
+
+    def wakeup_downloads(self):
         if not self.download_wakeup.triggered:
             self.download_wakeup.succeed()
 
     def _download_process(self):
         events = [self.download_wakeup]
+        self.download_events = events
         env = self.env
         runtime_state = self.simulator.runtime_state
 
         while True:
             finished = yield env.any_of(events)
+            if not self.alive:
+                return
             for event in finished.keys():
                 if event == events[0]:
                     self.download_wakeup = Event(self.simulator.env)
                     events[0] = self.download_wakeup
                     downloads = None
                     continue
+                if event not in events:  # The source was removed
+                    continue
                 events.remove(event)
-                download = event.value
-                self._add_data(download.output)
-                self.running_downloads.remove(download)
-                del self.scheduled_downloads[download.output]
-
-                self.simulator.fetch_finished(self, download.source, download.output)
-
-            if len(self.running_downloads) < self.max_downloads:
+                del self.transfers[event]
+                batch = event.value
+                source = batch[0].source
+                source.upload_count -= 1
+                self.source_downloads[source] -= 1
+                self.running_transfers -= 1
+                for download in batch:
+                    source.uploads[download.output] -= 1
+                    self._add_data(download.output)
+                    self.running_downloads.remove(download)
+                    del self.scheduled_downloads[download.output]
+
+                    self.simulator.fetch_finished(self, source, download.output)
+                self._check_memory()
+
+            if self.running_transfers < self.max_downloads:
                 # We need to sort any time, as it priority may changed in background
 
                 if downloads is None:
@@ -204,34 +469,71 @@ class Worker:
                                      if o not in self.running_downloads)
                     downloads.sort(key=lambda d: d.priority, reverse=True)
 
+                source_downloads = self.source_downloads
                 for d in downloads[:]:
-                    count = 0
-                    worker = runtime_state.object_info(d.output).placing[0]
-                    for rd in self.running_downloads:
-                        if worker == rd.source:
-                            count += 1
-                    if count >= self.max_downloads_per_worker:
+                    if d.start_time is not None:  # Already started in a batch
+                        continue
+                    candidates = [w for w in runtime_state.object_info(d.output).availability
+                                  if source_downloads.get(w, 0) < self.max_downloads_per_worker]
+                    worker = (self.source_policy.select(self, d.output, candidates)
+                              if candidates else None)
+                    if worker is None:
+                        self.simulator.wait_for_source(self, d.output)
                         continue
                     downloads.remove(d)
-                    assert d.start_time is None
-                    d.start_time = self.env.now
-                    d.source = worker
-                    self.running_downloads.append(d)
-                    event = self.netmodel.download(worker, self, d.output.size, d)
+                    batch = [d]
+                    if self.download_batch_size is not None:
+                        self._fill_batch(batch, worker, downloads)
+                    worker.upload_count += 1
+                    source_downloads[worker] = source_downloads.get(worker, 0) + 1
+                    self.running_transfers += 1
+                    size = 0
+                    for b in batch:
+                        assert b.start_time is None
+                        b.start_time = self.env.now
+                        b.source = worker
+                        worker.uploads[b.output] = worker.uploads.get(b.output, 0) + 1
+                        self.running_downloads.append(b)
+                        size += b.output.size
+                        self.simulator.add_trace_event(
+                            FetchStartTraceEvent(self.env.now, self, worker, b.output))
+                    event = self.netmodel.download(worker, self, size, batch)
                     events.append(event)
-                    self.simulator.add_trace_event(
-                        FetchStartTraceEvent(self.env.now, self, worker, d.output))
-                    if len(self.running_downloads) >= self.max_downloads:
+                    self.transfers[event] = batch
+                    if self.running_transfers >= self.max_downloads:
                         break
 
+    def _fill_batch(self, batch, source, downloads):
+        """
+        Moves small downloads available on `source` from `downloads` into `batch`
+        """
+        limit = self.download_batch_size
+        size = batch[0].output.size
+        if size >= limit:
+            return
+        runtime_state = self.simulator.runtime_state
+        for d in downloads[:]:
+            obj_size = d.output.size
+            if (obj_size < limit and size + obj_size <= limit and
+                    source in runtime_state.object_info(d.output).availability):
+                downloads.remove(d)
+                batch.append(d)
+                size += obj_size
+                if size >= limit:
+                    break
+
     def run(self, env, simulator, netmodel):
         self.env = env
         self.simulator = simulator
         self.netmodel = netmodel
         self.ready_store = Store(env)
         self.download_wakeup = Event(self.simulator.env)
+        if self.spill_bandwidth is not None:
+            self.disk = Resource(env, capacity=1)
 
         self.free_cpus = self.cpus
+        self.alive = True
+        self.join_time = env.now
         env.process(self._download_process())
 
         prepared_assignments = []
@@ -239,6 +541,8 @@ class Worker:
 
         while True:
             finished = yield env.any_of(events)
+            if not self.alive:
+                return
             for event in finished.keys():
                 if event == events[0]:
                     events[0] = self.ready_store.get()
@@ -247,19 +551,28 @@ class Worker:
                         continue
                     prepared_assignments.append(assignment)
                     prepared_assignments.sort(key=lambda a: a.priority, reverse=True)
+                    simulator.statistics.update_ready_queue(self, len(prepared_assignments))
                     continue
 
                 assignment = event.value
+                events.remove(event)
+                if assignment.cancelled:  # Copy of the task finished on another worker
+                    continue
                 task = assignment.task
                 self.free_cpus += task.cpus
-                assert not assignment.cancelled
                 del self.assignments[assignment.task]
-                events.remove(event)
                 del self.running_tasks[task]
                 simulator.add_trace_event(TaskEndTraceEvent(self.env.now, self, task))
                 for output in task.outputs:
-                    self._add_data(output)
+                    if output not in self.data:  # A recomputed task may have a replica here
+                        self._add_data(output)
                 simulator.on_task_finished(self, task)
+                self._check_memory()
+
+            if self.leaving:
+                simulator.check_leaving_worker(self)
+                if not self.alive:
+                    return
 
             block = float("-inf")
             for assignment in prepared_assignments[:]:
@@ -271,9 +584,12 @@ class Worker:
                     if assignment.cancelled:
                         continue
                     self.free_cpus -= task.cpus
-                    self.running_tasks[task] = RunningTask(task, self.env.now)
+                    for inp in task.inputs:
+                        self.last_use[inp] = self.env.now
+                    duration = task.duration / self.speed
+                    self.running_tasks[task] = RunningTask(task, self.env.now, duration)
                     simulator.add_trace_event(TaskStartTraceEvent(self.env.now, self, task))
-                    events.append(env.timeout(task.duration, assignment))
+                    events.append(env.timeout(duration, assignment))
                     self.simulator.on_task_start(self, assignment.task)
                 else:
                     block = max(block, assignment.block)
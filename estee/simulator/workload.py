@@ -0,0 +1,114 @@
+import random
+
+from ..common import TaskGraph
+
+
+class Job:
+    """
+    A task graph submitted to the simulator at `arrival_time`
+    """
+
+    __slots__ = ("id", "task_graph", "arrival_time", "name")
+
+    def __init__(self, task_graph, arrival_time, name=None):
+        assert arrival_time >= 0
+        self.id = None
+        self.task_graph = task_graph
+        self.arrival_time = arrival_time
+        self.name = name
+
+    def __repr__(self):
+        return "<Job {} {} at {}>".format(self.id, self.name, self.arrival_time)
+
+
+class Workload:
+    """
+    A stream of jobs submitted to the simulator over time.
+
+    Pass a workload to Simulator instead of a task graph. Tasks of a job are sent
+    to the scheduler (as "new_tasks" and "new_objects") when the job arrives.
+
+    Jobs are ordered by their arrival times. Tasks and objects of their task graphs
+    are renumbered in place so that ids are unique in the whole workload and
+    `task_graph` shares them with the job graphs (nothing is copied, unlike
+    TaskGraph.merge). When the same task graph is used by more jobs, the repeated jobs
+    get a copy of it. With `copy=True`, every job gets a copy and the graphs passed in
+    are left untouched.
+    """
+
+    def __init__(self, jobs, copy=False):
+        self.jobs = sorted(jobs, key=lambda j: j.arrival_time)
+        self.task_graph = TaskGraph()
+        # task -> job
+        self.task_jobs = {}
+
+        tasks = self.task_graph.tasks
+        objects = self.task_graph.objects
+        graphs = set()
+        for i, job in enumerate(self.jobs):
+            job.id = i
+            graph = job.task_graph
+            if not graph.tasks:
+                raise Exception("Job {} has no tasks".format(job))
+            if copy or id(graph) in graphs:
+                graph = graph.copy()
+                job.task_graph = graph
+            else:
+                graph.validate()
+            graphs.add(id(graph))
+
+            job_tasks = list(graph.tasks.values())
+            job_objects = list(graph.objects.values())
+            for task in job_tasks:
+                task.id = len(tasks)
+                tasks[task.id] = task
+                self.task_jobs[task] = job
+            for obj in job_objects:
+                obj.id = len(objects)
+                objects[obj.id] = obj
+            graph.tasks = {t.id: t for t in job_tasks}
+            graph.objects = {o.id: o for o in job_objects}
+
+    @property
+    def job_count(self):
+        return len(self.jobs)
+
+
+def poisson_arrivals(count, rate, seed=None):
+    """
+    Returns `count` arrival times of a Poisson process with `rate` arrivals per time unit
+    (the first job arrives at time 0)
+    """
+    if count <= 0:
+        return []
+    rng = random.Random(seed)
+    times = [0]
+    for _ in range(count - 1):
+        times.append(times[-1] + rng.expovariate(rate))
+    return times
+
+
+def read_arrival_trace(filename, task_graphs):
+    """
+    Reads jobs from a trace file.
+
+    Each line of the file contains an arrival time and a name of a task graph
+    from `task_graphs` (a mapping name -> TaskGraph), separated by whitespace or a comma.
+    Empty lines and lines starting with '#' are ignored.
+    """
+    jobs = []
+    with open(filename) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            items = line.replace(",", " ").split()
+            if len(items) != 2:
+                raise Exception("Invalid line {} in arrival trace '{}'"
+                                .format(line_number, filename))
+            time, name = items
+            if name not in task_graphs:
+                raise Exception("Unknown task graph '{}' in arrival trace '{}'"
+                                .format(name, filename))
+            jobs.append(Job(task_graphs[name], float(time), name))
+    return jobs
@@ -0,0 +1,145 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from estee.common import Registry, TaskGraph
+from estee.schedulers.basic import AllOnOneScheduler
+from estee.serialization.dask_json import json_serialize
+from .conftest import ROOT_DIR
+
+BENCHMARK_DIR = os.path.join(ROOT_DIR, "benchmarks")
+if BENCHMARK_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARK_DIR)
+
+import benchmark  # noqa
+from benchmark import CLUSTERS, COLUMNS, Instance, InstanceFailure, ResultStore, compute, \
+    create_simulator, load_instance_graph, run_single_instance  # noqa
+from costmodel import CostModel  # noqa
+from cube import weighted_mean  # noqa
+
+
+class MemoryHungryScheduler(AllOnOneScheduler):
+
+    def schedule(self, update):
+        self.data = bytearray(2**30)
+        super().schedule(update)
+
+
+class FailingSimulator:
+
+    def __init__(self, error):
+        self.error = error
+
+    def run(self):
+        raise self.error
+
+
+def make_graph(size=1):
+    task_graph = TaskGraph()
+    for _ in range(size):
+        task_graph.new_task(duration=1)
+    return json_serialize(task_graph)
+
+
+def make_instance(graph="[]", count=1, netmodel="simple", scheduler_name="blevel"):
+    return Instance("set", "graph", "g0", graph, "2x8", 8192, netmodel, scheduler_name,
+                    "exact", 0.0, 0.0, count)
+
+
+def make_row(instance, time=1.0):
+    return [getattr(instance, column) for column in COLUMNS[:10]] + [time, 0.5, 0.0, 2.0]
+
+
+def test_benchmark_store_incomplete_rows(tmpdir, capsys):
+    store = ResultStore(str(tmpdir.join("result.zip")))
+    store.append([make_row(make_instance())] * 2)
+    store.close()
+    path = store.shard_paths()[0]
+    assert len(store.read()) == 2
+    assert "Dropped" not in capsys.readouterr().err
+
+    # The row is cut off inside its last column
+    row = make_row(make_instance(), time=1.5)
+    row[-1] = 0.01234
+    with open(path, "a") as f:
+        f.write(",".join(str(v) for v in row)[:-3])
+    frame = store.read()
+    assert len(frame) == 2
+    assert list(frame["wall_time"]) == [2.0, 2.0]
+    assert "Dropped an incomplete row" in capsys.readouterr().err
+
+    # Header of a new shard is cut off
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS[:3]))
+    assert len(store.read()) == 0
+
+
+def test_benchmark_store_failed_keys(tmpdir):
+    store = ResultStore(str(tmpdir.join("result.zip")))
+    store.append([make_row(make_instance(scheduler_name="blevel"))])
+    store.append_failure(make_instance(scheduler_name="etf", count=2), "timeout")
+
+    assert list(store.read_keys()["scheduler_name"]) == ["blevel"]
+    keys = store.read_keys(include_failures=True)
+    assert list(keys["scheduler_name"]) == ["blevel", "etf", "etf"]
+    assert list(pd.unique(store.read_failures()["reason"])) == ["timeout"]
+
+
+def test_benchmark_run_single_instance_failure():
+    instance = make_instance()
+    result = run_single_instance(instance, FailingSimulator(Exception("invalid schedule")))
+    assert isinstance(result, InstanceFailure)
+    assert result.reason == "error (Exception)"
+
+    with pytest.raises(MemoryError):
+        run_single_instance(instance, FailingSimulator(MemoryError()))
+
+
+def test_benchmark_memory_limit(tmpdir, monkeypatch):
+    monkeypatch.setattr(benchmark, "SCHEDULERS", Registry({"test-memory": MemoryHungryScheduler}))
+    store = ResultStore(str(tmpdir.join("result.zip")))
+    instances = [make_instance(make_graph(), 2, scheduler_name="test-memory")]
+
+    assert compute(instances, store, memory_limit=2**20) == 0
+    failures = store.read_failures()
+    assert list(failures["scheduler_name"]) == ["test-memory"] * 2
+    assert list(failures["reason"]) == ["memory"] * 2
+
+
+def test_benchmark_wall_time():
+    instance = make_instance(make_graph(10))
+    instance = instance._replace(graph=load_instance_graph(instance, instance.graph))
+    makespan, scheduler_time, transfer, wall_time = run_single_instance(
+        instance, create_simulator(instance))
+    assert makespan >= 1
+    assert wall_time >= scheduler_time > 0
+
+
+def test_benchmark_cost_model_wall_time():
+    graph_frame = pd.DataFrame([("g{}".format(size), make_graph(size))
+                                for size in (1, 10, 100, 1000)],
+                               columns=["graph_id", "graph"])
+    # Scheduler times are the same, simulations with maxmin take longer
+    rows = []
+    for graph_id in graph_frame["graph_id"]:
+        for cluster_name in ("2x8", "8x4"):
+            for netmodel, wall_time in (("simple", 1.0), ("maxmin", 10.0)):
+                rows.append((graph_id, cluster_name, "blevel", netmodel, 0.5, wall_time))
+    results = pd.DataFrame(rows, columns=["graph_id", "cluster_name", "scheduler_name",
+                                          "netmodel", "execution_time", "wall_time"])
+
+    model = CostModel(CLUSTERS)
+    assert model.fit(results, graph_frame)
+    graph = graph_frame["graph"][1]
+    simple = model.predict(make_instance(graph)._replace(graph_id="g10"))
+    maxmin = model.predict(make_instance(graph, netmodel="maxmin")._replace(graph_id="g10"))
+    assert maxmin == pytest.approx(10 * simple)
+
+
+def test_benchmark_cube_weighted_mean():
+    cube = pd.DataFrame([(1, 2.0, 1), (1, 4.0, 3), (2, 5.0, 2)],
+                        columns=["bandwidth", "time", "count"])
+    assert weighted_mean(cube, "time") == 4.0
+    assert list(weighted_mean(cube, "time", "bandwidth")) == [3.5, 5.0]
@@ -0,0 +1,178 @@
+import os
+import sys
+
+import pytest
+
+from estee.common import TaskGraph
+from estee.generators.elementary import grid
+from estee.schedulers import SchedulerBase, WorkStealingScheduler
+from estee.simulator import MaxMinFlowNetModel, SimpleNetModel, Simulator, Worker, \
+    random_failures, worker_fail, worker_join, worker_leave
+from .conftest import ROOT_DIR
+
+BENCHMARK_DIR = os.path.join(ROOT_DIR, "benchmarks")
+if BENCHMARK_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARK_DIR)
+
+from benchmark import SCHEDULERS  # noqa
+
+
+class FirstWorkerScheduler(SchedulerBase):
+    """
+    Assigns ready tasks to the worker with the lowest id
+    """
+
+    def __init__(self):
+        super().__init__("first-worker", "0")
+        self.updates = []
+
+    def schedule(self, update):
+        self.updates.append((self.now(), update))
+        for task in update.new_ready_tasks:
+            self.assign(min(self.workers.values(), key=lambda w: w.worker_id), task)
+
+
+def make_chain(length, duration=2, size=1):
+    task_graph = TaskGraph()
+    prev = None
+    for i in range(length):
+        task = task_graph.new_task(str(i), duration=duration, output_size=size)
+        if prev:
+            task.add_input(prev)
+        prev = task
+    return task_graph
+
+
+def run(task_graph, workers, scheduler, changes, netmodel=None):
+    simulator = Simulator(task_graph, workers, scheduler, netmodel or SimpleNetModel(1),
+                          cluster_changes=changes)
+    simulator.run()
+    return simulator
+
+
+def test_cluster_worker_join():
+    task_graph = TaskGraph()
+    a = task_graph.new_task("A", duration=10, expected_duration=10, output_size=0)
+    for name in "BC":
+        task_graph.new_task(name, duration=10, expected_duration=10).add_input(a)
+
+    simulator = run(task_graph, [Worker(), Worker()], WorkStealingScheduler(),
+                    [worker_join(5, 1)])
+    assert simulator.env.now == 20
+    assert simulator.statistics.worker_time == 20 + 15
+
+    # Without the second worker
+    simulator = run(task_graph, [Worker()], WorkStealingScheduler(), [])
+    assert simulator.env.now == 30
+
+
+def test_cluster_worker_join_announced():
+    scheduler = FirstWorkerScheduler()
+    workers = [Worker(), Worker(cpus=2)]
+    run(make_chain(3), workers, scheduler, [worker_join(3, workers[1])])
+
+    assert [w.worker_id for w in scheduler.updates[0][1].new_workers] == [0]
+    joined = [(time, [w.worker_id for w in update.new_workers])
+              for time, update in scheduler.updates if update.new_workers]
+    assert joined == [(0, [0]), (3, [1])]
+
+
+def test_cluster_worker_fail_recompute():
+    scheduler = FirstWorkerScheduler()
+    task_graph = make_chain(3)
+    simulator = run(task_graph, [Worker(), Worker()], scheduler, [worker_fail(3, 0)])
+
+    # Task 0 is finished on worker 0 at 2, task 1 is running there when it fails,
+    # both are computed again on worker 1
+    assert simulator.env.now == 9
+    assert simulator.statistics.lost_tasks == 2
+    assert simulator.statistics.recomputed_tasks == 1
+    assert simulator.statistics.worker_time == 3 + 9
+
+    time, update = [u for u in scheduler.updates if u[1].removed_workers][0]
+    assert time == 3
+    assert [w.worker_id for w in update.removed_workers] == [0]
+    assert sorted(t.id for t in update.lost_tasks) == [0, 1]
+    assert [t.id for t in update.new_ready_tasks] == [0]
+
+
+@pytest.mark.parametrize("netmodel", [SimpleNetModel(1), MaxMinFlowNetModel(1)])
+def test_cluster_worker_fail_during_download(netmodel):
+    task_graph = TaskGraph()
+    a = task_graph.new_task("A", duration=1, output_size=10)
+    b = task_graph.new_task("B", duration=1)
+    b.add_input(a)
+
+    class Scheduler(SchedulerBase):
+        def schedule(self, update):
+            for task in update.new_ready_tasks:
+                worker = 0 if task.id == a.id else 1
+                if worker not in self.workers:
+                    worker = 1
+                self.assign(self.workers[worker], task)
+
+    # A is downloaded to worker 1 from 1 to 11, worker 0 fails at 5
+    simulator = run(task_graph, [Worker(), Worker()], Scheduler("test", "0"),
+                    [worker_fail(5, 0)], netmodel)
+    assert simulator.env.now == 7
+    assert simulator.statistics.recomputed_tasks == 1
+    assert simulator.statistics.total_transfer == 0
+    assert simulator.workers[1].running_transfers == 0
+
+
+def test_cluster_worker_leave():
+    task_graph = TaskGraph()
+    a = task_graph.new_task("A", duration=4, output_size=2)
+    b = task_graph.new_task("B", duration=1)
+    c = task_graph.new_task("C", duration=1)
+    c.add_input(a)
+
+    scheduler = FirstWorkerScheduler()
+    simulator = run(task_graph, [Worker(), Worker()], scheduler, [worker_leave(1, 0)])
+
+    # B is returned from the leaving worker, A is finished there and its output
+    # is downloaded before the worker leaves, so nothing is recomputed
+    assert simulator.env.now == 7
+    assert simulator.statistics.lost_tasks == 1
+    assert simulator.statistics.recomputed_tasks == 0
+    assert simulator.statistics.total_transfer == 2
+    assert not simulator.workers[0].alive
+    assert simulator.statistics.worker_time == 6 + 7
+
+    time, update = [u for u in scheduler.updates if u[1].removed_workers][0]
+    assert time == 1
+    assert [t.id for t in update.lost_tasks] == [b.id]
+
+
+def test_cluster_invalid_changes():
+    task_graph = make_chain(2)
+    for changes in ([worker_join(1, 0), worker_join(2, 0)],
+                    [worker_fail(1, 0), worker_leave(2, 0)],
+                    [worker_leave(1, 0), worker_join(2, 0)]):
+        with pytest.raises(Exception):
+            Simulator(task_graph, [Worker(), Worker()], FirstWorkerScheduler(),
+                      SimpleNetModel(), cluster_changes=changes)
+
+
+def test_cluster_random_failures():
+    workers = [Worker() for _ in range(4)]
+    changes = random_failures(workers, 2, 10, seed=1)
+    assert len(changes) == 2
+    assert len({c.worker for c in changes}) == 2
+    assert all(c.kind == "fail" and 0 <= c.time < 10 for c in changes)
+
+    simulator = run(make_chain(6), workers, FirstWorkerScheduler(), changes)
+    assert simulator.env.now >= 12
+
+
+@pytest.mark.parametrize("scheduler_name", sorted(SCHEDULERS))
+@pytest.mark.parametrize("change", [worker_join, worker_leave, worker_fail])
+def test_cluster_changes_schedulers(scheduler_name, change):
+    workers = [Worker(cpus=2) for _ in range(3)] + [Worker(cpus=4)]
+    if change is worker_join:
+        changes = [change(10, workers[2]), change(30, workers[3])]
+    else:
+        changes = [change(10, workers[2]), change(30, workers[0])]
+
+    simulator = run(grid(4), workers, SCHEDULERS[scheduler_name](), changes)
+    assert simulator.unprocessed_tasks == 0
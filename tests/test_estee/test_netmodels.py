@@ -6,8 +6,8 @@ import simpy
 from numpy.testing import assert_array_equal
 
 from estee.simulator import Worker
-from estee.simulator.netmodels import compute_maxmin_flow, \
-    MaxMinFlowNetModel, SimpleNetModel
+from estee.simulator.netmodels import compute_maxmin_flow, compute_maxmin_link_flow, \
+    MaxMinFlowNetModel, SimpleNetModel, TopologyNetModel
 
 
 def test_maxmin_flow():
@@ -140,3 +140,85 @@ def test_maxmin_netmodel():
 
         assert tm1 > tm2
         assert tm1 < sum(diffs) + sum(sizes) / netmodel.bandwidth
+
+
+def test_maxmin_link_flow():
+    inf = np.inf
+    # two flows sharing link 0, the second one also uses link 1
+    assert_array_equal(compute_maxmin_link_flow([1, 0.2, inf], np.array([[0, 2], [0, 1]])),
+                       [0.8, 0.2])
+    assert_array_equal(compute_maxmin_link_flow([1, 1, inf], np.array([[0, 2], [0, 1]])),
+                       [0.5, 0.5])
+    assert len(compute_maxmin_link_flow([1, inf], np.zeros((0, 2), dtype=np.int64))) == 0
+
+
+def create_topology_netmodel(levels, count=8):
+    env = simpy.Environment()
+    workers = [Worker() for _ in range(count)]
+    for i, w in enumerate(workers):
+        w.id = i
+    netmodel = TopologyNetModel(100, levels)
+    netmodel.init(env, workers)
+    return netmodel, env, workers
+
+
+def test_topology_netmodel_flat():
+    random.seed(42)
+    netmodel, _, _ = create_topology_netmodel([], 6)
+    capacities = np.full(6, 100.0)
+    for _ in range(20):
+        connections = np.array([[int(i != j and random.random() < 0.4) for j in range(6)]
+                                for i in range(6)], dtype=np.int32)
+        np.testing.assert_allclose(
+            netmodel._compute_flows(connections.copy()),
+            compute_maxmin_flow(capacities.copy(), capacities.copy(), connections.copy()))
+
+
+def test_topology_netmodel_oversubscribed():
+    # 2 racks with 4 workers, rack uplinks have the bandwidth of one worker
+    netmodel, env, workers = create_topology_netmodel([(4, 100)])
+    assert netmodel.distance(workers[0], workers[0]) == 0
+    assert netmodel.distance(workers[0], workers[3]) == 1
+    assert netmodel.distance(workers[0], workers[4]) == 3
+
+    d1 = netmodel.download(workers[0], workers[4], 100)
+    d2 = netmodel.download(workers[1], workers[5], 100)
+    d3 = netmodel.download(workers[2], workers[3], 100)
+    env.run(d3)
+    assert env.now == pytest.approx(1.0)
+    env.run(d1 & d2)
+    assert env.now == pytest.approx(2.0)
+
+
+def test_topology_netmodel_levels():
+    # racks of 2 workers, pods of 2 racks, unlimited rack uplinks
+    netmodel, env, workers = create_topology_netmodel([(2, None), (2, 50)])
+    assert netmodel.distance(workers[0], workers[1]) == 1
+    assert netmodel.distance(workers[0], workers[2]) == 3
+    assert netmodel.distance(workers[0], workers[4]) == 5
+
+    d1 = netmodel.download(workers[0], workers[2], 100)
+    d2 = netmodel.download(workers[1], workers[4], 100)
+    env.run(d1 & d2)
+    assert env.now == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize("cclass, end", [(SimpleNetModel, 3.5), (MaxMinFlowNetModel, 4.5)])
+def test_netmodel_latency_overhead(cclass, end):
+    env = simpy.Environment()
+    workers = [Worker() for _ in range(3)]
+    for i, w in enumerate(workers):
+        w.id = i
+    netmodel = cclass(100, latency=0.5, overhead=50)
+    netmodel.init(env, workers)
+
+    d = netmodel.download(workers[0], workers[1], 0)
+    env.run(d)
+    assert env.now == pytest.approx(1.0)
+
+    d1 = netmodel.download(workers[0], workers[1], 150)
+    env.run(env.timeout(1))
+    d2 = netmodel.download(workers[2], workers[1], 50)
+    env.run(d1 & d2)
+    # max-min: d1 runs alone from 1.5 to 2.5, then both share the bandwidth of worker 1
+    assert env.now == pytest.approx(end)
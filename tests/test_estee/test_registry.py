@@ -0,0 +1,37 @@
+import pytest
+
+from estee.common import Registry
+from estee.common.registry import import_object
+from estee.schedulers import AllOnOneScheduler
+from estee.schedulers.camp import Camp2Scheduler
+
+
+def test_import_object():
+    assert import_object("estee.schedulers.basic:AllOnOneScheduler") is AllOnOneScheduler
+    assert import_object("estee.schedulers:AllOnOneScheduler.schedule") is \
+        AllOnOneScheduler.schedule
+    with pytest.raises(Exception):
+        import_object("estee.schedulers.basic.AllOnOneScheduler")
+
+
+def test_registry():
+    registry = Registry({
+        "single": "estee.schedulers.basic:AllOnOneScheduler",
+        "cluster": [{"cpus": 2}] * 2,
+    }, "estee.tests.nonexisting-group")
+    registry.register("camp", "estee.schedulers.camp:Camp2Scheduler", 10)
+
+    assert list(registry) == ["single", "cluster", "camp"]
+    assert len(registry) == 3
+    assert "single" in registry
+    assert "unknown" not in registry
+    assert registry["single"] is AllOnOneScheduler
+    assert registry["cluster"] == [{"cpus": 2}] * 2
+
+    scheduler = registry["camp"]()
+    assert isinstance(scheduler, Camp2Scheduler)
+    assert scheduler.iterations == 10
+
+    with pytest.raises(KeyError):
+        registry["unknown"]
+    assert registry.get("unknown") is None
@@ -0,0 +1,45 @@
+import pytest
+
+from estee.schedulers import DLSScheduler, ETFScheduler, RecordingScheduler, SchedulerRecording, \
+    WorkStealingScheduler, replay_recording
+from estee.simulator import SimpleNetModel
+from .test_utils import do_sched_test
+
+
+@pytest.mark.parametrize("scheduler_cls", [DLSScheduler, ETFScheduler])
+def test_record_and_replay(plan1, tmpdir, scheduler_cls):
+    expected = do_sched_test(plan1, 3, scheduler_cls(), SimpleNetModel(1))
+
+    recorder = RecordingScheduler(scheduler_cls())
+    assert do_sched_test(plan1, 3, recorder, SimpleNetModel(1)) == expected
+    recording = recorder.recording
+    assert recording.register["scheduler_name"] == recorder.scheduler._name
+    assert recording.message_count >= 3
+    assert recording.events[0][0] == 0
+    assert "new_workers" in recording.events[0][1]
+
+    path = str(tmpdir.join("messages.jsonl.gz"))
+    recording.save(path)
+    loaded = SchedulerRecording.load(path)
+    assert loaded.register == recording.register
+    assert [e[0] for e in loaded.events] == [e[0] for e in recording.events]
+    assert [e[2] for e in loaded.events] == [e[2] for e in recording.events]
+
+    scheduler = scheduler_cls()
+    result = replay_recording(scheduler, loaded, check=True)
+    assert result.mismatches == []
+    assert len(result.message_times) == loaded.message_count
+    assert len(result.schedule_times) == loaded.message_count
+    assert result.schedule_time <= result.message_time
+    assert "schedule" not in scheduler.__dict__
+    assert scheduler._simulator is None
+
+
+def test_replay_dynamic_scheduler(plan1):
+    recorder = RecordingScheduler(WorkStealingScheduler())
+    do_sched_test(plan1, 3, recorder, SimpleNetModel(1))
+
+    # work stealing is not deterministic, so schedules are not checked
+    result = replay_recording(WorkStealingScheduler(), recorder.recording)
+    assert len(result.schedule_times) == recorder.recording.message_count
+    assert len(result.schedules) == recorder.recording.message_count
@@ -3,7 +3,7 @@ import itertools
 from estee.common import TaskGraph
 from estee.schedulers import (AllOnOneScheduler, BlevelGtScheduler,
                               Camp2Scheduler,
-                              DLSScheduler, ETFScheduler, MCPScheduler,
+                              DLSScheduler, DuplicationScheduler, ETFScheduler, MCPScheduler,
                               RandomAssignScheduler, RandomGtScheduler,
                               RandomScheduler, WorkStealingScheduler, SchedulerBase)
 from estee.schedulers.clustering import find_critical_path, critical_path_clustering, LcScheduler
@@ -17,7 +17,7 @@ from estee.schedulers.utils import compute_b_level_duration_size, \
     compute_t_level_duration_size
 from estee.schedulers.utils import topological_sort, \
     worker_estimate_earliest_time, get_size_estimate
-from estee.simulator import SimpleNetModel, TaskAssignment
+from estee.simulator import SimpleNetModel, TaskAssignment, Worker
 from .test_utils import do_sched_test, task_by_name
 
 
@@ -108,6 +108,23 @@ def test_scheduler_etf(plan1):
     assert do_sched_test(plan1, 2, ETFScheduler(), SimpleNetModel()) == 15
 
 
+def test_scheduler_etf_duplication(plan1):
+    assert do_sched_test(plan1, 2, DuplicationScheduler(), SimpleNetModel()) <= 15
+
+
+def test_scheduler_duplication_faster_worker():
+    test_graph = TaskGraph()
+    test_graph.new_task("A", duration=10, expected_duration=10)
+    test_graph.new_task("B", duration=10, expected_duration=10)
+
+    workers = [Worker(), Worker(), Worker(speed=4)]
+    simulator = do_sched_test(test_graph, workers, DuplicationScheduler(),
+                              SimpleNetModel(), return_simulator=True)
+    # Both tasks are copied to the fast worker one after another
+    assert simulator.env.now == 5
+    assert simulator.statistics.cancelled_copies == 2
+
+
 def test_scheduler_blevel(plan1):
     assert do_sched_test(plan1, 2, BlevelScheduler(), SimpleNetModel()) == 17
 
@@ -256,6 +273,24 @@ def test_worker_estimate_earliest_time_offset_now():
     assert worker_estimate_earliest_time(worker, tg.tasks[t2.id], now + 2) == 3
 
 
+def test_worker_estimate_earliest_time_speed():
+    now = 0
+
+    tg = TaskGraph()
+    t0 = tg.new_task(expected_duration=3, cpus=1)
+    t1 = tg.new_task(expected_duration=5, cpus=1)
+    t2 = tg.new_task(expected_duration=3, cpus=2)
+
+    tg = create_scheduler_graph(tg)
+    tg.tasks[t0.id].start_time = now
+    tg.tasks[t1.id].start_time = now
+
+    worker = SchedulerWorker(0, cpus=2, speed=2)
+    worker.running_tasks.update((tg.tasks[t0.id], tg.tasks[t1.id]))
+
+    assert worker_estimate_earliest_time(worker, tg.tasks[t2.id], now) == 2.5
+
+
 def test_topological_sort(plan1):
     tasks = ['a1', 'a2', 'a4', 'a7', 'a3', 'a5', 'a6', 'a8']
     assert topological_sort(plan1) == [task_by_name(plan1, t) for t in tasks]
@@ -1,9 +1,9 @@
 import pytest
 
 from estee.common import TaskGraph
-from estee.schedulers import AllOnOneScheduler, DoNothingScheduler, SchedulerBase, \
-    StaticScheduler
-from estee.simulator import SimpleNetModel, TaskState
+from estee.schedulers import AllOnOneScheduler, DLSScheduler, DoNothingScheduler, \
+    SchedulerBase, StaticScheduler
+from estee.simulator import MaxMinFlowNetModel, SimpleNetModel, Simulator, TaskState, Worker
 from .test_utils import do_sched_test, fixed_scheduler
 
 
@@ -346,3 +346,141 @@ def test_simulator_task_start_notify():
                   scheduler,
                   trace=True, netmodel=SimpleNetModel(1))
     assert triggered[1] and triggered[0]
+
+
+def test_simulator_statistics():
+    test_graph = TaskGraph()
+    a = test_graph.new_task("A", duration=1, output_size=5)
+    b = test_graph.new_task("B", duration=1, output_size=3)
+    c = test_graph.new_task("C", duration=1)
+    c.add_inputs((a, b))
+
+    simulator = do_sched_test(test_graph, [1, 1, 1], fixed_scheduler([
+        (0, a, 0),
+        (1, b, 0),
+        (2, c, 0)
+    ]), netmodel=SimpleNetModel(1), return_simulator=True)
+
+    statistics = simulator.statistics
+    assert statistics.transfers == {(0, 2): 5, (1, 2): 3}
+    assert statistics.total_transfer == 8
+    assert statistics.scheduler_invocations >= 2
+    assert len(statistics.scheduler_times) == statistics.scheduler_invocations
+    assert statistics.peak_ready_queue == [1, 1, 1]
+    assert statistics.peak_download_queue == [0, 0, 2]
+
+
+def test_simulator_reset(plan1):
+    def run_fresh(scheduler):
+        workers = [Worker(cpus=2) for _ in range(3)]
+        simulator = Simulator(plan1, workers, scheduler, MaxMinFlowNetModel(1), trace=True)
+        return simulator.run(), len(simulator.trace_events), simulator.statistics.total_transfer
+
+    expected = [run_fresh(s()) for s in (DLSScheduler, AllOnOneScheduler, DLSScheduler)]
+
+    workers = [Worker(cpus=2) for _ in range(3)]
+    simulator = Simulator(plan1, workers, DLSScheduler(), MaxMinFlowNetModel(1), trace=True)
+    results = [(simulator.run(), len(simulator.trace_events),
+                simulator.statistics.total_transfer)]
+    with pytest.raises(Exception):
+        simulator.run()
+
+    for scheduler in (AllOnOneScheduler(), DLSScheduler()):
+        simulator.reset(scheduler)
+        assert simulator.trace_events == []
+        assert all(not w.data and not w.assignments for w in workers)
+        results.append((simulator.run(), len(simulator.trace_events),
+                        simulator.statistics.total_transfer))
+    assert results == expected
+    assert [w.id for w in workers] == [0, 1, 2]
+
+
+def test_simulator_reset_same_scheduler(plan1):
+    simulator = Simulator(plan1, [Worker() for _ in range(2)], DLSScheduler(),
+                          SimpleNetModel(1))
+    first = simulator.run()
+    simulator.reset()
+    assert simulator.run() == first
+
+
+def test_simulator_duplication():
+    test_graph = TaskGraph()
+    a = test_graph.new_task("A", duration=10, output_size=1)
+    b = test_graph.new_task("B", duration=1)
+    b.add_input(a)
+
+    class Scheduler(SchedulerBase):
+        def __init__(self):
+            super().__init__("test", "0", duplication=True)
+            self.cancelled = []
+
+        def schedule(self, update):
+            self.cancelled += [(t.id, w.worker_id) for t, w in update.cancelled_copies]
+            if update.graph_changed:
+                ta = self.task_graph.tasks[a.id]
+                self.assign(self.workers[0], ta)
+                self.duplicate(self.workers[1], ta)
+            for t in update.new_ready_tasks:
+                self.assign(self.workers[0], t)
+
+    scheduler = Scheduler()
+    simulator = do_sched_test(test_graph, [Worker(), Worker(speed=4)], scheduler,
+                              netmodel=SimpleNetModel(1), return_simulator=True)
+    # A finishes on the faster worker at 2.5, B waits for the transfer of its output
+    assert simulator.env.now == 4.5
+    assert simulator.runtime_state.task_info(a).assigned_workers == [simulator.workers[1]]
+    assert scheduler.cancelled == [(a.id, 0)]
+    assert simulator.statistics.cancelled_copies == 1
+    assert simulator.statistics.wasted_time == 2.5
+    assert simulator.workers[0].free_cpus == 1
+
+
+def test_simulator_duplication_not_announced():
+    test_graph = TaskGraph()
+    a = test_graph.new_task("A", duration=1)
+
+    class Scheduler(SchedulerBase):
+        def schedule(self, update):
+            if update.graph_changed:
+                self.assign(self.workers[0], self.task_graph.tasks[a.id])
+                self.duplicates.append({"worker": 1, "task": a.id, "duplicate": True})
+
+    with pytest.raises(Exception, match="duplicat"):
+        do_sched_test(test_graph, 2, Scheduler("test", "0"))
+
+
+def test_simulator_prefetch():
+    test_graph = TaskGraph()
+    a = test_graph.new_task("A", duration=1, output_size=10)
+    b = test_graph.new_task("B", duration=1)
+    b.add_input(a)
+    c = test_graph.new_task("C", duration=5)
+
+    class Scheduler(SchedulerBase):
+        def __init__(self, prefetch):
+            super().__init__("test", "0")
+            self.use_prefetch = prefetch
+
+        def schedule(self, update):
+            tasks = self.task_graph.tasks
+            if not tasks:
+                return
+            if update.graph_changed:
+                self.assign(self.workers[0], tasks[a.id])
+                self.assign(self.workers[1], tasks[c.id])
+                if self.use_prefetch:
+                    # A is not finished yet, so its output is downloaded when it is available
+                    self.prefetch(self.workers[1], tasks[a.id].outputs[0])
+            if tasks[c.id] in update.new_finished_tasks:
+                self.assign(self.workers[1], tasks[b.id])
+
+    simulator = do_sched_test(test_graph, 2, Scheduler(False),
+                              netmodel=SimpleNetModel(1), return_simulator=True)
+    assert simulator.env.now == 16
+    assert simulator.statistics.prefetches == 0
+
+    simulator = do_sched_test(test_graph, 2, Scheduler(True),
+                              netmodel=SimpleNetModel(1), return_simulator=True)
+    assert simulator.env.now == 12
+    assert simulator.statistics.prefetches == 1
+    assert simulator.statistics.total_transfer == 10
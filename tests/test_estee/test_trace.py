@@ -1,7 +1,15 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
 from estee.common import TaskGraph
 from estee.simulator import SimpleNetModel
 from estee.simulator.trace import FetchEndTraceEvent, FetchStartTraceEvent, \
-    TaskAssignTraceEvent, TaskEndTraceEvent, TaskStartTraceEvent
+    TaskAssignTraceEvent, TaskEndTraceEvent, TaskStartTraceEvent, TraceIndex, build_transfer_bins, \
+    build_worker_usage, build_worker_utilization, decimate_counter_events, \
+    export_to_chrome_events, plot_task_communication, write_chrome_events
 from .test_utils import do_sched_test, fixed_scheduler
 
 
@@ -72,3 +80,130 @@ def test_trace_task_fetch():
         FetchEndTraceEvent(7, workers[1], workers[0], a.output),
         FetchEndTraceEvent(13, workers[0], workers[1], b.output),
     ]
+
+
+def test_trace_index():
+    tg = TaskGraph()
+    a = tg.new_task(output_size=5, duration=2)
+    b = tg.new_task(output_size=3, duration=3)
+    b.add_input(a)
+    c = tg.new_task(duration=4)
+    c.add_input(b)
+
+    simulator = do_sched_test(tg, [1, 1], fixed_scheduler([
+        (0, a, 0),
+        (1, b, 0),
+        (0, c, 0)
+    ]), netmodel=SimpleNetModel(1), trace=True, return_simulator=True)
+
+    workers = simulator.workers
+    index = TraceIndex(simulator.trace_events)
+    assert index.end_time == 17
+    assert list(index) == simulator.trace_events
+    assert index.task_events[workers[0]] == [
+        TaskStartTraceEvent(0, workers[0], a),
+        TaskEndTraceEvent(2, workers[0], a),
+        TaskStartTraceEvent(13, workers[0], c),
+        TaskEndTraceEvent(17, workers[0], c),
+    ]
+    assert len(index.fetch_events[workers[0]]) == 4
+    assert len(index.fetch_events[workers[1]]) == 4
+    assert [(e1.task, e2.time) for e1, e2 in index.task_intervals(workers[1])] == [(b, 10)]
+
+    for worker in workers:
+        assert (build_worker_usage(index.task_events[worker], worker) ==
+                build_worker_usage(simulator.trace_events, worker))
+
+    frame = index.task_frame()
+    assert list(frame.sort_values("start")["task"]) == [a.id, b.id, c.id]
+    frame = index.transfer_frame()
+    assert list(frame["size"]) == [5, 3]
+
+
+def test_trace_index_repeated_task():
+    tg = TaskGraph()
+    a = tg.new_task(duration=2)
+    worker = object()
+
+    # A task computed again on the same worker (its output was lost)
+    index = TraceIndex([
+        TaskStartTraceEvent(0, worker, a),
+        TaskEndTraceEvent(2, worker, a),
+        TaskStartTraceEvent(5, worker, a),
+        TaskEndTraceEvent(7, worker, a),
+    ])
+    assert [(e1.time, e2.time) for e1, e2 in index.task_intervals()] == [(0, 2), (5, 7)]
+
+
+def test_trace_write_chrome_events(plan1):
+    assignments = [(i % 2, task, 0) for i, task in enumerate(plan1.tasks.values())]
+    simulator = do_sched_test(plan1, [1, 1], fixed_scheduler(assignments),
+                              netmodel=SimpleNetModel(1), trace=True, return_simulator=True)
+
+    stream = io.StringIO()
+    write_chrome_events(simulator.trace_events, stream)
+    events = json.loads(stream.getvalue())
+    assert events == json.loads(export_to_chrome_events(simulator.trace_events))
+    assert len([e for e in events if e["ph"] == "X"]) == len(plan1.tasks)
+
+    stream = io.StringIO()
+    write_chrome_events(simulator.trace_events, stream, flow_arrows=False)
+    assert not [e for e in json.loads(stream.getvalue()) if e["ph"] in ("s", "f")]
+
+
+def test_trace_decimate_counter_events():
+    def counter(ts, value, pid=0):
+        return {"name": "c", "ph": "C", "ts": ts * 1000_000, "pid": pid, "args": {"v": value}}
+
+    task = {"name": "t", "ph": "X", "ts": 0, "dur": 1, "pid": 0}
+    events = [task, counter(0, 1), counter(0.5, 2), counter(0.7, 3, pid=1), counter(1.2, 4),
+              counter(3, 5), counter(3.1, 0)]
+    result = list(decimate_counter_events(events, 1))
+    assert result[0] == task
+    assert sorted((e["pid"], e["args"]["v"]) for e in result[1:]) == [(0, 0), (0, 2), (0, 4),
+                                                                     (1, 3)]
+
+
+def test_trace_worker_utilization():
+    tg = TaskGraph()
+    a = tg.new_task(output_size=5, duration=2, cpus=2)
+    b = tg.new_task(output_size=3, duration=3)
+    b.add_input(a)
+    c = tg.new_task(duration=4, cpus=1)
+    c.add_input(b)
+
+    simulator = do_sched_test(tg, [2, 1], fixed_scheduler([
+        (0, a, 0),
+        (1, b, 0),
+        (0, c, 0)
+    ]), netmodel=SimpleNetModel(1), trace=True, return_simulator=True)
+    workers = simulator.workers
+
+    # a: 0-2 (w0, 2 cpus), b: 7-10 (w1), c: 13-17 (w0, 1 cpu)
+    edges, matrix = build_worker_utilization(simulator.trace_events, workers, 4, 20)
+    assert list(edges) == [0, 5, 10, 15, 20]
+    assert matrix[0] == pytest.approx([0.4, 0, 0.2, 0.2])
+    assert matrix[1] == pytest.approx([0, 0.6, 0, 0])
+
+    frame = build_transfer_bins(simulator.trace_events, workers, 4, 20)
+    assert list(frame["source"]) == [0, 1]
+    assert list(frame["target"]) == [1, 0]
+    assert list(frame["bucket"]) == [1, 2]
+    assert list(frame["size"]) == [5, 3]
+    assert np.all(frame["end"] - frame["start"] == 5)
+
+
+@pytest.mark.parametrize("show_communication", [False, True])
+def test_trace_plot_task_communication(show_communication):
+    pytest.importorskip("bokeh")
+    tg = TaskGraph()
+    a = tg.new_task(output_size=5, duration=2)
+    b = tg.new_task(duration=3)
+    b.add_input(a)
+
+    simulator = do_sched_test(tg, [1, 1], fixed_scheduler([
+        (0, a, 0),
+        (1, b, 0),
+    ]), netmodel=SimpleNetModel(1), trace=True, return_simulator=True)
+    assert plot_task_communication(simulator.trace_events, simulator.workers,
+                                   show_communication) is not None
@@ -4,7 +4,8 @@ import pytest
 
 from estee.common import TaskGraph
 from estee.schedulers import SchedulerBase
-from estee.simulator import SimpleNetModel, Worker
+from estee.simulator import BroadcastSourcePolicy, MaxMinFlowNetModel, RandomSourcePolicy, \
+    SimpleNetModel, Worker
 from .test_utils import do_sched_test, fixed_scheduler
 
 
@@ -257,3 +258,190 @@ def test_more_outputs_from_same_source():
     ])
 
     assert do_sched_test(test_graph, [1], s) == 2
+
+
+def memory_test_graph():
+    g = TaskGraph()
+    a = g.new_task("A", duration=1, output_size=4)
+    c = g.new_task("C", duration=1, output_size=5)
+    d = g.new_task("D", duration=1)
+    d.add_input(a)
+    return g
+
+
+class MemoryScheduler(SchedulerBase):
+
+    def __init__(self):
+        super().__init__("memory", "0")
+        self.evictions = []
+
+    def schedule(self, update):
+        tasks = self.task_graph.tasks
+        if not tasks:
+            return
+        self.evictions += [(w.worker_id, o.id, spilled) for w, o, spilled in update.evictions]
+        worker = self.workers[0]
+        if update.new_tasks:
+            self.assign(worker, tasks[0], priority=2)
+            self.assign(worker, tasks[1], priority=1)
+        if tasks[1] in update.new_finished_tasks:
+            self.assign(worker, tasks[2])
+
+
+def run_memory_test(**kwargs):
+    scheduler = MemoryScheduler()
+    simulator = do_sched_test(memory_test_graph(), [Worker(**kwargs)], scheduler,
+                              SimpleNetModel(), return_simulator=True)
+    return simulator, scheduler
+
+
+def test_worker_memory_unlimited():
+    simulator, scheduler = run_memory_test()
+    assert simulator.env.now == 3
+    assert simulator.statistics.evictions == 0
+    assert scheduler.evictions == []
+
+
+def test_worker_memory_spill():
+    simulator, scheduler = run_memory_test(memory=6, spill_bandwidth=2)
+    # A is spilled at 2 (written until 4), read back until 6, D runs until 7
+    assert simulator.env.now == 7
+    statistics = simulator.statistics
+    assert statistics.spilled == 4
+    assert statistics.unspilled == 4
+    assert statistics.evictions == 2
+    assert statistics.peak_memory == [5]
+    assert scheduler.evictions[0] == (0, 0, True)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"eviction_policy": "lru"},
+    {"eviction_policy": "no-future-consumer", "spill_bandwidth": 2},
+    {"eviction_policy": "size", "spill_bandwidth": 2},
+])
+def test_worker_memory_drop_unneeded(kwargs):
+    simulator, scheduler = run_memory_test(memory=6, **kwargs)
+    assert simulator.env.now == 3
+    assert simulator.statistics.evictions == 1
+    assert simulator.statistics.spilled == 0
+    assert scheduler.evictions == [(0, 1, False)]
+    assert simulator.workers[0].memory_usage == 4
+    # The evicted object is not announced as available on the worker
+    info = simulator.runtime_state.object_info(simulator.task_graph.tasks[1].outputs[0])
+    assert info.placing == [] and info.availability == []
+
+
+@pytest.mark.parametrize("source_policy, makespan", [
+    (None, 3),
+    ("producer", 3),
+    ("least-loaded", 2),
+    ("nearest", 2),
+])
+def test_worker_source_policy(source_policy, makespan):
+    g = TaskGraph()
+    a = g.new_task("A", duration=0, output_size=1)
+    for i in range(3):
+        g.new_task("B{}".format(i), duration=0).add_input(a)
+
+    class Scheduler(SchedulerBase):
+        def schedule(self, update):
+            tasks = self.task_graph.tasks
+            if not tasks:
+                return
+            if update.new_tasks:
+                self.assign(self.workers[0], tasks[0])
+                self.assign(self.workers[1], tasks[1])
+            if tasks[1] in update.new_finished_tasks:
+                self.assign(self.workers[2], tasks[2])
+                self.assign(self.workers[3], tasks[3])
+
+    workers = [Worker(source_policy=source_policy) for _ in range(4)]
+    simulator = do_sched_test(g, workers, Scheduler("x", "0"), MaxMinFlowNetModel(),
+                              return_simulator=True)
+    assert simulator.env.now == pytest.approx(makespan)
+    assert all(w.upload_count == 0 for w in workers)
+
+
+def test_worker_source_policy_random():
+    g = TaskGraph()
+    a = g.new_task("A", duration=0, output_size=1)
+    b = g.new_task("B", duration=0)
+    b.add_inputs([a])
+    s = fixed_scheduler([(0, a, 0), (1, b, 0)])
+    assert do_sched_test(g, [Worker(source_policy=RandomSourcePolicy(seed=1)) for _ in range(2)],
+                         s, SimpleNetModel()) == 1
+
+
+@pytest.mark.parametrize("source_policy, makespan", [
+    ("producer", 7),
+    ("least-loaded", 7),
+    (BroadcastSourcePolicy(fanout=1), 3),
+    (BroadcastSourcePolicy(fanout=8), 7),
+])
+def test_worker_source_policy_broadcast(source_policy, makespan):
+    g = TaskGraph()
+    a = g.new_task("A", duration=0, output_size=1)
+    consumers = [g.new_task("B{}".format(i), duration=0) for i in range(7)]
+    for t in consumers:
+        t.add_input(a)
+
+    s = fixed_scheduler([(0, a, 0)] + [(i + 1, t, 0) for i, t in enumerate(consumers)])
+    workers = [Worker(source_policy=source_policy) for _ in range(8)]
+    assert do_sched_test(g, workers, s, MaxMinFlowNetModel()) == pytest.approx(makespan)
+
+
+@pytest.mark.parametrize("netmodel", [SimpleNetModel(1), MaxMinFlowNetModel(1)])
+def test_worker_speed_and_bandwidth(netmodel):
+    g = TaskGraph()
+    a = g.new_task("A", duration=4, output_size=4)
+    b = g.new_task("B", duration=2)
+    b.add_input(a)
+    s = fixed_scheduler([(0, a, 0), (1, b, 0)])
+
+    assert do_sched_test(g, [Worker(speed=2), Worker()], s, netmodel) == pytest.approx(8)
+    assert do_sched_test(g, [Worker(speed=2, bandwidth=4), Worker(bandwidth=2)],
+                         s, netmodel) == pytest.approx(6)
+    assert do_sched_test(g, [Worker(bandwidth=4), Worker(speed=0.5)],
+                         s, netmodel) == pytest.approx(12)
+
+
+def test_worker_speed_and_bandwidth_reported():
+    g = TaskGraph()
+    g.new_task("A", duration=1)
+    workers = []
+
+    class Scheduler(SchedulerBase):
+        def schedule(self, update):
+            workers.extend((w.bandwidth, w.speed) for w in update.new_workers)
+            for t in update.new_ready_tasks:
+                self.assign(self.workers[0], t)
+
+    do_sched_test(g, [Worker(bandwidth=10, speed=2), Worker()], Scheduler("x", "0"))
+    assert workers == [(10, 2), (None, 1.0)]
+
+
+@pytest.mark.parametrize("batch_size, makespan", [(None, 6), (4, 5), (2, 5)])
+def test_worker_download_batching(batch_size, makespan):
+    g = TaskGraph()
+    a = g.new_task("A", duration=0, outputs=[1, 1, 1, 1])
+    b = g.new_task("B", duration=0)
+    b.add_inputs(a.outputs)
+    s = fixed_scheduler([(0, a, 0), (1, b, 0)])
+
+    workers = [Worker(), Worker(download_batch_size=batch_size)]
+    simulator = do_sched_test(g, workers, s, MaxMinFlowNetModel(1, latency=1),
+                              return_simulator=True)
+    assert simulator.env.now == pytest.approx(makespan)
+    assert simulator.statistics.total_transfer == 4
+    assert workers[1].running_transfers == 0
+
+
+@pytest.mark.parametrize("cclass", [SimpleNetModel, MaxMinFlowNetModel])
+def test_worker_zero_size_latency(cclass):
+    g = TaskGraph()
+    a = g.new_task("A", duration=1, output_size=0)
+    b = g.new_task("B", duration=1)
+    b.add_input(a)
+    s = fixed_scheduler([(0, a, 0), (1, b, 0)])
+
+    assert do_sched_test(g, [Worker(), Worker()], s, cclass(1, latency=5)) == pytest.approx(7)
@@ -0,0 +1,121 @@
+import pytest
+
+from estee.common import TaskGraph
+from estee.schedulers import SchedulerBase
+from estee.simulator import Job, SimpleNetModel, Simulator, Worker, Workload, \
+    poisson_arrivals, read_arrival_trace
+
+
+class RecordingScheduler(SchedulerBase):
+    """
+    Assigns ready tasks to the first worker and records times of new tasks
+    """
+
+    def __init__(self):
+        super().__init__("recording", "0")
+        self.arrivals = []
+
+    def schedule(self, update):
+        if update.new_tasks:
+            self.arrivals.append((self.now(), sorted(t.id for t in update.new_tasks)))
+        for task in update.new_ready_tasks:
+            self.assign(self.workers[0], task)
+
+
+def make_graph(*durations):
+    task_graph = TaskGraph()
+    prev = None
+    for duration in durations:
+        task = task_graph.new_task(duration=duration, output_size=0)
+        if prev:
+            task.add_input(prev)
+        prev = task
+    return task_graph
+
+
+def test_workload_merge_in_place():
+    g1 = make_graph(1, 1)
+    g2 = make_graph(1)
+    tasks = list(g1.tasks.values()) + list(g2.tasks.values())
+    workload = Workload([Job(g2, 5, "b"), Job(g1, 0, "a"), Job(g2, 7, "c")])
+
+    assert [j.name for j in workload.jobs] == ["a", "b", "c"]
+    assert [j.id for j in workload.jobs] == [0, 1, 2]
+    task_graph = workload.task_graph
+    task_graph.validate()
+    assert task_graph.task_count == 4
+    assert list(task_graph.tasks.values())[:3] == tasks
+    assert [t.id for t in tasks] == [0, 1, 2]
+    g1.validate()
+    g2.validate()
+
+    # The repeated graph is copied
+    assert workload.jobs[2].task_graph is not g2
+    assert workload.task_jobs[task_graph.tasks[3]] is workload.jobs[2]
+
+    with pytest.raises(Exception):
+        Workload([Job(TaskGraph(), 0)])
+
+
+def test_workload_merge_copy():
+    g1 = make_graph(1, 1)
+    g2 = make_graph(3)
+    tasks = list(g1.tasks.values()) + list(g2.tasks.values())
+    workload = Workload([Job(g2, 5), Job(g1, 0)], copy=True)
+
+    task_graph = workload.task_graph
+    task_graph.validate()
+    assert [t.duration for t in task_graph.tasks.values()] == [1, 1, 3]
+    assert not set(task_graph.tasks.values()) & set(tasks)
+    assert [t.id for t in tasks] == [0, 1, 0]
+    g1.validate()
+    g2.validate()
+
+
+def test_workload_simulation():
+    workload = Workload([Job(make_graph(3), 0), Job(make_graph(1, 1), 1), Job(make_graph(2), 10)])
+    scheduler = RecordingScheduler()
+    simulator = Simulator(workload, [Worker()], scheduler, SimpleNetModel())
+    assert simulator.run() == 12
+
+    assert scheduler.arrivals == [(0, [0]), (1, [1, 2]), (10, [3])]
+    statistics = simulator.statistics
+    assert statistics.jobs == {0: (0, 0, 3), 1: (1, 3, 5), 2: (10, 10, 12)}
+    assert statistics.job_latencies == [3, 4, 2]
+    assert statistics.job_queueing_delays == [0, 2, 0]
+    assert statistics.job_throughput == 3 / 12
+
+    result = statistics.to_dict()
+    assert result["mean_job_latency"] == 3
+    assert result["max_job_latency"] == 4
+    assert result["mean_queueing_delay"] == pytest.approx(2 / 3)
+
+    simulator.reset()
+    assert simulator.run() == 12
+    assert len(simulator.statistics.jobs) == 3
+
+
+def test_workload_poisson_arrivals():
+    times = poisson_arrivals(10, 0.5, seed=1)
+    assert len(times) == 10
+    assert times[0] == 0
+    assert times == sorted(times)
+    assert times == poisson_arrivals(10, 0.5, seed=1)
+    assert poisson_arrivals(0, 0.5) == []
+
+
+def test_workload_read_arrival_trace(tmpdir):
+    path = str(tmpdir.join("trace.txt"))
+    with open(path, "w") as f:
+        f.write("# time graph\n0 a\n\n2.5, b\n4 a\n")
+    graphs = {"a": make_graph(1), "b": make_graph(1, 2)}
+
+    jobs = read_arrival_trace(path, graphs)
+    assert [(j.arrival_time, j.name) for j in jobs] == [(0, "a"), (2.5, "b"), (4, "a")]
+    workload = Workload(jobs)
+    assert workload.task_graph.task_count == 4
+
+    with open(path, "w") as f:
+        f.write("0 c\n")
+    with pytest.raises(Exception):
+        read_arrival_trace(path, graphs)